@@ -0,0 +1,232 @@
+"""
+Multi-camera support for the Andor SDK.
+The SDK keeps one global "current camera" that every call acts on, so CameraManager serializes access with one lock
+and re-selects the camera (SetCurrentCamera) only when a call is for a different handle than the last one. Waiting
+for acquisition events uses WaitForAcquisitionByHandleTimeOut outside the lock, so cameras expose and read out in
+parallel; each camera has its own worker thread, and all of them feed one stream of CameraFrames.
+"""
+
+import time
+import threading
+import queue
+import numpy as np
+import atmcd
+from collections import namedtuple
+
+CameraFrames = namedtuple("CameraFrames", ["camera", "first", "time", "data"])
+
+"""
+Proxy for one camera with the atmcd interface: each call takes the SDK lock and selects the camera first, and
+WaitForAcquisition(TimeOut) become the ByHandle waits, which need neither. Usable wherever an atmcd object is, e.g. as
+AndorPrinceton(com_port, sdk=session). Use "with session:" to run several calls without another camera's calls in
+between.
+"""
+class CameraSession():
+    def __init__(self, manager, index, handle):
+        self.manager = manager
+        self.index = index
+        self.handle = handle
+        self.readout = None
+
+    def __enter__(self):
+        self.manager.lock.acquire()
+        try:
+            self.manager.select(self.handle)
+        except:
+            self.manager.lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.manager.lock.release()
+
+    """
+    Sets this camera's read mode to a ReadoutGeometry (arguments as AndorPrinceton.setReadout); the manager then reads
+    frames of its frame_size. Frames are streamed as read out; readout.crop cuts them down.
+    @return: Returns the log of SDK calls, as ReadoutGeometry.configure
+    """
+    def setReadout(self, mode="fvb", track=None, columns=None, hbin=1, isolated=False):
+        from AndorPrinceton import ReadoutGeometry
+        readout = ReadoutGeometry(mode, track, columns, hbin, isolated)
+        (ret, xpixels, ypixels) = self.GetDetector()
+        if ret != atmcd.atmcd.DRV_SUCCESS:
+            raise Exception("ERROR: GetDetector returned %d for camera %d" % (ret, self.index))
+        ret_str = readout.configure(self, xpixels, ypixels)
+        self.readout = readout
+        return ret_str
+
+    def WaitForAcquisition(self):
+        return self.manager.sdk.WaitForAcquisitionByHandle(self.handle)
+
+    def WaitForAcquisitionTimeOut(self, iTimeOutMs):
+        return self.manager.sdk.WaitForAcquisitionByHandleTimeOut(self.handle, iTimeOutMs)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        func = getattr(self.manager.sdk, name)
+        def call(*args):
+            with self:
+                return func(*args)
+        setattr(self, name, call)
+        return call
+
+"""
+Opens every camera the SDK reports (or the first n_cameras) and runs acquisitions on all of them in parallel.
+sdk: an atmcd object (one is created with backend if None); init_dir: directory passed to Initialize
+stream_size: bound on the blocks of frames waiting in the unified stream; workers block when it is full
+"""
+class CameraManager():
+    def __init__(self, sdk=None, backend=None, init_dir="/usr/local/etc/andor", n_cameras=None, stream_size=256):
+        self.sdk = atmcd.atmcd(backend=backend) if sdk is None else sdk
+        self.lock = threading.RLock()
+        self.current = None
+        self.switches = 0
+        (ret, total) = self.sdk.GetAvailableCameras()
+        if ret != atmcd.atmcd.DRV_SUCCESS:
+            raise Exception("ERROR: GetAvailableCameras returned %d" % ret)
+        if n_cameras is not None:
+            total = min(total, n_cameras)
+        self.cameras = []
+        for index in range(total):
+            (ret, handle) = self.sdk.GetCameraHandle(index)
+            if ret != atmcd.atmcd.DRV_SUCCESS:
+                raise Exception("ERROR: GetCameraHandle(%d) returned %d" % (index, ret))
+            session = CameraSession(self, index, handle)
+            ret = session.Initialize(init_dir)
+            if ret != atmcd.atmcd.DRV_SUCCESS:
+                raise Exception("ERROR: Initialize returned %d for camera %d" % (ret, index))
+            self.cameras.append(session)
+        self.stream = queue.Queue(maxsize=stream_size)
+        self.workers = []
+        self.stopping = threading.Event()
+        self.frame_counts = [0]*len(self.cameras)
+
+    def __len__(self):
+        return len(self.cameras)
+
+    """
+    Makes handle the current camera. Call with the lock held.
+    """
+    def select(self, handle):
+        if handle != self.current:
+            ret = self.sdk.SetCurrentCamera(handle)
+            if ret != atmcd.atmcd.DRV_SUCCESS:
+                raise Exception("ERROR: SetCurrentCamera returned %d" % ret)
+            self.current = handle
+            self.switches += 1
+
+    """
+    Runs configure(session) for every camera, e.g. to set the read mode and exposure.
+    @return: Returns the list of results, one per camera
+    """
+    def configure(self, configure):
+        return [configure(session) for session in self.cameras]
+
+    """
+    Starts acquisitions on every camera and one worker thread per camera draining them into the stream.
+    The acquisition set up on each camera (single scan, kinetic series or run till abort) is started as is; workers
+    stop once n_frames frames per camera (None: until the acquisition ends or stop()) have been read.
+    frame_size: values per frame (default: each camera's readout.frame_size if setReadout was called on its session,
+    else the detector width, i.e. full vertical binning)
+    """
+    def start(self, n_frames=None, frame_size=None, timeout_ms=1000):
+        self.stop()
+        self.stopping.clear()
+        self.frame_counts = [0]*len(self.cameras)
+        self.workers = []
+        for session in self.cameras:
+            size = frame_size
+            if size is None and session.readout is not None:
+                size = session.readout.frame_size
+            elif size is None:
+                (ret, xpixels, ypixels) = session.GetDetector()
+                size = xpixels
+            worker = threading.Thread(target=self.run, args=(session, n_frames, size, timeout_ms),
+                                      name="CameraWorker-%d" % session.index, daemon=True)
+            self.workers.append(worker)
+        with self.lock:
+            for (i, session) in enumerate(self.cameras):
+                ret = session.StartAcquisition()
+                if ret != atmcd.atmcd.DRV_SUCCESS:
+                    # Leave no camera acquiring without a worker to drain it
+                    for started in self.cameras[:i]:
+                        started.AbortAcquisition()
+                    self.workers = []
+                    raise Exception("ERROR: StartAcquisition returned %d for camera %d" % (ret, session.index))
+        for worker in self.workers:
+            worker.start()
+
+    def run(self, session, n_frames, frame_size, timeout_ms):
+        received = 0
+        try:
+            while not self.stopping.is_set() and (n_frames is None or received < n_frames):
+                session.WaitForAcquisitionTimeOut(timeout_ms)
+                with session:
+                    (ret, status) = session.GetStatus()
+                    (ret, first, last) = session.GetNumberNewImages()
+                    data = None
+                    if ret == atmcd.atmcd.DRV_SUCCESS:
+                        if n_frames is not None:
+                            last = min(last, first + n_frames - received - 1)
+                        data = np.empty((last - first + 1, frame_size), dtype=np.int32)
+                        (ret, first, last) = session.GetImagesInto(first, last, data)
+                        data = data[:last - first + 1] if ret == atmcd.atmcd.DRV_SUCCESS else None
+                if data is not None:
+                    received += len(data)
+                    self.frame_counts[session.index] = received
+                    self.put(CameraFrames(session.index, first, time.perf_counter(), data))
+                elif status != atmcd.atmcd.DRV_ACQUIRING:
+                    break
+        finally:
+            with session:
+                if session.GetStatus()[1] == atmcd.atmcd.DRV_ACQUIRING:
+                    session.AbortAcquisition()
+            self.put(CameraFrames(session.index, None, time.perf_counter(), None))
+
+    def put(self, item):
+        while not self.stopping.is_set():
+            try:
+                self.stream.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    """
+    Yields CameraFrames(camera index, series index of the first frame, time read, (n, frame_size) data) blocks from
+    all cameras as they are read, until every worker has finished or stop() is called. Waits at most timeout seconds
+    for each block.
+    """
+    def frames(self, timeout=None):
+        running = len(self.workers)
+        last = time.perf_counter()
+        while running > 0 and not self.stopping.is_set():
+            try:
+                item = self.stream.get(timeout=0.1)
+            except queue.Empty:
+                if timeout is not None and time.perf_counter() - last > timeout:
+                    return
+                continue
+            last = time.perf_counter()
+            if item.data is None:
+                running -= 1
+            else:
+                yield item
+
+    """
+    Stops the workers, aborting acquisitions still running, and discards frames not yet taken from the stream.
+    """
+    def stop(self):
+        self.stopping.set()
+        for worker in self.workers:
+            worker.join()
+        while True:
+            try:
+                self.stream.get_nowait()
+            except queue.Empty:
+                break
+
+    def shutDown(self):
+        self.stop()
+        for session in self.cameras:
+            session.ShutDown()
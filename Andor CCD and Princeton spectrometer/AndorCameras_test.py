@@ -0,0 +1,51 @@
+"""
+Tests for CameraManager on the simulated multi-camera SDK. Run with: python -m pytest AndorCameras_test.py
+"""
+
+import numpy as np
+import pytest
+import atmcd
+from AndorCameras import CameraManager
+from AndorSimulator import SimulatedCameraSet
+
+def makeManager(n_cameras, n_frames=None):
+    sim = SimulatedCameraSet(n_cameras)
+    manager = CameraManager(atmcd.atmcd(backend=sim))
+    def configure(session):
+        session.SetExposureTime(0.001)
+        if n_frames is None:
+            session.SetAcquisitionMode(5)
+        else:
+            session.SetAcquisitionMode(3)
+            session.SetNumberKinetics(n_frames)
+    manager.configure(configure)
+    return (sim, manager)
+
+"""
+Frames are read with each camera's readout geometry, not the full-vertical-binning detector width.
+"""
+def testReadoutGeometryFrameSize():
+    (sim, manager) = makeManager(2, n_frames=4)
+    manager.cameras[0].setReadout("single", (128, 20), columns=(101, 600), hbin=2)
+    manager.cameras[1].setReadout("multi", (3, 10, 0))
+    try:
+        manager.start(n_frames=4)
+        received = {0: [], 1: []}
+        for block in manager.frames(timeout=5):
+            received[block.camera].append(block.data)
+    finally:
+        manager.stop()
+    for session in manager.cameras:
+        data = np.concatenate(received[session.index])
+        assert data.shape == (4, session.readout.frame_size)
+        assert np.all(data.any(axis=1))
+    assert manager.cameras[0].readout.frame_size == 250
+    assert manager.cameras[1].readout.frame_size == 3*1024
+
+def testStartFailureAbortsStartedCameras():
+    (sim, manager) = makeManager(3)
+    sim.cameras[2].StartAcquisition = lambda: atmcd.atmcd.DRV_ACQUIRING
+    with pytest.raises(Exception, match="StartAcquisition"):
+        manager.start()
+    assert [session.GetStatus()[1] for session in manager.cameras] == [atmcd.atmcd.DRV_IDLE]*3
+    manager.stop()
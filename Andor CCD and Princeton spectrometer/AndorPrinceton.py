@@ -1,45 +1,876 @@
-import serial
+# serial, asyncio and the spectrometer protocol are imported where they are used, so that tools which only post-process
+# data do not pay for them at import; spike filtering smooths with NumPy (savgolFilter) rather than scipy.signal. atmcd is cheap to import; its SDK library is loaded by atmcd().
 import time
 import os
 import pickle
+import threading
+import queue
 import numpy as np
-import scipy.signal as pysignal
 import atmcd
+from collections import deque, namedtuple
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
 
+def _fftSize(n):
+    # Smallest 2**a * 3**b * 5**c >= n: FFT lengths with a large prime factor are several times slower
+    best = 1 << (n - 1).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            best = min(best, p35 << ((n + p35 - 1)//p35 - 1).bit_length())
+            p35 *= 3
+        p5 *= 5
+    return best
+
+"""
+Savitzky-Golay smoothing along the last axis, as scipy.signal.savgol_filter(x, window_length, polyorder, axis=-1)
+computes it in its default "interp" mode (equal up to floating-point rounding): each interior point is the value at
+the window centre of a least-squares polynomial fit, applied to every row at once as one FFT convolution, and the
+first and last window_length//2 points take the fit over the first and last window.
+@return: Returns the smoothed float64 array
+"""
+def savgolFilter(x, window_length, polyorder):
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    if window_length % 2 == 0 or not polyorder < window_length <= n:
+        raise ValueError("ERROR: window_length must be odd, above polyorder and at most %d" % n)
+    half = window_length//2
+    vander = np.vander(np.arange(window_length) - half, polyorder + 1, increasing=True)
+    # Row i of fit maps a window to the fitted polynomial's value at its point i
+    fit = vander @ np.linalg.pinv(vander)
+    size = _fftSize(n + window_length - 1)
+    full = np.fft.irfft(np.fft.rfft(x, size, axis=-1)*np.fft.rfft(fit[half][::-1], size), size, axis=-1)
+    out = np.empty(x.shape, dtype=np.float64)
+    out[..., half:n - half] = full[..., window_length - 1:n]
+    out[..., :half] = x[..., :window_length] @ fit[:half].T
+    out[..., n - half:] = x[..., n - window_length:] @ fit[window_length - half:].T
+    return out
+
+"""
+Removes cosmic-ray spikes from a spectrum.
+A spike starts at any pixel exceeding the twice-smoothed baseline by more than threshold and is replaced by a
+straight line between the last pixel at or below the baseline before it and the first pixel below the baseline
+after it (searched up to max_spike_width pixels ahead).
+@return: Returns a filtered copy of data
+"""
 def filterSpikes(data, threshold=500, max_spike_width=10, window_length=51, polyorder1=3, polyorder2=1):
-    smooth_data = pysignal.savgol_filter(data, window_length, polyorder1)
-    smoother_data = pysignal.savgol_filter(smooth_data, window_length, polyorder2)
-    i = 0
-    new_data = np.array(data)
-    data_len = len(data)
-    while i < data_len:
-        # Find spike
-        if (data[i] - smoother_data[i]) > threshold:
-            # Find start point
-            start = i-1
-            while data[start] > smoother_data[start]:
-                start -= 1
-
-            # Find end point
-            end = (i + max_spike_width) if (i + max_spike_width) < data_len else (data_len - 1)
-            j = 1
-            while j < max_spike_width and (i + j) < data_len:
-                if data[i + j] < smoother_data[i + j]:
-                    end = i + j
-                    break
-                j += 1
-
-            # Interpolate
-            m = (data[end] - data[start]) / (end - start)
-            b = data[start] - m*start
-            j = start + 1
-            while j < end:
-                new_data[j] = m*j + b
-                j += 1
-            i = end
-        i += 1
+    data = np.asarray(data)
+    return filterSpikesBatch(data[np.newaxis], threshold, max_spike_width, window_length, polyorder1, polyorder2)[0]
+
+"""
+Removes cosmic-ray spikes from every row of an (n_frames, n_pixels) stack of spectra.
+Each row is filtered as filterSpikes would filter it (the batched smoothing can differ from the single-row one by
+floating-point rounding near the row edges), but smoothing, spike detection and interpolation run once over the
+whole stack. The stack is filtered in this process unless processes > 1 and it holds at least POOL_MIN_VALUES values;
+then it is split into row chunks filtered in a pool of up to processes worker processes (no more than there are CPUs).
+@return: Returns a filtered copy of stack
+"""
+def filterSpikesBatch(stack, threshold=500, max_spike_width=10, window_length=51, polyorder1=3, polyorder2=1, processes=None):
+    stack = np.asarray(stack)
+    if processes is not None and stack.size >= POOL_MIN_VALUES:
+        processes = min(processes, os.cpu_count() or 1, len(stack))
+        if processes > 1:
+            return _filterSpikesPool(stack, processes, threshold, max_spike_width, window_length, polyorder1, polyorder2)
+
+    smooth_data = savgolFilter(stack, window_length, polyorder1)
+    smoother_data = savgolFilter(smooth_data, window_length, polyorder2)
+    new_data = np.array(stack)
+
+    # Work on flat indices so that all rows are handled together; row bounds are restored where needed
+    data_len = stack.shape[-1]
+    data = stack.ravel()
+    smoother_data = smoother_data.ravel()
+    flat_data = new_data.reshape(-1)
+
+    # Spike candidates and, for each one, where its interpolation would end
+    candidates = np.flatnonzero((data - smoother_data) > threshold)
+    if len(candidates) == 0:
+        return new_data
+    rows = candidates // data_len * data_len
+    cols = candidates - rows
+    dips = np.flatnonzero(data < smoother_data)
+    dip_idx = np.searchsorted(dips, candidates, side="right")
+    next_dip = np.append(dips, len(data))[dip_idx] - rows
+    in_reach = (next_dip - cols < max_spike_width) & (next_dip < data_len)
+    ends = np.where(in_reach, next_dip, np.minimum(cols + max_spike_width, data_len - 1))
+
+    # Scanning resumes after each spike's end point, so candidates inside an interpolated run are skipped
+    next_candidate = np.searchsorted(candidates, rows + ends, side="right").tolist()
+    spikes = []
+    k = 0
+    while k < len(candidates):
+        spikes.append(k)
+        k = next_candidate[k]
+    rows = rows[spikes]
+    cols = cols[spikes]
+    ends = ends[spikes]
+
+    # Start points are the last pixel at or below the baseline (wrapping around the row like negative indexing)
+    floor = np.flatnonzero(~(data > smoother_data))
+    floor_idx = np.searchsorted(floor, rows + cols, side="left") - 1
+    row_last_idx = np.searchsorted(floor, rows + data_len, side="left") - 1
+    in_row = (floor_idx >= 0) & (floor[np.maximum(floor_idx, 0)] >= rows)
+    starts = np.where(in_row, floor[floor_idx] - rows, floor[row_last_idx] - rows - data_len)
+
+    # Interpolate every spike at once, with the same operand types as the scalar formula m*j + b
+    idx_type = data.dtype if np.issubdtype(data.dtype, np.floating) else np.int64
+    data_start = data[rows + starts % data_len]
+    m = (data[rows + ends] - data_start) / (ends - starts).astype(idx_type)
+    b = data_start - m*starts.astype(idx_type)
+    lengths = ends - starts - 1
+    offsets = np.cumsum(lengths) - lengths
+    j = np.repeat(starts + 1 - offsets, lengths) + np.arange(lengths.sum())
+    values = np.repeat(m, lengths)*j.astype(idx_type) + np.repeat(b, lengths)
+
+    # Later spikes overwrite overlapping pixels of earlier ones
+    j = np.repeat(rows, lengths) + j % data_len
+    _, last = np.unique(j[::-1], return_index=True)
+    last = len(j) - 1 - last
+    flat_data[j[last]] = values[last]
     return new_data
 
+# Smallest stack (in values) filterSpikesBatch hands to a process pool: below it, starting the workers and pickling
+# the chunks costs more than filtering in parallel saves (see benchFilterSpikesBatch)
+POOL_MIN_VALUES = 16*1024*1024
+
+def _filterSpikesPool(stack, processes, *options):
+    chunks = np.array_split(stack, processes)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return np.concatenate(list(pool.map(_filterSpikesChunk, [(chunk,) + options for chunk in chunks])))
+
+def _filterSpikesChunk(args):
+    return filterSpikesBatch(*args)
+
+"""
+Combines a stack of frames of the same scene (n_frames along the first axis) into one frame in a single vectorized
+pass over the stack.
+method -> "mean", "median" or "sum" (the mean of the kept values times n_frames, so rejected values do not bias it)
+spikes -> "clip": drop values more than clip sigma above the per-pixel median of the stack, sigma being estimated from
+          the median absolute deviation (with fewer than 3 frames this falls back to "filter"); "filter": run
+          filterSpikesBatch (threshold and filter_options) on every frame first; None: keep every value
+@return: Returns the combined frame as float64
+"""
+def combineFrames(stack, method="mean", spikes="clip", clip=5.0, threshold=500, **filter_options):
+    if method not in ("mean", "median", "sum"):
+        raise ValueError("ERROR: unknown combine method %r" % method)
+    if spikes not in ("clip", "filter", None):
+        raise ValueError("ERROR: unknown spike rejection %r" % spikes)
+    stack = np.asarray(stack, dtype=np.float64)
+    if spikes == "clip" and len(stack) < 3:
+        spikes = "filter"
+    if spikes == "filter":
+        frames = stack.reshape(-1, stack.shape[-1])
+        stack = filterSpikesBatch(frames, threshold, **filter_options).reshape(stack.shape)
+    if method == "median":
+        return np.median(stack, axis=0)
+    if spikes == "clip":
+        median = np.median(stack, axis=0)
+        sigma = np.maximum(1.4826*np.median(np.abs(stack - median), axis=0), 1.0)
+        keep = stack <= median + clip*sigma
+        combined = np.where(keep, stack, 0.0).sum(axis=0)/keep.sum(axis=0)
+    else:
+        combined = stack.mean(axis=0)
+    return combined*len(stack) if method == "sum" else combined
+
+"""
+Fixed-size ring of preallocated frame buffers shared between an acquisition (producer) thread and one or more
+consumers. Memory stays flat: readout writes into a free slot in place, consumers receive views into that slot and
+hand the slot back with release().
+
+Producer:
+    slot = pool.acquire()           # None if every slot is still held by consumers (back-pressure)
+    ap.collect(out=pool.buffer(slot))
+    pool.commit(slot, info)
+Consumer:
+    (slot, data, info) = pool.get()
+    ...
+    pool.release(slot)
+"""
+class FramePool():
+    def __init__(self, n_slots, frame_size, dtype=np.int32, trim=12, crop=None):
+        self.buffers = np.zeros((n_slots, frame_size), dtype=dtype)
+        self.trim = trim
+        self.crop = crop
+        self.info = [None]*n_slots
+        self.free = deque(range(n_slots))
+        self.ready = deque()
+        self.cond = threading.Condition()
+        self.overruns = 0
+        self.max_pending = 0
+
+    """
+    Returns the full raw buffer of a slot, for readout to write into.
+    """
+    def buffer(self, slot):
+        return self.buffers[slot]
+
+    """
+    Returns the trimmed view of a slot handed to consumers (crop(buffer) if a crop function was given, e.g.
+    ReadoutGeometry.crop).
+    """
+    def view(self, slot):
+        if self.crop is not None:
+            return self.crop(self.buffers[slot])
+        return self.buffers[slot, self.trim:self.buffers.shape[1] - self.trim]
+
+    """
+    Takes a free slot for the producer to fill.
+    @return: Returns the slot index, or None (counted in overruns) if no slot freed up within timeout
+    """
+    def acquire(self, block=False, timeout=None):
+        with self.cond:
+            if block:
+                self.cond.wait_for(lambda: self.free, timeout)
+            if not self.free:
+                self.overruns += 1
+                return None
+            return self.free.popleft()
+
+    """
+    Publishes a filled slot to consumers, together with any per-frame info.
+    """
+    def commit(self, slot, info=None):
+        with self.cond:
+            self.info[slot] = info
+            self.ready.append(slot)
+            self.max_pending = max(self.max_pending, len(self.ready))
+            self.cond.notify_all()
+
+    """
+    Takes the oldest filled slot.
+    @return: Returns (slot, data view, info), or None if no frame arrived within timeout
+    """
+    def get(self, block=True, timeout=None):
+        with self.cond:
+            if block:
+                self.cond.wait_for(lambda: self.ready, timeout)
+            if not self.ready:
+                return None
+            slot = self.ready.popleft()
+            return (slot, self.view(slot), self.info[slot])
+
+    """
+    Hands a slot back for reuse. Views of it must not be used afterwards.
+    """
+    def release(self, slot):
+        with self.cond:
+            self.info[slot] = None
+            self.free.append(slot)
+            self.cond.notify_all()
+
+    """
+    Returns the number of committed frames not yet taken by a consumer.
+    """
+    def pending(self):
+        with self.cond:
+            return len(self.ready)
+
+    """
+    Returns the fraction of slots currently filled or held by consumers; values near 1 mean consumers are falling behind.
+    """
+    def load(self):
+        with self.cond:
+            return 1.0 - len(self.free)/len(self.buffers)
+
+EDGE_PIXELS = 12
+
+"""
+Detector readout geometry: which rows are binned into tracks and which columns are digitized and returned.
+mode -> "fvb" (the whole detector height), "single" (one track), "multi" (evenly spread tracks) or "random" (given tracks)
+track -> "single": (centre row, height); "multi": (number, height, offset); "random": [(bottom row, top row), ...]
+columns -> (first, last) detector columns (1-based, inclusive) to return; None for the calibrated window, i.e. all but
+           EDGE_PIXELS columns on each side. Must lie inside the calibrated window.
+hbin -> horizontal binning
+isolated -> "fvb" only: use isolated crop mode (iXon, Newton, iKon and iDus) instead of a binned image; the camera stops
+            digitizing after the last column, and columns before the first are dropped on the host
+Columns are cropped on the camera wherever the SDK allows it: "fvb" and "single" with columns are read as a vertically
+binned image (SetImage) of just those columns, and "multi" uses SetMultiTrackHRange; "random" tracks are cropped on the
+host. Each readout is frame_size values; crop() cuts it down to the returned pixels and wavelengths() subsets a frame's
+wavelength axis to match.
+"""
+class ReadoutGeometry():
+    MODES = {"fvb": 0, "multi": 1, "random": 2, "single": 3}
+
+    def __init__(self, mode="fvb", track=None, columns=None, hbin=1, isolated=False):
+        if mode not in self.MODES:
+            raise ValueError("ERROR: unknown readout mode %r" % mode)
+        if mode != "fvb" and track is None:
+            raise ValueError("ERROR: readout mode %r needs a track" % mode)
+        if isolated and mode != "fvb":
+            raise ValueError("ERROR: isolated crop mode applies to fvb readout only")
+        self.mode = mode
+        self.track = track
+        self.columns = columns
+        self.hbin = hbin
+        self.isolated = isolated
+        self.rows = {"fvb": 1, "single": 1, "multi": track[0] if mode == "multi" else 1,
+                     "random": len(track) if mode == "random" else 1}[mode]
+        self.frame_size = None
+
+    """
+    Sets the camera's read mode for this geometry (sdk: the atmcd object) and computes the readout layout.
+    @return: Returns the log of SDK calls, as prepFCBAcq
+    """
+    def configure(self, sdk, xpixels, ypixels):
+        ret_str = ""
+        calibrated = (EDGE_PIXELS + 1, xpixels - EDGE_PIXELS)
+        (first, last) = calibrated if self.columns is None else self.columns
+        if not calibrated[0] <= first <= last <= calibrated[1]:
+            raise ValueError("ERROR: columns must lie inside the calibrated window %d..%d" % calibrated)
+        hbin = self.hbin
+        cropped = self.columns is not None
+        # Columns the camera digitizes: a whole number of bins starting at read_first
+        read_first = first if cropped and not self.isolated and self.mode != "random" else 1
+        read_last = last if cropped and self.mode != "random" else xpixels
+        read_last = read_first + (read_last - read_first + 1)//hbin*hbin - 1
+
+        if cropped and self.mode in ("fvb", "single") and not self.isolated:
+            if self.mode == "fvb":
+                (bottom, top) = (1, ypixels)
+            else:
+                (centre, height) = self.track
+                bottom = max(centre - height//2, 1)
+                top = min(bottom + height - 1, ypixels)
+            (ret) = sdk.SetReadMode(4)
+            ret_str += "Function SetReadMode returned" + str(ret) + "mode = Image\n"
+            (ret) = sdk.SetImage(hbin, top - bottom + 1, read_first, read_last, bottom, top)
+            ret_str += "Function SetImage returned" + str(ret) + "hbin =" + str(hbin) + "vbin =" + str(top - bottom + 1) + "hstart =" + str(read_first) + "hend =" + str(read_last) + "vstart =" + str(bottom) + "vend =" + str(top) + "\n"
+        else:
+            (ret) = sdk.SetReadMode(self.MODES[self.mode])
+            ret_str += "Function SetReadMode returned" + str(ret) + "mode = " + self.mode + "\n"
+            if self.mode == "fvb":
+                (ret) = sdk.SetFVBHBin(hbin)
+                ret_str += "Function SetFVBHBin returned" + str(ret) + "bin = " + str(hbin) + "\n"
+            elif self.mode == "single":
+                (centre, height) = self.track
+                (ret) = sdk.SetSingleTrack(centre, height)
+                ret_str += "Function SetSingleTrack returned" + str(ret) + "centre = " + str(centre) + "height = " + str(height) + "\n"
+                (ret) = sdk.SetSingleTrackHBin(hbin)
+                ret_str += "Function SetSingleTrackHBin returned" + str(ret) + "bin = " + str(hbin) + "\n"
+            elif self.mode == "multi":
+                (number, height, offset) = self.track
+                (ret, bottom, gap) = sdk.SetMultiTrack(number, height, offset)
+                ret_str += "Function SetMultiTrack returned" + str(ret) + "bottom = " + str(bottom) + "gap = " + str(gap) + "\n"
+                (ret) = sdk.SetMultiTrackHBin(hbin)
+                ret_str += "Function SetMultiTrackHBin returned" + str(ret) + "bin = " + str(hbin) + "\n"
+                if cropped:
+                    (ret) = sdk.SetMultiTrackHRange(read_first, read_last)
+                    ret_str += "Function SetMultiTrackHRange returned" + str(ret) + "start = " + str(read_first) + "end = " + str(read_last) + "\n"
+            else:
+                areas = [row for track in self.track for row in track]
+                (ret) = sdk.SetRandomTracks(len(self.track), areas)
+                ret_str += "Function SetRandomTracks returned" + str(ret) + "tracks = " + str(areas) + "\n"
+                (ret) = sdk.SetCustomTrackHBin(hbin)
+                ret_str += "Function SetCustomTrackHBin returned" + str(ret) + "bin = " + str(hbin) + "\n"
+        if self.isolated:
+            (ret) = sdk.SetIsolatedCropMode(1, ypixels, read_last, 1, hbin)
+            ret_str += "Function SetIsolatedCropMode returned" + str(ret) + "mode = On width = " + str(read_last) + "\n"
+        else:
+            (ret) = sdk.SetIsolatedCropMode(0, ypixels, xpixels, 1, 1)
+            ret_str += "Function SetIsolatedCropMode returned" + str(ret) + "mode = Off\n"
+
+        # Bins returned: those lying wholly inside first..last
+        self.read_bins = (read_last - read_first + 1)//hbin
+        self.lead = -((read_first - first)//hbin)
+        self.end = (last - read_first + 1)//hbin
+        self.frame_size = self.rows*self.read_bins
+        self.first_pixel = read_first - 1 + self.lead*hbin
+        return ret_str
+
+    """
+    Cuts raw readouts (the last axis holding frame_size values each) down to the returned pixels.
+    @return: Returns a view: (..., pixels) for one-track modes, (..., rows, pixels) otherwise
+    """
+    def crop(self, data):
+        data = data.reshape(data.shape[:-1] + (self.rows, self.read_bins))[..., self.lead:self.end]
+        return data[..., 0, :] if self.mode in ("fvb", "single") else data
+
+    """
+    Subsets (and bins) a frame's calibrated wavelength axis to the returned pixels.
+    """
+    def wavelengths(self, axis):
+        start = self.first_pixel - EDGE_PIXELS
+        wavelengths = axis[start:start + (self.end - self.lead)*self.hbin]
+        return wavelengths if self.hbin == 1 else wavelengths.reshape(-1, self.hbin).mean(axis=1)
+
+"""
+Loads the wavelength calibration as a dict of frame center -> wavelength array.
+Reads the memory-mapped store written by convertWavelengthPickle (store_base + ".npy" and store_base + "_frames.npy")
+if present, so loading is near-instant and the arrays are read-only views shared between processes; otherwise falls
+back to the original pickle (store_base + ".bin").
+"""
+def loadWavelengthArrays(store_base):
+    if os.path.exists(store_base + ".npy"):
+        wavelengths = np.load(store_base + ".npy", mmap_mode="r")
+        frames = np.load(store_base + "_frames.npy")
+        return {float(frame): wavelengths[i] for i, frame in enumerate(frames)}
+    with open(store_base + ".bin", "rb") as wl_file:
+        return pickle.load(wl_file)
+
+"""
+One-time conversion of the pickled wavelength calibration to the memory-mapped store read by loadWavelengthArrays:
+a contiguous (n_frames, n_pixels) float64 matrix sorted by frame center, plus the matching frame center index.
+"""
+def convertWavelengthPickle(pickle_path, store_base):
+    with open(pickle_path, "rb") as wl_file:
+        arrays = pickle.load(wl_file)
+    frames = np.array(sorted(arrays), dtype=np.float64)
+    wavelengths = np.array([arrays[frame] for frame in sorted(arrays)], dtype=np.float64)
+    np.save(store_base + ".npy", np.ascontiguousarray(wavelengths))
+    np.save(store_base + "_frames.npy", frames)
+
+"""
+Pixel-to-wavelength model fitted to the stored calibration arrays: the wavelength of every pixel is a polynomial of
+the given degree in the frame center wavelength. Gives wavelength axes for arbitrary center wavelengths inside the
+calibrated range; max_residual is the largest deviation (nm) from the stored arrays.
+"""
+class DispersionModel():
+    def __init__(self, wavelength_arrays, degree=3, cache_size=256):
+        frames = np.array(sorted(wavelength_arrays), dtype=np.float64)
+        wavelengths = np.array([wavelength_arrays[frame] for frame in sorted(wavelength_arrays)], dtype=np.float64)
+        self.center_min = frames[0]
+        self.center_max = frames[-1]
+        self.offset = frames.mean()
+        self.scale = frames[-1] - frames[0]
+        self.coefs = np.polyfit((frames - self.offset)/self.scale, wavelengths, degree)
+        self.max_residual = float(np.abs(self.axes(frames) - wavelengths).max())
+        self.axis = lru_cache(maxsize=cache_size)(self._axis)
+
+    """
+    Evaluates the wavelength axes for an array of center wavelengths.
+    @return: Returns an (n_centers, n_pixels) array
+    """
+    def axes(self, centers):
+        x = ((np.asarray(centers, dtype=np.float64) - self.offset)/self.scale)[:, np.newaxis]
+        wavelengths = np.repeat(self.coefs[:1], len(x), axis=0)
+        for coef in self.coefs[1:]:
+            wavelengths = wavelengths*x + coef
+        return wavelengths
+
+    """
+    Finds the center wavelength whose axis starts (pixel 0) at wavelength.
+    """
+    def centerStartingAt(self, wavelength, iterations=4):
+        center = wavelength + (self.axes([wavelength])[0, -1] - wavelength)/2
+        for i in range(iterations):
+            center += wavelength - self.axes([center])[0, 0]
+        return center
+
+    """
+    Returns the (read-only, cached) wavelength axis for a single center wavelength.
+    """
+    def _axis(self, center):
+        wavelengths = self.axes([center])[0]
+        wavelengths.setflags(write=False)
+        return wavelengths
+
+"""
+Stitches sweep frames into one continuous spectrum on a common wavelength grid. Frames can be added as they stream in
+and spectrum() can be called at any time for a live view.
+Each frame is resampled onto the grid and owns the wavelengths closer to its center (the pixel given by the MIDPOINTS
+model) than to its neighbours' centers; within blend nm of each cut both frames contribute with linearly ramped
+weights. Where the owning frame has no data, the other frames covering that wavelength are averaged instead.
+grid is a fixed wavelength grid; if None, a uniform grid spanning all frames at the given step (default: the median
+pixel spacing of the first frame) is used.
+first_pixel, hbin: detector column (0-based) of the first pixel of the frames and their horizontal binning, to locate
+mp in them; the defaults match the default readout (use readout.first_pixel and readout.hbin for other geometries)
+"""
+class SpectrumStitcher():
+    def __init__(self, grid=None, step=None, blend=1.0, first_pixel=EDGE_PIXELS, hbin=1):
+        self.grid = None if grid is None else np.asarray(grid, dtype=np.float64)
+        self.step = step
+        self.blend = blend
+        self.first_pixel = first_pixel
+        self.hbin = hbin
+        self.frames = []
+        self.centers = []
+        self.resampled = []
+        self.resampled_grid = None
+
+    """
+    Adds one frame: counts data, its wavelength array and its center pixel mp (as returned by collect or sweep).
+    """
+    def add(self, data, wl_arr, mp):
+        wl_arr = np.asarray(wl_arr, dtype=np.float64)
+        self.frames.append((np.asarray(data, dtype=np.float64), wl_arr))
+        # mp counts from the first raw pixel; data and wl_arr start at first_pixel and are binned by hbin
+        index = (mp - self.first_pixel - (self.hbin - 1)/2)/self.hbin
+        self.centers.append(np.interp(index, np.arange(len(wl_arr)), wl_arr))
+
+    """
+    Adds a SweepFrame.
+    """
+    def addFrame(self, frame):
+        self.add(frame.data, frame.wl_arr, frame.mp)
+
+    def currentGrid(self):
+        if self.grid is not None:
+            return self.grid
+        step = self.step if self.step is not None else float(np.median(np.diff(self.frames[0][1])))
+        lo = min(wl_arr[0] for data, wl_arr in self.frames)
+        hi = max(wl_arr[-1] for data, wl_arr in self.frames)
+        return lo + step*np.arange(int(np.floor((hi - lo)/step)) + 1)
+
+    """
+    @return: Returns (grid, counts) for all frames added so far; counts is NaN where no frame has data
+    """
+    def spectrum(self):
+        if not self.frames:
+            raise ValueError("ERROR: no frames added")
+        grid = self.currentGrid()
+        if self.resampled_grid is None or not np.array_equal(grid, self.resampled_grid):
+            self.resampled = []
+            self.resampled_grid = grid
+        for data, wl_arr in self.frames[len(self.resampled):]:
+            self.resampled.append(np.interp(grid, wl_arr, data, left=np.nan, right=np.nan))
+
+        order = np.argsort(self.centers)
+        centers = np.asarray(self.centers)[order]
+        resampled = np.array(self.resampled)[order]
+        valid = ~np.isnan(resampled)
+
+        # Ownership cuts halfway between neighbouring frame centers, ramped over the blend band
+        cuts = (centers[:-1] + centers[1:])/2
+        lo = np.concatenate(([-np.inf], cuts))[:, np.newaxis]
+        hi = np.concatenate((cuts, [np.inf]))[:, np.newaxis]
+        if self.blend > 0:
+            half = self.blend/2
+            weights = np.clip((grid - lo + half)/self.blend, 0, 1)*np.clip((hi + half - grid)/self.blend, 0, 1)
+        else:
+            weights = ((grid >= lo) & (grid < hi)).astype(np.float64)
+        weights = np.where(valid, weights, 0.0)
+        uncovered = weights.sum(axis=0) == 0
+        weights[:, uncovered] = valid[:, uncovered]
+
+        total = weights.sum(axis=0)
+        counts = np.where(valid, resampled, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            counts = (weights*counts).sum(axis=0)/total
+        counts[total == 0] = np.nan
+        return (grid, counts)
+
+"""
+Stitches a complete sweep (an iterable of SweepFrames) into one spectrum.
+@return: Returns (grid, counts) as SpectrumStitcher.spectrum
+"""
+def stitchSweep(frames, grid=None, step=None, blend=1.0, first_pixel=EDGE_PIXELS, hbin=1):
+    stitcher = SpectrumStitcher(grid, step, blend, first_pixel, hbin)
+    for frame in frames:
+        stitcher.addFrame(frame)
+    return stitcher.spectrum()
+
+"""
+Selects the frames of a sorted frame grid needed to cover each (start, end) wavelength window: for every window, the
+last frame at or below start through the first frame at or above end (as the original initSweep scan did).
+@return: Returns the sorted indices of the union of the selected frames
+"""
+def selectFrames(frames, windows):
+    frames = np.asarray(frames)
+    windows = np.asarray(windows, dtype=np.float64).reshape(-1, 2)
+    frame_start = np.maximum(np.searchsorted(frames, windows[:, 0], side="right") - 1, 0)
+    frame_end = np.maximum(np.minimum(np.searchsorted(frames, windows[:, 1], side="left"), len(frames) - 1), frame_start)
+    coverage = np.zeros(len(frames) + 1, dtype=np.int64)
+    np.add.at(coverage, frame_start, 1)
+    np.add.at(coverage, frame_end + 1, -1)
+    return np.flatnonzero(np.cumsum(coverage[:-1]) > 0)
+
+"""
+A precomputed sweep: the frame center wavelengths to visit, in order, and the wavelength windows they were planned for.
+"""
+class SweepPlan():
+    def __init__(self, targets, windows):
+        self.targets = np.asarray(targets, dtype=np.float64)
+        self.windows = np.asarray(windows, dtype=np.float64).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def save(self, path):
+        np.savez(path, targets=self.targets, windows=self.windows)
+
+def loadSweepPlan(path):
+    with np.load(path) as plan:
+        return SweepPlan(plan["targets"], plan["windows"])
+
+AcquisitionEvent = namedtuple("AcquisitionEvent", ["time", "series", "status"])
+
+"""
+Background thread that waits for camera acquisition events and posts them, as AcquisitionEvent(perf_counter time,
+frames acquired in the series, camera status), to concurrent futures handed out by future() and to a queue of the last
+history events. The SDK wait runs in WaitForAcquisitionTimeOut slices of slice_ms; ctypes releases the GIL for the
+duration of each call, so the control loop keeps running while the camera exposes.
+While the waiter runs it consumes the SDK's acquisition events. Like the SDK, it keeps the last event that no future
+was waiting for until claim() takes it; AndorPrinceton.waitAcq goes through claim() while the waiter runs.
+"""
+class AcquisitionWaiter():
+    def __init__(self, sdk, slice_ms=100, history=1024):
+        self.sdk = sdk
+        self.slice_ms = slice_ms
+        self.events = queue.Queue(maxsize=history)
+        self.futures = []
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.count = 0
+        self.dropped = 0
+        self.unclaimed = None
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name="AcquisitionWaiter", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.sdk.CancelWait()
+            self.thread.join()
+        self.cancel()
+
+    def isRunning(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def run(self):
+        while not self.stopping.is_set():
+            t0 = time.perf_counter()
+            ret = self.sdk.WaitForAcquisitionTimeOut(self.slice_ms)
+            if ret == atmcd.atmcd.DRV_SUCCESS:
+                self.post()
+            elif time.perf_counter() - t0 < self.slice_ms/2000:
+                # The SDK returned at once (e.g. not initialized); don't spin on it
+                self.stopping.wait(self.slice_ms/1000)
+
+    def post(self):
+        (ret, acc, series) = self.sdk.GetAcquisitionProgress()
+        (ret, status) = self.sdk.GetStatus()
+        event = AcquisitionEvent(time.perf_counter(), series, status)
+        with self.lock:
+            (futures, self.futures) = (self.futures, [])
+            self.count += 1
+            if self.events.full():
+                self.events.get_nowait()
+                self.dropped += 1
+            self.events.put_nowait(event)
+        delivered = False
+        for future in futures:
+            if future.set_running_or_notify_cancel():
+                future.set_result(event)
+                delivered = True
+        if not delivered:
+            with self.lock:
+                self.unclaimed = event
+
+    """
+    @return: Returns a concurrent.futures.Future resolved with the next AcquisitionEvent (asyncio.wrap_future makes it
+             awaitable). Cancelling the future withdraws it.
+    """
+    def future(self):
+        future = Future()
+        with self.lock:
+            self.futures.append(future)
+        return future
+
+    """
+    Blocks for the next acquisition event.
+    @return: Returns the AcquisitionEvent, or None on timeout or cancel()
+    """
+    def wait(self, timeout=None):
+        future = self.future()
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            return None
+        except CancelledError:
+            return None
+
+    """
+    Takes the event no future was waiting for, if there is one, or else waits for the next event (like the SDK's
+    WaitForAcquisition).
+    @return: Returns the AcquisitionEvent, or None on timeout or cancel()
+    """
+    def claim(self, timeout=None):
+        with self.lock:
+            (event, self.unclaimed) = (self.unclaimed, None)
+            if event is None:
+                future = Future()
+                self.futures.append(future)
+        if event is not None:
+            return event
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            return None
+        except CancelledError:
+            return None
+
+    """
+    Forgets the unclaimed event, e.g. before starting an acquisition.
+    """
+    def clear(self):
+        with self.lock:
+            self.unclaimed = None
+
+    """
+    Awaitable version of wait.
+    @return: Returns the AcquisitionEvent, or None on timeout or cancel()
+    """
+    async def waitAsync(self, timeout=None):
+        import asyncio
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.future()), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            return None
+
+    """
+    Takes the oldest queued event.
+    @return: Returns the AcquisitionEvent, or None if none arrived within timeout
+    """
+    def get(self, timeout=None):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    """
+    Cancels every pending future and interrupts the current SDK wait (the waiter keeps running).
+    """
+    def cancel(self):
+        with self.lock:
+            (futures, self.futures) = (self.futures, [])
+        for future in futures:
+            future.cancel()
+        self.sdk.CancelWait()
+
+"""
+Background thread sampling the detector temperature (GetTemperatureF) every interval seconds into a ring buffer of the
+last history samples. The latest reading is available without a DLL call, and callers can block (or await) until the
+SDK reports DRV_TEMP_STABILIZED. Samples the camera refuses during an acquisition (DRV_ACQUIRING) are not recorded.
+"""
+class TemperatureMonitor():
+    def __init__(self, sdk, interval=1.0, history=3600):
+        self.sdk = sdk
+        self.interval = interval
+        self.times = np.zeros(history, dtype=np.float64)
+        self.temps = np.zeros(history, dtype=np.float32)
+        self.codes = np.zeros(history, dtype=np.int32)
+        self.count = 0
+        self.cond = threading.Condition()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name="TemperatureMonitor", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def isRunning(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def run(self):
+        while not self.stopping.is_set():
+            (ret, temp) = self.sdk.GetTemperatureF()
+            if ret != atmcd.atmcd.DRV_ACQUIRING:
+                with self.cond:
+                    i = self.count % len(self.times)
+                    self.times[i] = time.time()
+                    self.temps[i] = temp
+                    self.codes[i] = ret
+                    self.count += 1
+                    self.cond.notify_all()
+            self.stopping.wait(self.interval)
+
+    """
+    @return: Returns (timestamp, temperature, status code) of the latest sample, or None if there is none yet
+    """
+    def latest(self):
+        with self.cond:
+            if self.count == 0:
+                return None
+            i = (self.count - 1) % len(self.times)
+            return (float(self.times[i]), float(self.temps[i]), int(self.codes[i]))
+
+    """
+    @return: Returns (timestamps, temperatures, status codes) of the buffered samples, oldest first
+    """
+    def getHistory(self):
+        with self.cond:
+            n = min(self.count, len(self.times))
+            order = (np.arange(self.count - n, self.count)) % len(self.times)
+            return (self.times[order], self.temps[order], self.codes[order])
+
+    def isStable(self):
+        sample = self.latest()
+        return sample is not None and sample[2] == atmcd.atmcd.DRV_TEMP_STABILIZED
+
+    """
+    Blocks until the latest sample reports DRV_TEMP_STABILIZED.
+    @return: Returns True if stabilized, False on timeout
+    """
+    def waitStable(self, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(self.isStableLocked, timeout)
+
+    """
+    Awaitable version of waitStable; checks the buffered samples only, so the event loop never waits on the DLL.
+    """
+    async def waitStableAsync(self, timeout=None):
+        import asyncio
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self.isStable():
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            await asyncio.sleep(min(self.interval, 0.1))
+        return True
+
+    def isStableLocked(self):
+        return self.count > 0 and self.codes[(self.count - 1) % len(self.codes)] == atmcd.atmcd.DRV_TEMP_STABILIZED
+
+"""
+One frame of a spectrometer sweep.
+target -> Frame center wavelength requested (key into the wavelength arrays)
+spec_wl -> Spectrometer center wavelength reported after the move
+mp -> Spectrometer center pixel
+data -> Camera counts array
+wl_arr -> Wavelength array
+"""
+SweepFrame = namedtuple("SweepFrame", ["target", "spec_wl", "mp", "data", "wl_arr"])
+
+"""
+Wall-clock breakdown (seconds) of one pipelinedSweep frame.
+move -> Grating move and wavelength query before the exposure started (first frame only; overlapped afterwards)
+exposure -> Exposure time before the next move was issued
+readout -> Readout and data transfer, overlapped with the next move
+move_wait -> Time spent waiting for the next move to finish after readout
+total -> Total time for the frame
+"""
+FrameTiming = namedtuple("FrameTiming", ["move", "exposure", "readout", "move_wait", "total"])
+
+"""
+Camera readout settings, each with its SDK index where it has one.
+channel -> AD channel
+amplifier -> Output amplifier type
+hs_index, hs_speed -> Horizontal shift speed (MHz)
+vs_index, vs_speed -> Vertical shift speed (microseconds per row)
+preamp_index, preamp_gain -> Pre-amp gain (None if the camera has none)
+"""
+ReadoutSpeed = namedtuple("ReadoutSpeed", ["channel", "amplifier", "hs_index", "hs_speed", "vs_index", "vs_speed",
+                                           "preamp_index", "preamp_gain"])
+
+"""
+Times (seconds) for the current settings, from GetReadOutTime and GetAcquisitionTimings.
+"""
+ReadoutTimings = namedtuple("ReadoutTimings", ["readout", "exposure", "accumulate", "kinetic"])
+
 class AndorPrinceton():
     FRAMES = [
         500.000,
@@ -96,23 +927,38 @@ class AndorPrinceton():
 
     MIDPOINTS = np.poly1d(np.array([-2.27116816e-02,  5.42828888e+02]))
     
-    def __init__(self, com_port):
+    """
+    com_port: serial port name of the spectrometer, or an already open port object (e.g. a simulated one)
+    sdk_backend: Andor SDK backend passed to atmcd (e.g. "simulated"); None loads the native library
+    sdk: an already initialized SDK object to use instead, e.g. a CameraManager session for one of several cameras
+    """
+    def __init__(self, com_port, sdk_backend=None, sdk=None):
         self.frame_idx = 0
         self.frame_targets = []
+        self.kinetic_frames = None
+        self.dispersion = None
+        self.frame_grid = np.array(self.FRAMES)
+        self.temp_monitor = None
+        self.acq_waiter = None
+        self.readout = ReadoutGeometry()
+        self.readout_speeds = None
+        self.readout_speed = None
+        self.accumulations = 1
 
         # Retrieve wavelength arrays for each frame
         script_dir = os.path.dirname(__file__)
-        rel_path = "AndorPrinceton_wavelengths.bin"
-        wl_arr_file_path = os.path.join(script_dir, rel_path)
-        wl_file = open(wl_arr_file_path, "rb")
-        self.WAVELENGTH_ARRAYS = pickle.load(wl_file)
-        wl_file.close()
+        rel_path = "AndorPrinceton_wavelengths"
+        self.WAVELENGTH_ARRAYS = loadWavelengthArrays(os.path.join(script_dir, rel_path))
 
         # Andor initialization
         print("Intializing camera...")
-        self.sdkObject = atmcd.atmcd() #load the atmcd library
-        (ret) = self.sdkObject.Initialize("/usr/local/etc/andor") #initialise camera
-        print("Initialize camera returned:",ret)
+        if sdk is None:
+            self.sdkObject = atmcd.atmcd(backend=sdk_backend) #load the atmcd library
+            (ret) = self.sdkObject.Initialize("/usr/local/etc/andor") #initialise camera
+            print("Initialize camera returned:",ret)
+        else:
+            self.sdkObject = sdk
+            ret = atmcd.atmcd.DRV_SUCCESS
         if atmcd.atmcd.DRV_SUCCESS == ret:
             (ret, iSerialNumber) = self.sdkObject.GetCameraSerialNumber()
             print("GetCameraSerialNumber returned:",ret,"Serial No:",iSerialNumber)
@@ -122,28 +968,67 @@ class AndorPrinceton():
             print("Function CoolerON returned:",ret)
 
         # Princeton initialization
-        self.spec=serial.Serial(port=com_port,baudrate=9600,parity=serial.PARITY_NONE,stopbits=serial.STOPBITS_ONE,bytesize=serial.EIGHTBITS,timeout=1)
-        self.spec.write(b'1 TURRET\r')
-        self.spec.readline().decode()
+        from PrincetonProtocol import PrincetonProtocol
+        if isinstance(com_port, str):
+            import serial
+            self.spec=serial.Serial(port=com_port,baudrate=9600,parity=serial.PARITY_NONE,stopbits=serial.STOPBITS_ONE,bytesize=serial.EIGHTBITS,timeout=0.05)
+        else:
+            self.spec = com_port
+        self.protocol = PrincetonProtocol(self.spec)
+        self.move_pending = False
+        self.invalidateState()
+        self.setTurret(1)
 
     """
     Initializes the spectrometer sweep array
     """
     def initSweep(self, wavelength_start, wavelength_end):
-        frame_start = 0
-        while frame_start + 1 < len(self.FRAMES):
-            if self.FRAMES[frame_start + 1] > wavelength_start:
-                break
-            frame_start += 1
-        frame_end = len(self.FRAMES) - 1
-        while frame_end > frame_start:
-            if self.FRAMES[frame_end - 1] < wavelength_end:
-                break
-            frame_end -= 1
-        self.frame_targets = self.FRAMES[frame_start:frame_end+1]
+        return self.useSweepPlan(self.planSweep([(wavelength_start, wavelength_end)]))
+
+    """
+    Plans a sweep over one or more (start, end) wavelength windows on the current frame grid (or on frames, if given).
+    Frames needed by several windows are visited once, in increasing wavelength order.
+    """
+    def planSweep(self, windows, frames=None):
+        frames = self.frame_grid if frames is None else np.sort(np.asarray(frames, dtype=np.float64))
+        return SweepPlan(frames[selectFrames(frames, windows)], windows)
+
+    """
+    Makes plan the current sweep (for collect) and returns its frame targets.
+    """
+    def useSweepPlan(self, plan):
+        self.frame_targets = plan.targets.tolist()
         self.frame_idx = 0
         return self.frame_targets
 
+    """
+    Replaces the frame grid used by initSweep and planSweep (default FRAMES). Frame centers without a stored
+    calibration array use the fitted DispersionModel.
+    """
+    def setFrameGrid(self, frames):
+        self.frame_grid = np.sort(np.asarray(frames, dtype=np.float64))
+
+    """
+    Generates a frame grid covering wavelength_start to wavelength_end in which consecutive frames overlap by the given
+    fraction of a frame's wavelength span (0 <= overlap < 1).
+    """
+    def makeFrameGrid(self, wavelength_start, wavelength_end, overlap=0.0):
+        if not 0 <= overlap < 1:
+            raise ValueError("ERROR: overlap must be in [0, 1), got %r" % overlap)
+        if wavelength_start > wavelength_end:
+            raise ValueError("ERROR: wavelength_start %r is past wavelength_end %r" % (wavelength_start, wavelength_end))
+        if self.dispersion is None:
+            self.dispersion = DispersionModel(self.WAVELENGTH_ARRAYS)
+        model = self.dispersion
+        center = min(max(model.centerStartingAt(wavelength_start), model.center_min), model.center_max)
+        frames = [center]
+        axis = model.axes([center])[0]
+        while axis[-1] < wavelength_end and center < model.center_max:
+            center = min(model.centerStartingAt(axis[-1] - overlap*(axis[-1] - axis[0])), model.center_max)
+            frames.append(center)
+            axis = model.axes([center])[0]
+        return np.array(frames)
+
     """
     Returns a 5-tuple consisting of...
     bool  -> True if data collection occurred, False otherwise (indicates end of spectrometer sweep - all other values will return None)
@@ -151,44 +1036,274 @@ class AndorPrinceton():
     int   -> Spectrometer center pixel
     array -> Camera counts array
     array -> Wavelength array
+    during: callable run while the camera exposes, as in acquireFrame
     """
-    def collect(self):
+    def collect(self, out=None, during=None):
         if self.frame_idx < len(self.frame_targets):
-            self.setWavelength(self.frame_targets[self.frame_idx])
-            spec_wl = float(self.getWavelength())
-            mp = int(round(self.MIDPOINTS(spec_wl)))
-            self.startAcq()
-            self.waitAcq()
-            data = self.collectData()
-            wl_arr = self.WAVELENGTH_ARRAYS[self.frame_targets[self.frame_idx]]
+            target = self.frame_targets[self.frame_idx]
+            frame = self.acquireFrame(target, self.moveTo(target), out, during)
             self.frame_idx += 1
-            return (True, spec_wl, mp, data, wl_arr)
+            return (True, frame.spec_wl, frame.mp, frame.data, frame.wl_arr)
         else:
             return (False,None,None,None,None)
 
+    """
+    Runs a sweep from wavelength_start to wavelength_end (frames chosen as in initSweep), or over a SweepPlan, and yields
+    one SweepFrame per frame. With prefetch=True the grating starts moving to the next frame as soon as a frame has been read out, so the
+    move overlaps with whatever the caller does with the frame; the spectrometer must not be used by the caller until
+    it asks for the next frame.
+    """
+    def sweep(self, wavelength_start=None, wavelength_end=None, prefetch=False, plan=None):
+        targets = self.initSweep(wavelength_start, wavelength_end) if plan is None else self.useSweepPlan(plan)
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        move = None
+        try:
+            for target in targets:
+                spec_wl = self.moveTo(target) if move is None else move.result()
+                frame = self.acquireFrame(target, spec_wl)
+                self.frame_idx += 1
+                if executor is not None and self.frame_idx < len(targets):
+                    move = executor.submit(self.moveTo, targets[self.frame_idx])
+                yield frame
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    """
+    Runs a sweep like sweep(), but issues the GOTO for frame N+1 as soon as frame N's exposure time has elapsed, so the
+    CCD readout and data transfer of frame N overlap with the grating move. exposure_margin (seconds) is added to the
+    exposure time reported by GetAcquisitionTimings to cover shutter and keep-clean delays before moving. In
+    accumulate mode (prepAccumulateAcq) the move waits for the last accumulation's exposure.
+    Yields (SweepFrame, FrameTiming) pairs; the timings exclude the time the caller spends between frames.
+    """
+    def pipelinedSweep(self, wavelength_start=None, wavelength_end=None, exposure_margin=0.005, plan=None):
+        targets = self.initSweep(wavelength_start, wavelength_end) if plan is None else self.useSweepPlan(plan)
+        (ret, exposure, accumulate, kinetic) = self.sdkObject.GetAcquisitionTimings()
+        exposed = (self.accumulations - 1)*accumulate + exposure
+        t_move = time.perf_counter()
+        spec_wl = self.moveTo(targets[0]) if targets else None
+        try:
+            for target in targets:
+                t_start = time.perf_counter()
+                self.startAcq()
+                time.sleep(max(0.0, t_start + exposed + exposure_margin - time.perf_counter()))
+                t_exposed = time.perf_counter()
+                self.frame_idx += 1
+                if self.frame_idx < len(targets):
+                    self.startMove(targets[self.frame_idx])
+                self.waitAcq()
+                data = self.collectData()
+                t_read = time.perf_counter()
+                mp = int(round(self.MIDPOINTS(spec_wl)))
+                frame = SweepFrame(target, spec_wl, mp, data, self.readout.wavelengths(self.wavelengthAxis(target)))
+                if self.frame_idx < len(targets):
+                    spec_wl = float(self.waitMove())
+                t_done = time.perf_counter()
+                yield (frame, FrameTiming(t_start - t_move, t_exposed - t_start, t_read - t_exposed, t_done - t_read, t_done - t_move))
+                t_move = time.perf_counter()
+        finally:
+            # Read the reply to a GOTO still in flight, so the next command is not answered with it
+            if self.move_pending:
+                self.waitMove()
+
+    """
+    Moves the grating to a frame center wavelength.
+    @return: Returns the center wavelength reported by the spectrometer after the move
+    """
+    def moveTo(self, target):
+        self.setWavelength(target)
+        return float(self.getWavelength())
+
+    """
+    Acquires and reads out one frame with the grating already at target (spec_wl as reported by the spectrometer).
+    during: callable run while the camera exposes (e.g. to step a stage or the laser); it is passed the Future of
+    startAcqFuture, so it can keep working until future.done()
+    """
+    def acquireFrame(self, target, spec_wl, out=None, during=None):
+        mp = int(round(self.MIDPOINTS(spec_wl)))
+        if during is None:
+            self.startAcq()
+            self.waitAcq()
+        else:
+            future = self.startAcqFuture()
+            during(future)
+            future.result()
+        data = self.collectData(out)
+        return SweepFrame(target, spec_wl, mp, data, self.readout.wavelengths(self.wavelengthAxis(target)))
+
     def getWavelengthArrays(self):
         return self.WAVELENGTH_ARRAYS
 
+    """
+    Returns the wavelength array for a frame center: the stored calibration array if there is one, otherwise the axis
+    from the fitted DispersionModel (built on first use).
+    """
+    def wavelengthAxis(self, center):
+        if center in self.WAVELENGTH_ARRAYS:
+            return self.WAVELENGTH_ARRAYS[center]
+        if self.dispersion is None:
+            self.dispersion = DispersionModel(self.WAVELENGTH_ARRAYS)
+        if not self.dispersion.center_min <= center <= self.dispersion.center_max:
+            raise ValueError("center wavelength %s is outside the calibrated range" % center)
+        return self.dispersion.axis(float(center))
+
     def setTemp(self, temp):
         (ret) = self.sdkObject.SetTemperature(temp)
         return ret
 
+    """
+    Returns the detector temperature; the latest monitor sample if the temperature monitor is running.
+    """
     def readTemp(self):
+        if self.temp_monitor is not None and self.temp_monitor.isRunning():
+            sample = self.temp_monitor.latest()
+            if sample is not None:
+                return sample[1]
         (ret, temp) = self.sdkObject.GetTemperature()
         return float(temp)
 
+    """
+    Starts (or restarts) the background TemperatureMonitor sampling every interval seconds.
+    """
+    def startTempMonitor(self, interval=1.0, history=3600):
+        if self.temp_monitor is not None:
+            self.temp_monitor.stop()
+        self.temp_monitor = TemperatureMonitor(self.sdkObject, interval, history)
+        self.temp_monitor.start()
+        return self.temp_monitor
+
+    def stopTempMonitor(self):
+        if self.temp_monitor is not None:
+            self.temp_monitor.stop()
+
+    """
+    Blocks until the detector temperature has stabilized (starting the temperature monitor if needed).
+    @return: Returns True if stabilized, False on timeout
+    """
+    def waitTempStable(self, timeout=None):
+        if self.temp_monitor is None or not self.temp_monitor.isRunning():
+            self.startTempMonitor()
+        return self.temp_monitor.waitStable(timeout)
+
     def setExposure(self, exposure):
         (ret) = self.sdkObject.SetExposureTime(exposure)
         return ret
 
-    def prepFCBAcq(self):
-        ret_str = ""
-        
-        (ret) = self.sdkObject.SetAcquisitionMode(1)
-        ret_str += "Function SetAcquisitionMode returned" + str(ret) + "mode = Single Scan\n"
+    """
+    Sets the readout geometry used by the next prepFCBAcq or prepKineticAcq (see ReadoutGeometry; the default is full
+    vertical binning with the edge pixels trimmed on the host). Reading fewer rows and columns shortens the readout.
+    Frames are returned cropped to the selected columns, with their wavelength arrays subset to match.
+    @return: Returns the ReadoutGeometry
+    """
+    def setReadout(self, mode="fvb", track=None, columns=None, hbin=1, isolated=False):
+        self.readout = ReadoutGeometry(mode, track, columns, hbin, isolated)
+        return self.readout
+
+    """
+    Enumerates the camera's readout speeds. Cached after the first query unless refresh is True.
+    @return: Returns a dict of
+        "hs" -> (channel, amplifier, index, speed in MHz, bit depth) for every horizontal shift speed
+        "vs" -> vertical shift speeds (microseconds per row) by index
+        "vs_recommended" -> index of the fastest recommended vertical shift speed
+        "preamp" -> pre-amp gains by index
+        "amplifiers" -> number of output amplifiers
+    """
+    def getReadoutSpeeds(self, refresh=False):
+        if self.readout_speeds is None or refresh:
+            sdk = self.sdkObject
+            (ret, n_channels) = sdk.GetNumberADChannels()
+            (ret, n_amplifiers) = sdk.GetNumberAmp()
+            hs = []
+            for channel in range(n_channels):
+                (ret, depth) = sdk.GetBitDepth(channel)
+                for amplifier in range(n_amplifiers):
+                    (ret, n_speeds) = sdk.GetNumberHSSpeeds(channel, amplifier)
+                    for index in range(n_speeds):
+                        (ret, speed) = sdk.GetHSSpeed(channel, amplifier, index)
+                        hs.append((channel, amplifier, index, speed, depth))
+            (ret, n_speeds) = sdk.GetNumberVSSpeeds()
+            vs = [sdk.GetVSSpeed(index)[1] for index in range(n_speeds)]
+            (ret, vs_recommended, speed) = sdk.GetFastestRecommendedVSSpeed()
+            (ret, n_gains) = sdk.GetNumberPreAmpGains()
+            preamp = [sdk.GetPreAmpGain(index)[1] for index in range(n_gains)]
+            self.readout_speeds = {"hs": hs, "vs": vs, "vs_recommended": vs_recommended, "preamp": preamp,
+                                   "amplifiers": n_amplifiers}
+        return self.readout_speeds
+
+    """
+    Picks the settings of a named readout profile:
+    "fastest" -> the highest horizontal shift speed on any AD channel and amplifier
+    "lowest-noise" -> the lowest horizontal shift speed on the AD channel with the largest bit depth
+    Both use the fastest recommended vertical shift speed and the highest pre-amp gain available at the chosen
+    horizontal speed, which gives the lowest read noise in electrons.
+    @return: Returns a ReadoutSpeed
+    """
+    def chooseReadoutProfile(self, profile):
+        speeds = self.getReadoutSpeeds()
+        if profile == "fastest":
+            (channel, amplifier, hs_index, hs_speed, depth) = max(speeds["hs"], key=lambda hs: (hs[3], hs[4]))
+        elif profile == "lowest-noise":
+            (channel, amplifier, hs_index, hs_speed, depth) = min(speeds["hs"], key=lambda hs: (-hs[4], hs[3]))
+        else:
+            raise ValueError("ERROR: unknown readout profile %r" % profile)
+        gains = [index for index in range(len(speeds["preamp"]))
+                 if self.sdkObject.IsPreAmpGainAvailable(channel, amplifier, hs_index, index)[1]]
+        preamp_index = max(gains, key=lambda index: speeds["preamp"][index]) if gains else None
+        vs_index = speeds["vs_recommended"]
+        return ReadoutSpeed(channel, amplifier, hs_index, hs_speed, vs_index, speeds["vs"][vs_index], preamp_index,
+                            None if preamp_index is None else speeds["preamp"][preamp_index])
+
+    """
+    Applies a named readout profile (see chooseReadoutProfile) or a ReadoutSpeed. Set it before prepFCBAcq or
+    prepKineticAcq; getReadoutTimings then reports what it costs.
+    @return: Returns the applied ReadoutSpeed
+    """
+    def setReadoutProfile(self, profile):
+        speed = self.chooseReadoutProfile(profile) if isinstance(profile, str) else profile
+        sdk = self.sdkObject
+        calls = [("SetADChannel", lambda: sdk.SetADChannel(speed.channel))]
+        if self.getReadoutSpeeds()["amplifiers"] > 1:
+            calls.append(("SetOutputAmplifier", lambda: sdk.SetOutputAmplifier(speed.amplifier)))
+        calls.append(("SetHSSpeed", lambda: sdk.SetHSSpeed(speed.amplifier, speed.hs_index)))
+        calls.append(("SetVSSpeed", lambda: sdk.SetVSSpeed(speed.vs_index)))
+        if speed.preamp_index is not None:
+            calls.append(("SetPreAmpGain", lambda: sdk.SetPreAmpGain(speed.preamp_index)))
+        for (name, call) in calls:
+            ret = call()
+            if ret != atmcd.atmcd.DRV_SUCCESS:
+                raise Exception("ERROR: %s returned %d" % (name, ret))
+        self.readout_speed = speed
+        return speed
+
+    """
+    @return: Returns the ReadoutTimings of the current readout settings and acquisition setup
+    """
+    def getReadoutTimings(self):
+        (ret, readout) = self.sdkObject.GetReadOutTime()
+        (ret, exposure, accumulate, kinetic) = self.sdkObject.GetAcquisitionTimings()
+        return ReadoutTimings(readout, exposure, accumulate, kinetic)
+
+    """
+    Applies each readout profile in turn and reads its timings, then restores the profile set before (if any).
+    @return: Returns a dict of profile -> (ReadoutSpeed, ReadoutTimings)
+    """
+    def compareReadoutProfiles(self, profiles=("fastest", "lowest-noise")):
+        previous = self.readout_speed
+        results = {}
+        for profile in profiles:
+            speed = self.setReadoutProfile(profile)
+            results[profile] = (speed, self.getReadoutTimings())
+        if previous is not None:
+            self.setReadoutProfile(previous)
+        return results
 
-        (ret) = self.sdkObject.SetReadMode(0)
-        ret_str += "Function SetReadMode returned" + str(ret) + "mode = FVB\n"
+    """
+    Common end of the prep*Acq functions: internal trigger, the current readout geometry (setReadout), then
+    PrepareAcquisition.
+    @return: Returns the log of the SDK calls
+    """
+    def _prepTriggerAndReadout(self):
+        ret_str = ""
 
         (ret) = self.sdkObject.SetTriggerMode(0)
         ret_str += "Function SetTriggerMode returned" + str(ret) + "mode = Internal\n"
@@ -196,8 +1311,7 @@ class AndorPrinceton():
         (ret, self.xpixels, self.ypixels) = self.sdkObject.GetDetector()
         ret_str += "Function GetDetector returned" + str(ret) + "xpixels =" + str(self.xpixels) + "ypixels =" + str(self.ypixels) + "\n"
 
-        (ret) = self.sdkObject.SetImage(1, 1, 1, self.xpixels, 1, self.ypixels)
-        ret_str += "Function SetImage returned" + str(ret) + "hbin = 1 vbin = 1 hstart = 1 hend =" + str(self.xpixels) + "vstart = 1 vend =" + str(self.ypixels) + "\n"
+        ret_str += self.readout.configure(self.sdkObject, self.xpixels, self.ypixels)
 
         (ret, fminExposure, fAccumulate, fKinetic) = self.sdkObject.GetAcquisitionTimings()
         ret_str += "Function GetAcquisitionTimings returned" + str(ret) + "exposure =" + str(fminExposure) + "accumulate =" + str(fAccumulate) + "kinetic =" + str(fKinetic) + "\n"
@@ -207,19 +1321,234 @@ class AndorPrinceton():
 
         return ret_str
 
+    """
+    Prepares a single scan read out with the current readout geometry (setReadout).
+    """
+    def prepFCBAcq(self):
+        ret_str = ""
+        
+        (ret) = self.sdkObject.SetAcquisitionMode(1)
+        ret_str += "Function SetAcquisitionMode returned" + str(ret) + "mode = Single Scan\n"
+        self.accumulations = 1
+
+        ret_str += self._prepTriggerAndReadout()
+
+        return ret_str
+
+    """
+    Prepares single scans that each sum n_accumulations exposures on the camera (accumulate mode), read out with the
+    current readout geometry; only the summed frame is read out and transferred. cycle_time is the accumulation cycle
+    time in seconds (0 selects the fastest the camera supports). collect, sweep and the other single-scan paths then
+    return the summed frames.
+    """
+    def prepAccumulateAcq(self, n_accumulations, cycle_time=0):
+        ret_str = ""
+
+        (ret) = self.sdkObject.SetAcquisitionMode(2)
+        ret_str += "Function SetAcquisitionMode returned" + str(ret) + "mode = Accumulate\n"
+
+        (ret) = self.sdkObject.SetNumberAccumulations(n_accumulations)
+        ret_str += "Function SetNumberAccumulations returned" + str(ret) + "number = " + str(n_accumulations) + "\n"
+        self.accumulations = n_accumulations
+
+        (ret) = self.sdkObject.SetAccumulationCycleTime(cycle_time)
+        ret_str += "Function SetAccumulationCycleTime returned" + str(ret) + "time = " + str(cycle_time) + "\n"
+
+        ret_str += self._prepTriggerAndReadout()
+
+        return ret_str
+
+    """
+    Prepares a kinetic series of n_frames frames, or a run-till-abort acquisition if n_frames is None, read out with
+    the current readout geometry (setReadout). cycle_time is the kinetic cycle time in seconds (0 selects the fastest cycle the camera supports).
+    Each frame sums accumulations exposures on the camera, taken accumulate_cycle seconds apart (0: as fast as possible).
+    """
+    def prepKineticAcq(self, n_frames=None, cycle_time=0, accumulations=1, accumulate_cycle=0):
+        ret_str = ""
+
+        if n_frames is None:
+            (ret) = self.sdkObject.SetAcquisitionMode(5)
+            ret_str += "Function SetAcquisitionMode returned" + str(ret) + "mode = Run till abort\n"
+        else:
+            (ret) = self.sdkObject.SetAcquisitionMode(3)
+            ret_str += "Function SetAcquisitionMode returned" + str(ret) + "mode = Kinetics\n"
+
+            (ret) = self.sdkObject.SetNumberKinetics(n_frames)
+            ret_str += "Function SetNumberKinetics returned" + str(ret) + "number = " + str(n_frames) + "\n"
+
+        (ret) = self.sdkObject.SetKineticCycleTime(cycle_time)
+        ret_str += "Function SetKineticCycleTime returned" + str(ret) + "time = " + str(cycle_time) + "\n"
+
+        (ret) = self.sdkObject.SetNumberAccumulations(accumulations)
+        ret_str += "Function SetNumberAccumulations returned" + str(ret) + "number = " + str(accumulations) + "\n"
+        self.accumulations = accumulations
+
+        (ret) = self.sdkObject.SetAccumulationCycleTime(accumulate_cycle)
+        ret_str += "Function SetAccumulationCycleTime returned" + str(ret) + "time = " + str(accumulate_cycle) + "\n"
+
+        ret_str += self._prepTriggerAndReadout()
+
+        self.kinetic_frames = n_frames
+        return ret_str
+
     def startAcq(self):
+        if self.acq_waiter is not None:
+            self.acq_waiter.clear()
         (ret) = self.sdkObject.StartAcquisition()
         return ret
 
-    def waitAcq(self):
-        (ret) = self.sdkObject.WaitForAcquisition()
+    """
+    Blocks until the camera reports an acquisition event; with timeout_ms, for at most that long. While the
+    acquisition waiter runs it has the SDK's events, so the wait goes through it.
+    @return: Returns DRV_SUCCESS, or the SDK's code (DRV_NO_NEW_DATA on timeout or cancel)
+    """
+    def waitAcq(self, timeout_ms=None):
+        if self.acq_waiter is not None and self.acq_waiter.isRunning():
+            event = self.acq_waiter.claim(None if timeout_ms is None else timeout_ms/1000)
+            return atmcd.atmcd.DRV_SUCCESS if event is not None else atmcd.atmcd.DRV_NO_NEW_DATA
+        if timeout_ms is None:
+            (ret) = self.sdkObject.WaitForAcquisition()
+        else:
+            (ret) = self.sdkObject.WaitForAcquisitionTimeOut(timeout_ms)
+        return ret
+
+    def startAcqWaiter(self, slice_ms=100, history=1024):
+        if self.acq_waiter is not None:
+            self.acq_waiter.stop()
+        self.acq_waiter = AcquisitionWaiter(self.sdkObject, slice_ms, history)
+        self.acq_waiter.start()
+        return self.acq_waiter
+
+    def stopAcqWaiter(self):
+        if self.acq_waiter is not None:
+            self.acq_waiter.stop()
+
+    """
+    Starts an acquisition without blocking (starting the acquisition waiter if needed), so stages or the laser can be
+    driven while the camera exposes (see the during argument of collect). The waiter keeps running until
+    stopAcqWaiter; waitAcq goes through it meanwhile.
+    @return: Returns a concurrent.futures.Future resolved with the AcquisitionEvent of the next completed scan
+    """
+    def startAcqFuture(self):
+        if self.acq_waiter is None or not self.acq_waiter.isRunning():
+            self.startAcqWaiter()
+        future = self.acq_waiter.future()
+        ret = self.startAcq()
+        if ret != atmcd.atmcd.DRV_SUCCESS:
+            future.cancel()
+            raise Exception("ERROR: StartAcquisition returned %d" % ret)
+        return future
+
+    """
+    Reads the most recent frame, into out (a preallocated int32 array of readout.frame_size values, e.g. a FramePool
+    buffer) if given.
+    @return: Returns the frame cropped to the readout geometry's columns (by default: the 12 edge pixels on each side
+             trimmed off), as a view of the readout buffer
+    """
+    def collectData(self, out=None):
+        data = np.empty(self.readout.frame_size, dtype=np.int32) if out is None else out
+        (ret) = self.sdkObject.GetMostRecentImageInto(data)
+        if ret != atmcd.atmcd.DRV_SUCCESS:
+            raise Exception("ERROR: GetMostRecentImage returned %d" % ret)
+        return self.readout.crop(data)
+
+    """
+    Reads every frame acquired since the last call in one GetImages transfer.
+    @return: Returns (first, data) where first is the series index of the first frame and data is an
+             (n_frames, pixels) (or (n_frames, tracks, pixels)) array of cropped frames, or (None, None) if there is
+             no new data
+    """
+    def drainFrames(self):
+        (ret, first, last) = self.sdkObject.GetNumberNewImages()
+        if ret != atmcd.atmcd.DRV_SUCCESS:
+            return (None, None)
+        data = np.empty((last - first + 1, self.readout.frame_size), dtype=np.int32)
+        (ret, validfirst, validlast) = self.sdkObject.GetImagesInto(first, last, data)
+        if ret != atmcd.atmcd.DRV_SUCCESS:
+            return (None, None)
+        return (validfirst, self.readout.crop(data[:validlast - validfirst + 1]))
+
+    """
+    Runs the kinetic series or run-till-abort acquisition set up by prepKineticAcq and yields (first, data) blocks as
+    returned by drainFrames, draining all frames that arrived while the caller was busy in one transfer.
+    Waits at most timeout_ms for each acquisition event before polling for data anyway. A run-till-abort acquisition
+    (or an unfinished kinetic series) is aborted when the generator is closed, e.g. by breaking out of the loop.
+    """
+    def kineticFrames(self, timeout_ms=1000):
+        self.startAcq()
+        total = 0
+        try:
+            while self.kinetic_frames is None or total < self.kinetic_frames:
+                self.waitAcq(timeout_ms)
+                (ret, status) = self.sdkObject.GetStatus()
+                (first, data) = self.drainFrames()
+                if data is not None:
+                    total += len(data)
+                    yield (first, data)
+                elif status != atmcd.atmcd.DRV_ACQUIRING:
+                    break
+        finally:
+            if self.sdkObject.GetStatus()[1] == atmcd.atmcd.DRV_ACQUIRING:
+                self.abortAcq()
+
+    """
+    Acquires n_frames frames as one kinetic series (one readout transfer per batch of frames rather than one
+    acquisition round trip per frame) and combines them with combineFrames(stack, method, spikes, **options).
+    Leaves the kinetic series set up; call prepFCBAcq or prepAccumulateAcq to return to single scans.
+    @return: Returns the combined frame, cropped like collectData
+    """
+    def acquireCombined(self, n_frames, method="mean", spikes="clip", cycle_time=0, **options):
+        self.prepKineticAcq(n_frames, cycle_time)
+        blocks = [data for (first, data) in self.kineticFrames()]
+        if not blocks:
+            raise Exception("ERROR: kinetic series ended after 0 of %d frames" % n_frames)
+        stack = np.concatenate(blocks)
+        if len(stack) < n_frames:
+            raise Exception("ERROR: kinetic series ended after %d of %d frames" % (len(stack), n_frames))
+        return combineFrames(stack, method, spikes, **options)
+
+    """
+    Records the kinetic series or run-till-abort acquisition set up by prepKineticAcq to path in the background
+    (see AndorSpool for the file format and SpoolReader to read it back). Frames are stored as read out (uncropped;
+    readout.crop cuts them down).
+    @return: Returns the running Spooler; call its stop() to end a run-till-abort recording
+    """
+    def spool(self, path, **options):
+        from AndorSpool import Spooler
+        spooler = Spooler(self.sdkObject, path, self.readout.frame_size, n_frames=self.kinetic_frames, **options)
+        spooler.start()
+        return spooler
+
+    """
+    Runs a sweep like sweep() and appends every frame to archive (a SweepArchive opened with mode "a", or the path
+    of one) together with its exposure time, detector temperature and a new sweep number. Frames are still yielded.
+    """
+    def archiveSweep(self, archive, wavelength_start=None, wavelength_end=None, prefetch=False, plan=None):
+        from SweepArchive import SweepArchive
+        owned = not isinstance(archive, SweepArchive)
+        if owned:
+            archive = SweepArchive(archive, mode="a")
+        try:
+            (ret, exposure, accumulate, kinetic) = self.sdkObject.GetAcquisitionTimings()
+            sweep = archive.newSweep()
+            for frame in self.sweep(wavelength_start, wavelength_end, prefetch, plan):
+                archive.append(frame, exposure, self.readTemp(), sweep)
+                yield frame
+        finally:
+            if owned:
+                archive.close()
+            else:
+                archive.flush()
+
+    def abortAcq(self):
+        (ret) = self.sdkObject.AbortAcquisition()
         return ret
 
-    def collectData(self):
-        imageSize = self.xpixels
-        (ret, fullFrameBuffer) = self.sdkObject.GetMostRecentImage(imageSize)
-        data = np.array(fullFrameBuffer)
-        return data[12:-12]
+    """
+    Creates a FramePool sized for the readout geometry's frames (call after prepFCBAcq).
+    """
+    def makeFramePool(self, n_slots):
+        return FramePool(n_slots, self.readout.frame_size, crop=self.readout.crop)
 
     """
     def shutdownCamera(self):
@@ -227,37 +1556,92 @@ class AndorPrinceton():
         return ret
     """
 
-    def getGratings(self):
-        self.spec.write(b"?GRATINGS\r")
-        gratings = []
-        self.spec.readline().decode()
-        for i in range(0, 10):
-            gratings.append(self.spec.readline().decode().replace("\n", "").replace("ok", "").replace("nm", "").replace("\r", ""))
-        return gratings
+    """
+    Returns the grating table of the current turret. Cached after the first query unless refresh is True.
+    """
+    def getGratings(self, refresh=False):
+        if self.state_gratings is None or refresh:
+            reply = self.protocol.query(b"?GRATINGS")[0].decode()
+            gratings = []
+            for line in reply.split("\n")[1:11]:
+                gratings.append(line.replace("ok", "").replace("nm", "").replace("\r", ""))
+            self.state_gratings = gratings
+        return list(self.state_gratings)
 
     def setGrating(self, num):
-        self.spec.write(str(num).encode('utf-8') + b" GRATING\r")
-        return self.spec.readline().decode()
+        self.invalidateState(turret=False)
+        ret = self.protocol.query(str(num).encode('utf-8') + b" GRATING", timeout=self.protocol.move_timeout)[0].decode()
+        self.state_grating = num
+        return ret
+
+    """
+    Returns the current grating number. Cached unless refresh is True.
+    """
+    def getGrating(self, refresh=False):
+        if self.state_grating is None or refresh:
+            self.state_grating = self.protocol.queryNumber(b"?GRATING")
+        return self.state_grating
+
+    def setTurret(self, num):
+        self.invalidateState()
+        ret = self.protocol.query(str(num).encode('utf-8') + b" TURRET", timeout=self.protocol.move_timeout)[0].decode()
+        self.state_turret = num
+        return ret
+
+    """
+    Returns the current turret number. Cached unless refresh is True.
+    """
+    def getTurret(self, refresh=False):
+        if self.state_turret is None or refresh:
+            self.state_turret = self.protocol.queryNumber(b"?TURRET")
+        return self.state_turret
+
+    """
+    Returns the center wavelength reported by the spectrometer. The last confirmed value is returned without a serial
+    round trip unless the grating has moved since (or refresh is True).
+    """
+    def getWavelength(self, refresh=False):
+        if self.state_wavelength is None or refresh:
+            self.state_wavelength = "%.3f" % self.protocol.queryNumber(b"?NM")
+        return self.state_wavelength
 
-    def getWavelength(self):
-        self.spec.write(b"?NM\r")
-        wl = self.spec.readline().decode().replace(" ", "").replace("\n", "").replace("ok", "").replace("nm", "")
-        while len(wl) < 7:
-            wl = self.spec.readline().decode().replace(" ", "").replace("\n", "").replace("ok", "").replace("nm", "")
-        return wl
+    """
+    Forgets cached spectrometer state. Grating and turret changes call this; call it directly if the spectrometer may
+    have been changed by something other than this object.
+    """
+    def invalidateState(self, turret=True):
+        if turret:
+            self.state_turret = None
+            self.state_gratings = None
+        self.state_grating = None
+        self.state_wavelength = None
 
+    """
+    Moves the grating to wavelength and waits for it to arrive.
+    @return: Returns the same as waitMove
+    """
     def setWavelength(self, wavelength):
-        self.spec.write(str(wavelength).encode('utf-8') + b" GOTO\r")
-        self.spec.readline().decode()
-        self.spec.readline().decode()
-        
-        self.spec.write(b"MONO-?DONE\r")
-        done = self.spec.readline().decode().replace(" ", "").replace("\n", "").replace("ok", "")
-        
-        while done == "":
-            self.spec.write(b"MONO-?DONE\r")
-            done = self.spec.readline().decode().replace(" ", "").replace("\n", "").replace("ok", "")
-        return done
+        self.startMove(wavelength)
+        return self.waitMove()
+
+    """
+    Sends the GOTO command for wavelength without waiting for the grating to arrive (see waitMove).
+    """
+    def startMove(self, wavelength):
+        self.state_wavelength = None
+        self.protocol.send(str(wavelength).encode('utf-8') + b" GOTO")
+        self.move_pending = True
+
+    """
+    Waits for a move started by startMove to finish, polling MONO-?DONE with the protocol's backoff.
+    @return: Returns the center wavelength reported by the spectrometer after the move (as getWavelength)
+    """
+    def waitMove(self):
+        if self.move_pending:
+            self.move_pending = False
+            self.protocol.readReply(self.protocol.move_timeout)
+            self.protocol.waitDone()
+        return self.getWavelength()
 
     """
     def close(self):
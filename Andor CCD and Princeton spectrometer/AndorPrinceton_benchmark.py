@@ -0,0 +1,357 @@
+"""
+Benchmarks for the AndorPrinceton post-processing and acquisition paths.
+Run directly: python AndorPrinceton_benchmark.py
+"""
+
+import os
+import sys
+import time
+import timeit
+import shutil
+import subprocess
+import tempfile
+import tracemalloc
+import ctypes
+import numpy as np
+import scipy.signal as pysignal
+import atmcd
+from AndorPrinceton import AndorPrinceton, POOL_MIN_VALUES, _filterSpikesPool, combineFrames, filterSpikes, filterSpikesBatch
+
+"""
+Original per-pixel filterSpikes, kept as the reference for output and timing comparisons.
+"""
+def filterSpikesLoop(data, threshold=500, max_spike_width=10, window_length=51, polyorder1=3, polyorder2=1):
+    smooth_data = pysignal.savgol_filter(data, window_length, polyorder1)
+    smoother_data = pysignal.savgol_filter(smooth_data, window_length, polyorder2)
+    i = 0
+    new_data = np.array(data)
+    data_len = len(data)
+    while i < data_len:
+        if (data[i] - smoother_data[i]) > threshold:
+            start = i-1
+            while data[start] > smoother_data[start]:
+                start -= 1
+            end = (i + max_spike_width) if (i + max_spike_width) < data_len else (data_len - 1)
+            j = 1
+            while j < max_spike_width and (i + j) < data_len:
+                if data[i + j] < smoother_data[i + j]:
+                    end = i + j
+                    break
+                j += 1
+            m = (data[end] - data[start]) / (end - start)
+            b = data[start] - m*start
+            j = start + 1
+            while j < end:
+                new_data[j] = m*j + b
+                j += 1
+            i = end
+        i += 1
+    return new_data
+
+"""
+Generates a synthetic spectrum of n_pixels counts with n_spikes cosmic-ray spikes.
+"""
+def syntheticSpectrum(n_pixels, n_spikes=20, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, n_pixels)
+    data = 2000 + 1500*np.exp(-((x - 0.5)/0.05)**2) + rng.normal(0, 30, n_pixels)
+    for p in rng.integers(0, n_pixels - 5, n_spikes):
+        data[p:p + rng.integers(1, 5)] += rng.uniform(1000, 20000)
+    return np.round(data).astype(np.int32)
+
+def benchFilterSpikes(sizes=(1024, 2048, 4096, 8192, 16384), repeat=5):
+    print("filterSpikes (best of %d, ms)" % repeat)
+    print("%8s %12s %12s %9s" % ("pixels", "loop", "vectorized", "speedup"))
+    for n in sizes:
+        data = syntheticSpectrum(n, n_spikes=n//200)
+        assert np.array_equal(filterSpikesLoop(data), filterSpikes(data))
+        t_loop = min(timeit.repeat(lambda: filterSpikesLoop(data), number=1, repeat=repeat))
+        t_vec = min(timeit.repeat(lambda: filterSpikes(data), number=1, repeat=repeat))
+        print("%8d %12.3f %12.3f %8.1fx" % (n, t_loop*1e3, t_vec*1e3, t_loop/t_vec))
+
+"""
+Per-row filterSpikes calls against one batched filterSpikesBatch call, then the batched path against the process pool
+at growing stack sizes, to check where the pool starts to pay off (POOL_MIN_VALUES).
+"""
+def benchFilterSpikesBatch(n_frames=1000, n_pixels=1024, pool_frames=(1000, 16384), processes=4):
+    stack = np.array([syntheticSpectrum(n_pixels, n_spikes=5, seed=i) for i in range(n_frames)])
+    t0 = time.perf_counter()
+    for row in stack:
+        filterSpikes(row)
+    t_rows = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    filterSpikesBatch(stack)
+    t_batch = time.perf_counter() - t0
+    print("filterSpikesBatch (%d x %d)" % (n_frames, n_pixels))
+    print("  per-row calls:   %8.1f ms" % (t_rows*1e3))
+    print("  batched:         %8.1f ms" % (t_batch*1e3))
+    print("Batched against %d pool processes (%d CPUs; pool used from %d values)" % (processes, os.cpu_count() or 1,
+                                                                                   POOL_MIN_VALUES))
+    print("  %8s %12s %12s" % ("frames", "batched ms", "pool ms"))
+    options = (500, 10, 51, 3, 1)
+    for n in pool_frames:
+        big = np.resize(stack, (n, n_pixels))
+        t0 = time.perf_counter()
+        filterSpikesBatch(big)
+        t_batch = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        _filterSpikesPool(big, processes, *options)
+        t_pool = time.perf_counter() - t0
+        print("  %8d %12.1f %12.1f" % (n, t_batch*1e3, t_pool*1e3))
+
+# Stand-in for the SDK library: the hot functions with their real signatures, returning DRV_SUCCESS immediately, so
+# the benchmark measures only the Python/ctypes side of each call
+STUB_SDK_SOURCE = """
+unsigned int GetStatus(int *status) { *status = 20073; return 20002; }
+unsigned int GetAcquisitionProgress(long *acc, long *series) { *acc = 1; *series = 2; return 20002; }
+unsigned int GetNumberNewImages(long *first, long *last) { *first = 1; *last = 2; return 20002; }
+unsigned int GetTemperatureF(float *temperature) { *temperature = -60.0f; return 20002; }
+unsigned int GetMostRecentImage(int *arr, unsigned long size) { return 20002; }
+unsigned int GetMostRecentImage16(unsigned short *arr, unsigned long size) { return 20002; }
+unsigned int GetOldestImage(int *arr, unsigned long size) { return 20002; }
+unsigned int GetOldestImage16(unsigned short *arr, unsigned long size) { return 20002; }
+unsigned int GetImages(long first, long last, int *arr, unsigned long size, long *validfirst, long *validlast) { return 20002; }
+unsigned int GetImages16(long first, long last, unsigned short *arr, unsigned long size, long *validfirst, long *validlast) { return 20002; }
+unsigned int StartAcquisition(void) { return 20002; }
+unsigned int WaitForAcquisition(void) { return 20002; }
+unsigned int WaitForAcquisitionTimeOut(int timeout) { return 20002; }
+"""
+
+"""
+Compiles STUB_SDK_SOURCE with the system C compiler.
+@return: Returns the path of the stub library in directory
+"""
+def buildStubLibrary(directory):
+    compiler = shutil.which("cc") or shutil.which("gcc")
+    if compiler is None or sys.platform == "win32":
+        raise OSError("no C compiler to build the stub SDK library")
+    source = os.path.join(directory, "stub.c")
+    library = os.path.join(directory, "libandor.so")
+    with open(source, "w") as f:
+        f.write(STUB_SDK_SOURCE)
+    subprocess.check_call([compiler, "-shared", "-fPIC", "-O2", "-o", library, source])
+    return library
+
+"""
+Original atmcd wrappers of the hot functions (untyped library attributes looked up on every call), kept as the
+reference for benchSdkCalls.
+"""
+class BaselineSdk():
+    def __init__(self, library):
+        self.dll = ctypes.CDLL(library)
+
+    def GetStatus(self):
+        cstatus = ctypes.c_int()
+        ret = self.dll.GetStatus(ctypes.byref(cstatus))
+        return (ret, cstatus.value)
+
+    def GetAcquisitionProgress(self):
+        cacc = ctypes.c_int()
+        cseries = ctypes.c_int()
+        ret = self.dll.GetAcquisitionProgress(ctypes.byref(cacc), ctypes.byref(cseries))
+        return (ret, cacc.value, cseries.value)
+
+    def GetNumberNewImages(self):
+        cfirst = ctypes.c_int()
+        clast = ctypes.c_int()
+        ret = self.dll.GetNumberNewImages(ctypes.byref(cfirst), ctypes.byref(clast))
+        return (ret, cfirst.value, clast.value)
+
+    def GetTemperatureF(self):
+        ctemperature = ctypes.c_float()
+        ret = self.dll.GetTemperatureF(ctypes.byref(ctemperature))
+        return (ret, ctemperature.value)
+
+    def WaitForAcquisitionTimeOut(self, iTimeOutMs):
+        ciTimeOutMs = ctypes.c_int(iTimeOutMs)
+        ret = self.dll.WaitForAcquisitionTimeOut(ciTimeOutMs)
+        return (ret)
+
+"""
+Per-call overhead of the hot SDK functions through the original wrappers (BaselineSdk), through the typed ctypes
+prototypes and through the untyped hot path atmcd binds them to. Runs against a stub library built on the fly unless
+library names the real SDK (for meaningful numbers with the real SDK, an initialised camera).
+"""
+def benchSdkCalls(n_calls=100000, library=None):
+    with tempfile.TemporaryDirectory() as directory:
+        if library is None:
+            library = buildStubLibrary(directory)
+        baseline = BaselineSdk(library)
+        hot = atmcd.atmcd(library=library)
+        typed = atmcd.atmcd(library=library)
+        for name in atmcd.HOT_FUNCTIONS:
+            setattr(typed, "_" + name, getattr(typed.dll, name))
+        print("SDK call overhead (us per call, %s)" % os.path.basename(library))
+        print("%-26s %12s %12s %12s" % ("function", "baseline", "prototyped", "hot path"))
+        calls = [("GetStatus", lambda sdk: sdk.GetStatus()),
+                 ("GetAcquisitionProgress", lambda sdk: sdk.GetAcquisitionProgress()),
+                 ("GetNumberNewImages", lambda sdk: sdk.GetNumberNewImages()),
+                 ("GetTemperatureF", lambda sdk: sdk.GetTemperatureF()),
+                 ("WaitForAcquisitionTimeOut", lambda sdk: sdk.WaitForAcquisitionTimeOut(100))]
+        for name, call in calls:
+            if not call(baseline) == call(typed) == call(hot):
+                raise AssertionError("%s returned different results on the three paths" % name)
+            times = [min(timeit.repeat(lambda: call(sdk), number=n_calls, repeat=5)) for sdk in (baseline, typed, hot)]
+            print("%-26s %12.3f %12.3f %12.3f" % (name, *[t/n_calls*1e6 for t in times]))
+
+"""
+Import time of each entry point, measured in fresh interpreters (best of repeat runs, bytecode already cached).
+"""
+def benchImport(repeat=5):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    cases = [("atmcd", "import atmcd"),
+             ("atmcd + atmcd(lazy=True)", "import atmcd; atmcd.atmcd(lazy=True)"),
+             ("AndorPrinceton", "import AndorPrinceton"),
+             ("AndorPrinceton + filterSpikes", "import AndorPrinceton, numpy; AndorPrinceton.filterSpikes(numpy.zeros(1024))")]
+    print("Import time (best of %d, ms)" % repeat)
+    for name, statement in cases:
+        code = "import time; t0 = time.perf_counter(); %s; print(time.perf_counter() - t0)" % statement
+        times = [float(subprocess.check_output([sys.executable, "-c", code], cwd=script_dir)) for i in range(repeat)]
+        print("  %-32s %8.1f" % (name, min(times)*1e3))
+
+"""
+Runs acquire(n_frames) under tracemalloc.
+@return: Returns (peak, retained) heap bytes above the starting point, per frame
+"""
+def heapPerFrame(acquire, n_frames):
+    tracemalloc.start()
+    (start, peak) = tracemalloc.get_traced_memory()
+    acquire(n_frames)
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ((peak - start)/n_frames, (current - start)/n_frames)
+
+def printAcquisition(name, n_frames, elapsed, model_fps, latencies, heap):
+    latencies = np.asarray(latencies)*1e3
+    print("  %-24s %8.1f %8.1f %10.3f %10.3f %10.0f %10.0f" % (name, n_frames/elapsed, model_fps, np.median(latencies),
+          np.percentile(latencies, 99), heap[0], heap[1]))
+
+"""
+Frame rate, latency and heap use through the full AndorPrinceton/atmcd stack on the simulated SDK.
+Latency is measured from the moment the simulated camera finishes a frame to the moment the caller has its data;
+model fps is the simulated camera's own frame rate, so the gap between the two is the wrapper overhead.
+sim_options are passed to AndorSimulator.SimulatedSDK.
+"""
+def benchAcquisition(exposure=0.001, n_frames=200, **sim_options):
+    from AndorSimulator import SimulatedSDK, SimulatedSpectrometerPort
+    sim = SimulatedSDK(**sim_options)
+    ap = AndorPrinceton(SimulatedSpectrometerPort(), sdk_backend=sim)
+    ap.setExposure(exposure)
+    print("Acquisition on the simulated SDK (%d frames, exposure %g s)" % (n_frames, exposure))
+    print("  %-24s %8s %8s %10s %10s %10s %10s" % ("path", "fps", "model", "median ms", "p99 ms", "peak B/fr",
+          "kept B/fr"))
+
+    ap.prepFCBAcq()
+    buffer = np.empty(ap.readout.frame_size, dtype=np.int32)
+    latencies = []
+    def singleScans(n):
+        for i in range(n):
+            ap.startAcq()
+            ap.waitAcq()
+            ap.collectData(out=buffer)
+            latencies.append(time.perf_counter() - sim.frameReadyTime(1))
+    t0 = time.perf_counter()
+    singleScans(n_frames)
+    elapsed = time.perf_counter() - t0
+    model_fps = 1/sim.timings()[2]
+    printAcquisition("single scans", n_frames, elapsed, model_fps, latencies, heapPerFrame(singleScans, n_frames//4))
+
+    ap.prepKineticAcq(n_frames=n_frames)
+    def kinetic(n):
+        ap.prepKineticAcq(n_frames=n)
+        del latencies[:]
+        for (first, data) in ap.kineticFrames():
+            now = time.perf_counter()
+            latencies.extend(now - sim.frameReadyTime(index) for index in range(first, first + len(data)))
+    t0 = time.perf_counter()
+    kinetic(n_frames)
+    elapsed = time.perf_counter() - t0
+    printAcquisition("kinetic series", n_frames, elapsed, 1/sim.timings()[2], latencies, heapPerFrame(kinetic, n_frames//4))
+
+    pool = ap.makeFramePool(16)
+    def pooled(n):
+        ap.prepKineticAcq(n_frames=n)
+        del latencies[:]
+        ap.startAcq()
+        index = 0
+        while index < n and ap.sdkObject.WaitForAcquisitionTimeOut(1000) == atmcd.atmcd.DRV_SUCCESS:
+            slot = pool.acquire()
+            while ap.sdkObject.GetOldestImageInto(pool.buffer(slot)) == atmcd.atmcd.DRV_SUCCESS:
+                index += 1
+                latencies.append(time.perf_counter() - sim.frameReadyTime(index))
+            pool.release(slot)
+    t0 = time.perf_counter()
+    pooled(n_frames)
+    elapsed = time.perf_counter() - t0
+    printAcquisition("kinetic, FramePool", n_frames, elapsed, 1/sim.timings()[2], latencies, heapPerFrame(pooled, n_frames//4))
+
+"""
+Readout time and measured kinetic frame rate of each readout profile on the simulated SDK.
+"""
+def benchReadoutProfiles(exposure=0.001, n_frames=100, **sim_options):
+    from AndorSimulator import SimulatedSDK, SimulatedSpectrometerPort
+    ap = AndorPrinceton(SimulatedSpectrometerPort(), sdk_backend=SimulatedSDK(**sim_options))
+    ap.setExposure(exposure)
+    print("Readout profiles on the simulated SDK (%d frames, exposure %g s)" % (n_frames, exposure))
+    print("  %-14s %8s %8s %8s %12s %8s" % ("profile", "HS MHz", "VS us", "gain", "readout ms", "fps"))
+    for profile in ("fastest", "lowest-noise"):
+        speed = ap.setReadoutProfile(profile)
+        ap.prepKineticAcq(n_frames=n_frames)
+        timings = ap.getReadoutTimings()
+        t0 = time.perf_counter()
+        received = sum(len(data) for (first, data) in ap.kineticFrames())
+        elapsed = time.perf_counter() - t0
+        print("  %-14s %8.3g %8.3g %8s %12.3f %8.1f" % (profile, speed.hs_speed, speed.vs_speed, speed.preamp_gain,
+              timings.readout*1e3, received/elapsed))
+
+"""
+Time to average n_frames exposures on the simulated SDK: single scans averaged in Python (spikes filtered per frame),
+the camera's accumulate mode, and one kinetic series combined by combineFrames with spike clipping. Then the combining
+step alone on the single-scan stack: the per-frame loop against combineFrames.
+"""
+def benchAveraging(exposure=0.001, n_frames=50, **sim_options):
+    from AndorSimulator import SimulatedSDK, SimulatedSpectrometerPort
+    ap = AndorPrinceton(SimulatedSpectrometerPort(), sdk_backend=SimulatedSDK(**sim_options))
+    ap.setExposure(exposure)
+    print("Averaging %d exposures on the simulated SDK (exposure %g s)" % (n_frames, exposure))
+    stack = []
+    def singleScans():
+        ap.prepFCBAcq()
+        frames = []
+        for i in range(n_frames):
+            ap.startAcq()
+            ap.waitAcq()
+            stack.append(ap.collectData())
+            frames.append(filterSpikes(stack[-1]))
+        return np.mean(frames, axis=0)
+    def accumulate():
+        ap.prepAccumulateAcq(n_frames)
+        ap.startAcq()
+        ap.waitAcq()
+        return ap.collectData()/n_frames
+    def kinetic():
+        return ap.acquireCombined(n_frames)
+    for (name, run) in (("single scans", singleScans), ("accumulate mode", accumulate), ("kinetic + combine", kinetic)):
+        t0 = time.perf_counter()
+        run()
+        print("  %-20s %10.1f ms" % (name, (time.perf_counter() - t0)*1e3))
+    stack = np.array(stack)
+    print("Combining the %d single scans" % n_frames)
+    for (name, run) in (("filterSpikes loop", lambda: np.mean([filterSpikes(frame) for frame in stack], axis=0)),
+                        ("combine, filter", lambda: combineFrames(stack, spikes="filter")),
+                        ("combine, clip", lambda: combineFrames(stack))):
+        t0 = time.perf_counter()
+        run()
+        print("  %-20s %10.1f ms" % (name, (time.perf_counter() - t0)*1e3))
+
+if __name__ == "__main__":
+    benchImport()
+    benchFilterSpikes()
+    benchFilterSpikesBatch()
+    benchAcquisition()
+    benchReadoutProfiles()
+    benchAveraging()
+    try:
+        benchSdkCalls()
+    except OSError as e:
+        print("Skipping SDK call benchmark: %s" % e)
@@ -0,0 +1,142 @@
+"""
+Tests for AndorPrinceton on the simulated SDK and spectrometer. Run with: python -m pytest AndorPrinceton_test.py
+"""
+
+import contextlib
+import io
+import threading
+import numpy as np
+import pytest
+import atmcd
+from AndorPrinceton import AndorPrinceton, filterSpikes, filterSpikesBatch, savgolFilter
+from AndorSimulator import SimulatedSDK, SimulatedSpectrometerPort
+
+def makeInstrument(sdk_backend="simulated"):
+    with contextlib.redirect_stdout(io.StringIO()):
+        ap = AndorPrinceton(SimulatedSpectrometerPort(), sdk_backend=sdk_backend)
+        ap.prepFCBAcq()
+    ap.setExposure(0.001)
+    return ap
+
+"""
+@return: Returns call()'s result, failing the test if it has not returned within timeout seconds
+"""
+def callWithin(timeout, call):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(call()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "call still blocked after %g s" % timeout
+    return result[0]
+
+def testCollectAfterStartAcqFuture():
+    ap = makeInstrument()
+    try:
+        event = ap.startAcqFuture().result(timeout=5)
+        assert event.series >= 1
+        ap.initSweep(600, 650)
+        (collected, spec_wl, mp, data, wl_arr) = callWithin(5, ap.collect)
+        assert collected and len(data) == len(wl_arr)
+        assert callWithin(5, lambda: ap.waitAcq(200)) == atmcd.atmcd.DRV_NO_NEW_DATA
+    finally:
+        ap.stopAcqWaiter()
+
+def testCollectDuringExposure():
+    ap = makeInstrument()
+    ap.setExposure(0.05)
+    ap.initSweep(600, 650)
+    seen = []
+    def during(future):
+        seen.append(future.done())
+        future.result(timeout=5)
+    try:
+        (collected, spec_wl, mp, data, wl_arr) = callWithin(5, lambda: ap.collect(during=during))
+        assert collected and seen == [False]
+    finally:
+        ap.stopAcqWaiter()
+
+def testWaitAcqTimeoutAndCancel():
+    ap = makeInstrument()
+    try:
+        ap.startAcqWaiter(slice_ms=20)
+        assert callWithin(5, lambda: ap.waitAcq(50)) == atmcd.atmcd.DRV_NO_NEW_DATA
+        result = []
+        thread = threading.Thread(target=lambda: result.append(ap.acq_waiter.claim()), daemon=True)
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+        ap.acq_waiter.cancel()
+        thread.join(5)
+        assert not thread.is_alive() and result == [None]
+        assert ap.acq_waiter.isRunning()
+    finally:
+        ap.stopAcqWaiter()
+
+"""
+The monitor samples GetTemperatureF from its own thread while the acquisition waiter and a kinetic series use the SDK.
+"""
+def testTemperatureMonitorDuringKineticSeries():
+    ap = makeInstrument(SimulatedSDK(cooling_rate=2000.0, stabilize_time=0.05))
+    ap.setTemp(-60)
+    monitor = ap.startTempMonitor(interval=0.005)
+    try:
+        assert callWithin(10, lambda: monitor.waitStable(timeout=5))
+        ap.startAcqWaiter(slice_ms=20)
+        ap.prepKineticAcq(n_frames=20)
+        blocks = callWithin(10, lambda: [data for (first, data) in ap.kineticFrames()])
+        assert sum(len(data) for data in blocks) == 20
+        (times, temps, codes) = monitor.getHistory()
+        assert len(times) >= 2 and np.all(np.diff(times) > 0)
+        assert monitor.latest()[2] == atmcd.atmcd.DRV_TEMP_STABILIZED
+        assert ap.readTemp() == pytest.approx(-60, abs=0.5)
+    finally:
+        ap.stopAcqWaiter()
+        ap.stopTempMonitor()
+    assert not monitor.isRunning()
+
+def testSetWavelengthReturnsReportedWavelength():
+    ap = makeInstrument()
+    assert ap.setWavelength(610) == "610.000"
+    assert ap.setWavelength(620) == "620.000"
+    assert ap.setWavelength(610) == "610.000"
+    assert ap.moveTo(615) == 615.0
+
+"""
+An error between the GOTO for the next frame and its reply must not leave that reply to answer the next command.
+"""
+def testPipelinedSweepErrorKeepsProtocolInSync():
+    ap = makeInstrument()
+    collectData = ap.collectData
+    def failSecondFrame(out=None):
+        if ap.frame_idx == 2:
+            raise RuntimeError("readout failed")
+        return collectData(out)
+    ap.collectData = failSecondFrame
+    frames = []
+    try:
+        for (frame, timing) in ap.pipelinedSweep(600, 700):
+            frames.append(frame)
+    except RuntimeError:
+        pass
+    assert len(frames) == 1
+    assert not ap.move_pending
+    target = ap.frame_targets[2]
+    assert float(ap.getWavelength(refresh=True)) == round(target, 3)
+    assert ap.moveTo(650) == 650.0
+
+def testSavgolFilterMatchesScipy():
+    signal = pytest.importorskip("scipy.signal")
+    rng = np.random.default_rng(0)
+    for n_pixels in (51, 1024, 2047):
+        stack = rng.integers(0, 5000, (3, n_pixels)).astype(np.int32)
+        for polyorder in (1, 3):
+            expected = signal.savgol_filter(stack, 51, polyorder, axis=-1)
+            assert np.allclose(savgolFilter(stack, 51, polyorder), expected, rtol=0, atol=1e-6)
+
+def testFilterSpikesBatchMatchesRows():
+    rng = np.random.default_rng(1)
+    stack = 2000 + rng.normal(0, 30, (20, 1024)).round().astype(np.int32)
+    stack[rng.integers(0, 20, 40), rng.integers(0, 1024, 40)] += 5000
+    filtered = filterSpikesBatch(stack, processes=4)
+    assert np.array_equal(filtered, [filterSpikes(row) for row in stack])
+    assert filtered.max() < 3000
@@ -0,0 +1,874 @@
+"""
+In-process simulation of the Andor SDK library and of the Princeton spectrometer serial port, so that atmcd and
+AndorPrinceton can be run and benchmarked without hardware.
+Select the SDK with atmcd.atmcd(backend="simulated") (or ANDOR_SDK_BACKEND=simulated); the full stack runs as
+AndorPrinceton(SimulatedSpectrometerPort(), sdk_backend="simulated").
+Timing is modelled from the acquisition start time rather than by a background thread: frame k of a series is
+available once k-1 kinetic cycles plus one exposure and readout have elapsed.
+"""
+
+import time
+import threading
+import numpy as np
+import atmcd
+
+SDK = atmcd.atmcd
+
+"""
+Reads a value passed as a ctypes object (c_int(3)) or as a plain Python value.
+"""
+def _value(arg):
+    return arg.value if hasattr(arg, "value") else arg
+
+"""
+Stores value through an output argument passed as byref(c_x()).
+"""
+def _store(ref, value):
+    ref._obj.value = value
+
+"""
+Returns a NumPy view of size elements of an output buffer passed as a ctypes array or pointer.
+"""
+def _buffer(arr, size):
+    if hasattr(arr, "_obj"):
+        arr = arr._obj
+    if hasattr(arr, "contents"):
+        return np.ctypeslib.as_array(arr, shape=(size,))
+    return np.ctypeslib.as_array(arr)[:size]
+
+class SimulatedSDK():
+    """
+    xpixels, ypixels: detector size
+    pixel_rate: horizontal readout rate (pixels/s); row_shift: vertical shift time per row (s)
+    ambient, cooling_rate, stabilize_time: starting temperature (C), cooler slew rate (C/s) and the time the
+    temperature must stay within 0.5 C of the set point before it reports stabilized
+    spike_rate: mean number of cosmic-ray spikes per frame
+    buffer_frames: size of the circular image buffer
+    hs_speeds (MHz), vs_speeds (microseconds per row), preamp_gains: the speeds and gains offered by the single AD
+    channel and amplifier; selecting them replaces pixel_rate and row_shift. vs_recommended is the index
+    GetFastestRecommendedVSSpeed reports. Read noise grows with the horizontal speed, and the highest gain is not
+    available at the highest speed.
+    """
+    def __init__(self, xpixels=1024, ypixels=256, pixel_rate=1e6, row_shift=16e-6, ambient=20.0, cooling_rate=5.0,
+                 stabilize_time=2.0, spike_rate=2.0, buffer_frames=256, serial_number=12345, seed=0, handle=100,
+                 hs_speeds=(3.0, 1.0, 0.05), vs_speeds=(4.0, 8.0, 16.0, 32.0), vs_recommended=1,
+                 preamp_gains=(1.0, 2.0, 4.0)):
+        self.xpixels = xpixels
+        self.ypixels = ypixels
+        self.pixel_rate = pixel_rate
+        self.row_shift = row_shift
+        self.hs_speeds = hs_speeds
+        self.vs_speeds = vs_speeds
+        self.vs_recommended = vs_recommended
+        self.preamp_gains = preamp_gains
+        self.preamp_gain = 1.0
+        self.ambient = ambient
+        self.cooling_rate = cooling_rate
+        self.stabilize_time = stabilize_time
+        self.spike_rate = spike_rate
+        self.buffer_frames = buffer_frames
+        self.serial_number = serial_number
+        self.seed = seed
+        self.handle = handle
+        self.cond = threading.Condition()
+        self.initialized = False
+
+        self.acq_mode = 1
+        self.read_mode = 4
+        self.trigger_mode = 0
+        self.exposure = 0.01
+        self.accumulate_cycle = 0.0
+        self.n_accumulate = 1
+        self.kinetic_cycle = 0.0
+        self.n_kinetics = 1
+        self.image = (1, 1, 1, xpixels, 1, ypixels)
+        self.fvb_hbin = 1
+        self.single_track = (ypixels//2, 1)
+        self.single_hbin = 1
+        self.multi_tracks = [(1, ypixels)]
+        self.multi_hbin = 1
+        self.multi_hrange = (1, xpixels)
+        self.random_tracks = [(1, ypixels)]
+        self.custom_hbin = 1
+        self.crop = None
+
+        self.cooler = False
+        self.target_temp = 0
+        self.temp = ambient
+        self.temp_time = time.perf_counter()
+        self.stable_since = None
+
+        self.acquiring = False
+        self.acquisitions = 0
+        self.start_time = None
+        self.series_length = 0
+        self.frozen = None
+        self.next_new = 1
+        self.events_seen = 0
+        self.interrupts = 0
+
+        x = np.linspace(0, 1, xpixels)
+        self.spectrum = 1000 + 3000*np.exp(-((x - 0.3)/0.01)**2) + 1500*np.exp(-((x - 0.62)/0.02)**2) + 200*x
+        # Fraction of the light falling on each row: the slit image is a band around the middle of the detector
+        rows = np.arange(ypixels)
+        self.profile = np.exp(-((rows - ypixels/2)/(ypixels/8 + 1))**2)
+        self.profile /= self.profile.sum()
+
+    # Geometry and timing
+
+    """
+    @return: Returns (hbin, hstart, hend, tracks, shifted) for the current read mode: the horizontal binning, the
+             columns digitized (1-based, inclusive), the (bottom, top) rows binned into each output row and the number
+             of rows shifted out per readout
+    """
+    def readout(self):
+        (hstart, hend, shifted) = (1, self.xpixels, self.ypixels)
+        if self.read_mode == 0:
+            (hbin, tracks) = (self.fvb_hbin, [(1, self.ypixels)])
+            if self.crop is not None:
+                (height, width, vbin, hbin) = self.crop
+                (hend, tracks, shifted) = (width, [(1, height)], height)
+        elif self.read_mode == 1:
+            (hbin, tracks) = (self.multi_hbin, self.multi_tracks)
+            (hstart, hend) = self.multi_hrange
+        elif self.read_mode == 2:
+            (hbin, tracks) = (self.custom_hbin, self.random_tracks)
+        elif self.read_mode == 3:
+            (centre, height) = self.single_track
+            bottom = centre - height//2
+            (hbin, tracks) = (self.single_hbin, [(bottom, bottom + height - 1)])
+        else:
+            (hbin, vbin, hstart, hend, vstart, vend) = self.image
+            tracks = [(row, row + vbin - 1) for row in range(vstart, vend + 1, vbin)]
+        return (hbin, hstart, hend, tracks, shifted)
+
+    """
+    @return: Returns (rows, columns) of one frame in the current read mode
+    """
+    def frameShape(self):
+        (hbin, hstart, hend, tracks, shifted) = self.readout()
+        return (len(tracks), (hend - hstart + 1)//hbin)
+
+    def frameSize(self):
+        (rows, columns) = self.frameShape()
+        return rows*columns
+
+    """
+    Every row is shifted out (only the cropped rows in isolated crop mode); only the rows and columns actually read
+    are digitized.
+    """
+    def readoutTime(self):
+        return self.readout()[4]*self.row_shift + self.frameSize()/self.pixel_rate
+
+    """
+    Number of exposures summed into each frame: accumulate, kinetic and run-till-abort modes accumulate.
+    """
+    def accumulations(self):
+        return self.n_accumulate if self.acq_mode in (2, 3, 5) else 1
+
+    """
+    @return: Returns (exposure, accumulate, kinetic) cycle times as GetAcquisitionTimings reports them
+    """
+    def timings(self):
+        accumulate = max(self.accumulate_cycle, self.exposure + self.readoutTime())
+        kinetic = max(self.kinetic_cycle, accumulate*self.accumulations())
+        return (self.exposure, accumulate, kinetic)
+
+    """
+    @return: Returns the time at which frame index (1-based) of the running series is complete
+    """
+    def frameReadyTime(self, index):
+        (exposure, accumulate, kinetic) = self.timings()
+        return self.start_time + (index - 1)*kinetic + accumulate*self.accumulations()
+
+    """
+    @return: Returns the number of frames of the current (or last) series that are complete
+    """
+    def acquiredCount(self, now=None):
+        if self.start_time is None:
+            return 0
+        if self.frozen is not None:
+            return self.frozen
+        now = time.perf_counter() if now is None else now
+        (exposure, accumulate, kinetic) = self.timings()
+        elapsed = now - self.frameReadyTime(1)
+        count = 0 if elapsed < 0 else int(elapsed//kinetic) + 1
+        if self.series_length is not None and count >= self.series_length:
+            self.frozen = self.series_length
+            self.acquiring = False
+            return self.series_length
+        return count
+
+    def isAcquiring(self):
+        self.acquiredCount()
+        return self.acquiring
+
+    """
+    Synthesizes frame index (1-based) of the current series (noise differs between series): the reference spectrum scaled by exposure and accumulations,
+    shot noise, and a Poisson number of cosmic-ray spikes (spike_rate per accumulated exposure).
+    """
+    def frame(self, index):
+        rng = np.random.default_rng((self.seed, self.acquisitions, index))
+        (hbin, hstart, hend, tracks, shifted) = self.readout()
+        columns = (hend - hstart + 1)//hbin
+        spectrum = self.spectrum[hstart - 1:hstart - 1 + columns*hbin].reshape(columns, hbin).sum(axis=1)
+        spectrum = spectrum*(self.exposure/0.01)*self.accumulations()
+        weights = np.array([self.profile[bottom - 1:top].sum() for (bottom, top) in tracks])
+        signal = np.outer(weights, spectrum).ravel()*self.preamp_gain
+        read_noise = 4 + 6*self.pixel_rate/1e6
+        data = signal + rng.normal(0, 1, signal.size)*np.sqrt(signal*self.preamp_gain + read_noise**2)
+        for position in rng.integers(0, data.size - 3, rng.poisson(self.spike_rate*self.accumulations())):
+            data[position:position + rng.integers(1, 4)] += rng.uniform(1000, 20000)
+        return np.clip(data, 0, None).astype(np.int64)
+
+    # Temperature
+
+    """
+    Advances the temperature model to the current time: the cooler slews towards the set point, and the detector
+    drifts back to ambient when it is off.
+    """
+    def updateTemperature(self):
+        now = time.perf_counter()
+        target = self.target_temp if self.cooler else self.ambient
+        step = self.cooling_rate*(now - self.temp_time)
+        self.temp = target if abs(target - self.temp) <= step else self.temp + np.sign(target - self.temp)*step
+        self.temp_time = now
+        if self.cooler and abs(self.temp - self.target_temp) < 0.5:
+            if self.stable_since is None:
+                self.stable_since = now
+        else:
+            self.stable_since = None
+
+    def temperatureCode(self):
+        self.updateTemperature()
+        if not self.cooler:
+            return SDK.DRV_TEMP_OFF
+        if self.stable_since is None:
+            return SDK.DRV_TEMP_NOT_REACHED
+        if time.perf_counter() - self.stable_since < self.stabilize_time:
+            return SDK.DRV_TEMP_NOT_STABILIZED
+        return SDK.DRV_TEMP_STABILIZED
+
+    # SDK functions, called by atmcd with ctypes arguments
+
+    def Initialize(self, dir):
+        self.initialized = True
+        return SDK.DRV_SUCCESS
+
+    def ShutDown(self):
+        self.AbortAcquisition()
+        self.initialized = False
+        return SDK.DRV_SUCCESS
+
+    def GetAvailableCameras(self, totalCameras):
+        _store(totalCameras, 1)
+        return SDK.DRV_SUCCESS
+
+    def GetCameraHandle(self, cameraIndex, cameraHandle):
+        if _value(cameraIndex) != 0:
+            return SDK.DRV_P1INVALID
+        _store(cameraHandle, self.handle)
+        return SDK.DRV_SUCCESS
+
+    def SetCurrentCamera(self, cameraHandle):
+        return SDK.DRV_SUCCESS if _value(cameraHandle) == self.handle else SDK.DRV_P1INVALID
+
+    def GetCurrentCamera(self, cameraHandle):
+        _store(cameraHandle, self.handle)
+        return SDK.DRV_SUCCESS
+
+    def WaitForAcquisitionByHandle(self, cameraHandle):
+        return self.waitEvent() if _value(cameraHandle) == self.handle else SDK.DRV_P1INVALID
+
+    def WaitForAcquisitionByHandleTimeOut(self, cameraHandle, iTimeOutMs):
+        if _value(cameraHandle) != self.handle:
+            return SDK.DRV_P1INVALID
+        return self.waitEvent(_value(iTimeOutMs)/1000.0)
+
+    def GetCameraSerialNumber(self, number):
+        _store(number, self.serial_number)
+        return SDK.DRV_SUCCESS
+
+    def GetDetector(self, xpixels, ypixels):
+        _store(xpixels, self.xpixels)
+        _store(ypixels, self.ypixels)
+        return SDK.DRV_SUCCESS
+
+    def SetAcquisitionMode(self, mode):
+        mode = _value(mode)
+        if mode not in (1, 2, 3, 5):
+            return SDK.DRV_P1INVALID
+        self.acq_mode = mode
+        return SDK.DRV_SUCCESS
+
+    def SetReadMode(self, mode):
+        mode = _value(mode)
+        if mode not in (0, 1, 2, 3, 4):
+            return SDK.DRV_P1INVALID
+        self.read_mode = mode
+        return SDK.DRV_SUCCESS
+
+    def SetFVBHBin(self, bin):
+        return self.setHBin("fvb_hbin", bin)
+
+    def SetSingleTrackHBin(self, bin):
+        return self.setHBin("single_hbin", bin)
+
+    def SetMultiTrackHBin(self, bin):
+        return self.setHBin("multi_hbin", bin)
+
+    def SetCustomTrackHBin(self, bin):
+        return self.setHBin("custom_hbin", bin)
+
+    def setHBin(self, name, bin):
+        bin = _value(bin)
+        if not 1 <= bin <= self.xpixels:
+            return SDK.DRV_P1INVALID
+        setattr(self, name, bin)
+        return SDK.DRV_SUCCESS
+
+    def GetNumberADChannels(self, channels):
+        _store(channels, 1)
+        return SDK.DRV_SUCCESS
+
+    def SetADChannel(self, channel):
+        return SDK.DRV_SUCCESS if _value(channel) == 0 else SDK.DRV_P1INVALID
+
+    def GetBitDepth(self, channel, depth):
+        if _value(channel) != 0:
+            return SDK.DRV_P1INVALID
+        _store(depth, 16)
+        return SDK.DRV_SUCCESS
+
+    def GetNumberAmp(self, amp):
+        _store(amp, 1)
+        return SDK.DRV_SUCCESS
+
+    def SetOutputAmplifier(self, typ):
+        return SDK.DRV_SUCCESS if _value(typ) == 0 else SDK.DRV_P1INVALID
+
+    def GetNumberHSSpeeds(self, channel, typ, speeds):
+        if _value(channel) != 0:
+            return SDK.DRV_P1INVALID
+        if _value(typ) != 0:
+            return SDK.DRV_P2INVALID
+        _store(speeds, len(self.hs_speeds))
+        return SDK.DRV_SUCCESS
+
+    def GetHSSpeed(self, channel, typ, index, speed):
+        if _value(channel) != 0:
+            return SDK.DRV_P1INVALID
+        if _value(typ) != 0:
+            return SDK.DRV_P2INVALID
+        if not 0 <= _value(index) < len(self.hs_speeds):
+            return SDK.DRV_P3INVALID
+        _store(speed, self.hs_speeds[_value(index)])
+        return SDK.DRV_SUCCESS
+
+    def SetHSSpeed(self, typ, index):
+        if _value(typ) != 0:
+            return SDK.DRV_P1INVALID
+        if not 0 <= _value(index) < len(self.hs_speeds):
+            return SDK.DRV_P2INVALID
+        self.pixel_rate = self.hs_speeds[_value(index)]*1e6
+        return SDK.DRV_SUCCESS
+
+    def GetNumberVSSpeeds(self, speeds):
+        _store(speeds, len(self.vs_speeds))
+        return SDK.DRV_SUCCESS
+
+    def GetVSSpeed(self, index, speed):
+        if not 0 <= _value(index) < len(self.vs_speeds):
+            return SDK.DRV_P1INVALID
+        _store(speed, self.vs_speeds[_value(index)])
+        return SDK.DRV_SUCCESS
+
+    def GetFastestRecommendedVSSpeed(self, index, speed):
+        _store(index, self.vs_recommended)
+        _store(speed, self.vs_speeds[self.vs_recommended])
+        return SDK.DRV_SUCCESS
+
+    def SetVSSpeed(self, index):
+        if not 0 <= _value(index) < len(self.vs_speeds):
+            return SDK.DRV_P1INVALID
+        self.row_shift = self.vs_speeds[_value(index)]*1e-6
+        return SDK.DRV_SUCCESS
+
+    def GetNumberPreAmpGains(self, noGains):
+        _store(noGains, len(self.preamp_gains))
+        return SDK.DRV_SUCCESS
+
+    def GetPreAmpGain(self, index, gain):
+        if not 0 <= _value(index) < len(self.preamp_gains):
+            return SDK.DRV_P1INVALID
+        _store(gain, self.preamp_gains[_value(index)])
+        return SDK.DRV_SUCCESS
+
+    def SetPreAmpGain(self, index):
+        if not 0 <= _value(index) < len(self.preamp_gains):
+            return SDK.DRV_P1INVALID
+        self.preamp_gain = self.preamp_gains[_value(index)]
+        return SDK.DRV_SUCCESS
+
+    def IsPreAmpGainAvailable(self, channel, amplifier, index, pa, status):
+        (index, pa) = (_value(index), _value(pa))
+        if not 0 <= index < len(self.hs_speeds):
+            return SDK.DRV_P3INVALID
+        if not 0 <= pa < len(self.preamp_gains):
+            return SDK.DRV_P4INVALID
+        fastest = self.hs_speeds.index(max(self.hs_speeds))
+        highest = self.preamp_gains.index(max(self.preamp_gains))
+        _store(status, 0 if (index, pa) == (fastest, highest) else 1)
+        return SDK.DRV_SUCCESS
+
+    def SetSingleTrack(self, centre, height):
+        (centre, height) = (_value(centre), _value(height))
+        if not 1 <= centre <= self.ypixels:
+            return SDK.DRV_P1INVALID
+        if height < 1 or centre - height//2 < 1 or centre - height//2 + height - 1 > self.ypixels:
+            return SDK.DRV_P2INVALID
+        self.single_track = (centre, height)
+        return SDK.DRV_SUCCESS
+
+    """
+    Spreads number tracks of height rows evenly over the detector, with equal gaps above, between and below them,
+    shifted up by offset rows.
+    """
+    def SetMultiTrack(self, number, height, offset, bottom, gap):
+        (number, height, offset) = (_value(number), _value(height), _value(offset))
+        if not 1 <= number <= self.ypixels:
+            return SDK.DRV_P1INVALID
+        if height < 1 or number*height > self.ypixels:
+            return SDK.DRV_P2INVALID
+        spacing = (self.ypixels - number*height)//(number + 1)
+        first = spacing + 1 + offset
+        if first < 1 or first + number*(height + spacing) - spacing - 1 > self.ypixels:
+            return SDK.DRV_P3INVALID
+        self.multi_tracks = [(first + i*(height + spacing), first + i*(height + spacing) + height - 1) for i in range(number)]
+        _store(bottom, first)
+        _store(gap, spacing)
+        return SDK.DRV_SUCCESS
+
+    def SetMultiTrackHRange(self, iStart, iEnd):
+        (start, end) = (_value(iStart), _value(iEnd))
+        if not 1 <= start <= end <= self.xpixels:
+            return SDK.DRV_P1INVALID
+        self.multi_hrange = (start, end)
+        return SDK.DRV_SUCCESS
+
+    def SetRandomTracks(self, numTracks, areas):
+        number = _value(numTracks)
+        if not 1 <= number <= self.ypixels//2:
+            return SDK.DRV_P1INVALID
+        rows = _buffer(areas, 2*number).tolist()
+        tracks = list(zip(rows[0::2], rows[1::2]))
+        if rows != sorted(rows) or rows[0] < 1 or rows[-1] > self.ypixels or any(bottom > top for (bottom, top) in tracks):
+            return SDK.DRV_P2INVALID
+        self.random_tracks = tracks
+        return SDK.DRV_SUCCESS
+
+    """
+    Isolated crop mode, modelled for full vertical binning: only the bottom cropheight rows are shifted and only the
+    first cropwidth columns are digitized.
+    """
+    def SetIsolatedCropMode(self, active, cropheight, cropwidth, vbin, hbin):
+        (active, height, width, vbin, hbin) = (_value(arg) for arg in (active, cropheight, cropwidth, vbin, hbin))
+        if active not in (0, 1):
+            return SDK.DRV_P1INVALID
+        if active == 0:
+            self.crop = None
+            return SDK.DRV_SUCCESS
+        if not 1 <= height <= self.ypixels:
+            return SDK.DRV_P2INVALID
+        if not 1 <= width <= self.xpixels:
+            return SDK.DRV_P3INVALID
+        if hbin < 1:
+            return SDK.DRV_P5INVALID
+        self.crop = (height, width, vbin, hbin)
+        return SDK.DRV_SUCCESS
+
+    def SetTriggerMode(self, mode):
+        self.trigger_mode = _value(mode)
+        return SDK.DRV_SUCCESS if self.trigger_mode == 0 else SDK.DRV_P1INVALID
+
+    def SetImage(self, hbin, vbin, hstart, hend, vstart, vend):
+        image = tuple(_value(arg) for arg in (hbin, vbin, hstart, hend, vstart, vend))
+        (hbin, vbin, hstart, hend, vstart, vend) = image
+        if not (1 <= hstart <= hend <= self.xpixels and 1 <= vstart <= vend <= self.ypixels):
+            return SDK.DRV_P3INVALID
+        if hbin < 1 or (hend - hstart + 1) % hbin or vbin < 1 or (vend - vstart + 1) % vbin:
+            return SDK.DRV_P1INVALID
+        self.image = image
+        return SDK.DRV_SUCCESS
+
+    def SetExposureTime(self, time):
+        self.exposure = max(float(_value(time)), 0.0)
+        return SDK.DRV_SUCCESS
+
+    def SetNumberAccumulations(self, number):
+        self.n_accumulate = max(int(_value(number)), 1)
+        return SDK.DRV_SUCCESS
+
+    def SetAccumulationCycleTime(self, time):
+        self.accumulate_cycle = max(float(_value(time)), 0.0)
+        return SDK.DRV_SUCCESS
+
+    def SetNumberKinetics(self, number):
+        self.n_kinetics = max(int(_value(number)), 1)
+        return SDK.DRV_SUCCESS
+
+    def SetKineticCycleTime(self, time):
+        self.kinetic_cycle = max(float(_value(time)), 0.0)
+        return SDK.DRV_SUCCESS
+
+    def SetShutter(self, typ, mode, closingtime, openingtime):
+        return SDK.DRV_SUCCESS
+
+    def GetAcquisitionTimings(self, exposure, accumulate, kinetic):
+        for (ref, value) in zip((exposure, accumulate, kinetic), self.timings()):
+            _store(ref, value)
+        return SDK.DRV_SUCCESS
+
+    def GetReadOutTime(self, ReadOutTime):
+        _store(ReadOutTime, self.readoutTime())
+        return SDK.DRV_SUCCESS
+
+    def GetSizeOfCircularBuffer(self, index):
+        _store(index, self.buffer_frames)
+        return SDK.DRV_SUCCESS
+
+    def PrepareAcquisition(self):
+        return SDK.DRV_SUCCESS
+
+    def FreeInternalMemory(self):
+        return SDK.DRV_SUCCESS
+
+    def StartAcquisition(self):
+        with self.cond:
+            if not self.initialized:
+                return SDK.DRV_NOT_INITIALIZED
+            if self.isAcquiring():
+                return SDK.DRV_ACQUIRING
+            self.series_length = {1: 1, 2: 1, 3: self.n_kinetics, 5: None}[self.acq_mode]
+            self.acquisitions += 1
+            self.start_time = time.perf_counter()
+            self.frozen = None
+            self.acquiring = True
+            self.next_new = 1
+            self.events_seen = 0
+            self.cond.notify_all()
+        return SDK.DRV_SUCCESS
+
+    def AbortAcquisition(self):
+        with self.cond:
+            if not self.isAcquiring():
+                return SDK.DRV_IDLE
+            self.frozen = self.acquiredCount()
+            self.acquiring = False
+            self.interrupts += 1
+            self.cond.notify_all()
+        return SDK.DRV_SUCCESS
+
+    def GetStatus(self, status):
+        if not self.initialized:
+            return SDK.DRV_NOT_INITIALIZED
+        _store(status, SDK.DRV_ACQUIRING if self.isAcquiring() else SDK.DRV_IDLE)
+        return SDK.DRV_SUCCESS
+
+    def GetAcquisitionProgress(self, acc, series):
+        count = self.acquiredCount()
+        _store(acc, count*self.accumulations())
+        _store(series, count)
+        return SDK.DRV_SUCCESS
+
+    def GetTotalNumberImagesAcquired(self, index):
+        _store(index, self.acquiredCount())
+        return SDK.DRV_SUCCESS
+
+    """
+    Blocks until a frame completes that no earlier wait has reported (an acquisition event), the acquisition is
+    aborted, CancelWait is called or timeout seconds pass. Like the SDK, it also waits while the camera is idle.
+    """
+    def waitEvent(self, timeout=None):
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.cond:
+            interrupts = self.interrupts
+            while True:
+                count = self.acquiredCount()
+                if count > self.events_seen:
+                    self.events_seen = count
+                    return SDK.DRV_SUCCESS
+                if self.interrupts != interrupts:
+                    return SDK.DRV_NO_NEW_DATA
+                now = time.perf_counter()
+                wake = self.frameReadyTime(self.events_seen + 1) if self.acquiring else None
+                if deadline is not None:
+                    if now >= deadline:
+                        return SDK.DRV_NO_NEW_DATA
+                    wake = deadline if wake is None else min(wake, deadline)
+                self.cond.wait(None if wake is None else max(wake - now, 0.0))
+
+    def WaitForAcquisition(self):
+        return self.waitEvent()
+
+    def WaitForAcquisitionTimeOut(self, iTimeOutMs):
+        return self.waitEvent(_value(iTimeOutMs)/1000.0)
+
+    def CancelWait(self):
+        with self.cond:
+            self.interrupts += 1
+            self.cond.notify_all()
+        return SDK.DRV_SUCCESS
+
+    """
+    @return: Returns (first, last) series indices still held in the circular buffer, or None if nothing is acquired
+    """
+    def bufferRange(self):
+        count = self.acquiredCount()
+        if count == 0:
+            return None
+        return (max(1, count - self.buffer_frames + 1), count)
+
+    def GetNumberNewImages(self, first, last):
+        held = self.bufferRange()
+        if held is None or max(self.next_new, held[0]) > held[1]:
+            return SDK.DRV_NO_NEW_DATA
+        _store(first, max(self.next_new, held[0]))
+        _store(last, held[1])
+        return SDK.DRV_SUCCESS
+
+    def GetNumberAvailableImages(self, first, last):
+        held = self.bufferRange()
+        if held is None:
+            return SDK.DRV_NO_NEW_DATA
+        _store(first, held[0])
+        _store(last, held[1])
+        return SDK.DRV_SUCCESS
+
+    def copyFrames(self, first, last, arr, size):
+        frame_size = self.frameSize()
+        if size != (last - first + 1)*frame_size:
+            return SDK.DRV_P4INVALID
+        out = _buffer(arr, size).reshape(last - first + 1, frame_size)
+        for (row, index) in enumerate(range(first, last + 1)):
+            out[row] = np.minimum(self.frame(index), np.iinfo(out.dtype).max)
+        return SDK.DRV_SUCCESS
+
+    def GetImages(self, first, last, arr, size, validfirst, validlast):
+        (first, last, size) = (_value(first), _value(last), _value(size))
+        held = self.bufferRange()
+        if held is None:
+            return SDK.DRV_NO_NEW_DATA
+        if not (held[0] <= first <= last <= held[1]):
+            return SDK.DRV_P1INVALID
+        ret = self.copyFrames(first, last, arr, size)
+        if ret == SDK.DRV_SUCCESS:
+            _store(validfirst, first)
+            _store(validlast, last)
+            self.next_new = max(self.next_new, last + 1)
+        return ret
+
+    GetImages16 = GetImages
+
+    def GetMostRecentImage(self, arr, size):
+        held = self.bufferRange()
+        if held is None:
+            return SDK.DRV_NO_NEW_DATA
+        return self.copyFrames(held[1], held[1], arr, _value(size))
+
+    GetMostRecentImage16 = GetMostRecentImage
+
+    def GetOldestImage(self, arr, size):
+        held = self.bufferRange()
+        if held is None or max(self.next_new, held[0]) > held[1]:
+            return SDK.DRV_NO_NEW_DATA
+        index = max(self.next_new, held[0])
+        ret = self.copyFrames(index, index, arr, _value(size))
+        if ret == SDK.DRV_SUCCESS:
+            self.next_new = index + 1
+        return ret
+
+    GetOldestImage16 = GetOldestImage
+
+    def GetAcquiredData(self, arr, size):
+        count = self.acquiredCount()
+        if count == 0 or self.isAcquiring():
+            return SDK.DRV_ACQUIRING if self.acquiring else SDK.DRV_NO_NEW_DATA
+        first = max(1, count - self.buffer_frames + 1)
+        return self.copyFrames(first, count, arr, _value(size))
+
+    GetAcquiredData16 = GetAcquiredData
+
+    def CoolerON(self):
+        self.updateTemperature()
+        self.cooler = True
+        return SDK.DRV_SUCCESS
+
+    def CoolerOFF(self):
+        self.updateTemperature()
+        self.cooler = False
+        return SDK.DRV_SUCCESS
+
+    def IsCoolerOn(self, iCoolerStatus):
+        _store(iCoolerStatus, int(self.cooler))
+        return SDK.DRV_SUCCESS
+
+    def SetTemperature(self, temperature):
+        self.updateTemperature()
+        self.target_temp = _value(temperature)
+        self.stable_since = None
+        return SDK.DRV_SUCCESS
+
+    def GetTemperatureRange(self, mintemp, maxtemp):
+        _store(mintemp, -100)
+        _store(maxtemp, 20)
+        return SDK.DRV_SUCCESS
+
+    def GetTemperature(self, temperature):
+        code = self.temperatureCode()
+        _store(temperature, int(round(self.temp)))
+        return code
+
+    def GetTemperatureF(self, temperature):
+        code = self.temperatureCode()
+        _store(temperature, self.temp)
+        return code
+
+"""
+Several simulated cameras behind one SDK, switched with SetCurrentCamera like the real library: every other call goes
+to the current camera, and the ByHandle waits go to the camera named. options are passed to each SimulatedSDK.
+"""
+class SimulatedCameraSet():
+    def __init__(self, n_cameras=2, **options):
+        self.cameras = [SimulatedSDK(serial_number=12345 + i, seed=i, handle=100 + i, **options)
+                        for i in range(n_cameras)]
+        self.current = self.cameras[0]
+        self.switches = 0
+
+    def camera(self, handle):
+        for camera in self.cameras:
+            if camera.handle == handle:
+                return camera
+        return None
+
+    def GetAvailableCameras(self, totalCameras):
+        _store(totalCameras, len(self.cameras))
+        return SDK.DRV_SUCCESS
+
+    def GetCameraHandle(self, cameraIndex, cameraHandle):
+        index = _value(cameraIndex)
+        if not 0 <= index < len(self.cameras):
+            return SDK.DRV_P1INVALID
+        _store(cameraHandle, self.cameras[index].handle)
+        return SDK.DRV_SUCCESS
+
+    def SetCurrentCamera(self, cameraHandle):
+        camera = self.camera(_value(cameraHandle))
+        if camera is None:
+            return SDK.DRV_P1INVALID
+        self.current = camera
+        self.switches += 1
+        return SDK.DRV_SUCCESS
+
+    def GetCurrentCamera(self, cameraHandle):
+        _store(cameraHandle, self.current.handle)
+        return SDK.DRV_SUCCESS
+
+    def WaitForAcquisitionByHandle(self, cameraHandle):
+        camera = self.camera(_value(cameraHandle))
+        return SDK.DRV_P1INVALID if camera is None else camera.waitEvent()
+
+    def WaitForAcquisitionByHandleTimeOut(self, cameraHandle, iTimeOutMs):
+        camera = self.camera(_value(cameraHandle))
+        return SDK.DRV_P1INVALID if camera is None else camera.waitEvent(_value(iTimeOutMs)/1000.0)
+
+    """
+    Everything else is dispatched to whichever camera is current at call time (atmcd binds some functions once).
+    """
+    def __getattr__(self, name):
+        if name.startswith("__") or not hasattr(SimulatedSDK, name):
+            raise AttributeError(name)
+        return lambda *args: getattr(self.current, name)(*args)
+
+class SimulatedSpectrometerPort():
+    """
+    Stands in for the serial.Serial of an Acton/Princeton spectrometer. Commands are echoed and answered with
+    " ok\r\n", in the order they were written; a GOTO is answered once the grating has arrived and MONO-?DONE reports
+    0 while it is moving.
+    goto_rate: grating slew rate (nm/s); settle_time: fixed overhead of every move (s)
+    timeout: longest a read waits for data, like the serial timeout
+    """
+    def __init__(self, wavelength=500.0, goto_rate=1000.0, settle_time=0.05, timeout=0.05, gratings=3):
+        self.wavelength = wavelength
+        self.goto_rate = goto_rate
+        self.settle_time = settle_time
+        self.timeout = timeout
+        self.gratings = gratings
+        self.grating = 1
+        self.turret = 1
+        self.move_end = 0.0
+        self.pending = []
+        self.output = bytearray()
+
+    def write(self, data):
+        now = time.perf_counter()
+        for command in data.split(b"\r")[:-1]:
+            # Commands are handled one at a time, in order: each starts once the reply to the one before it is out
+            start = max(now, self.pending[-1][0]) if self.pending else now
+            (ready, reply) = self.reply(command.strip(), start)
+            self.pending.append((ready, command + b" " + reply + b" ok\r\n"))
+        return len(data)
+
+    """
+    @return: Returns (ready_time, reply_body) for one command
+    """
+    def reply(self, command, now):
+        words = command.split()
+        if command.endswith(b"GOTO"):
+            target = float(words[0])
+            self.move_end = now + self.settle_time + abs(target - self.wavelength)/self.goto_rate
+            self.wavelength = target
+            return (self.move_end, b"")
+        if command == b"MONO-?DONE":
+            return (now, b"%d" % (now >= self.move_end))
+        if command == b"?NM":
+            return (now, b"%.3f nm" % self.wavelength)
+        if command == b"?GRATING":
+            return (now, b"%d" % self.grating)
+        if command == b"?TURRET":
+            return (now, b"%d" % self.turret)
+        if command == b"?GRATINGS":
+            lines = [b"%s%d  %d g/mm BLZ=  500NM" % (b"\x1a" if i == self.grating else b" ", i, 300*i)
+                     for i in range(1, self.gratings + 1)]
+            return (now, b"\r\n" + b"\r\n".join(lines) + b"\r\n")
+        if command.endswith(b"GRATING") or command.endswith(b"TURRET"):
+            if command.endswith(b"GRATING"):
+                self.grating = int(words[0])
+            else:
+                self.turret = int(words[0])
+            self.move_end = now + 10*self.settle_time
+            return (self.move_end, b"")
+        return (now, b"")
+
+    def pump(self):
+        now = time.perf_counter()
+        while self.pending and self.pending[0][0] <= now:
+            self.output += self.pending.pop(0)[1]
+
+    @property
+    def in_waiting(self):
+        self.pump()
+        return len(self.output)
+
+    def read(self, size=1):
+        deadline = time.perf_counter() + self.timeout
+        self.pump()
+        while not self.output and time.perf_counter() < deadline:
+            time.sleep(0.001)
+            self.pump()
+        data = bytes(self.output[:size])
+        del self.output[:size]
+        return data
+
+    def close(self):
+        pass
@@ -0,0 +1,387 @@
+"""
+Spools camera frames to disk for long kinetic series without holding them in memory.
+A reader thread drains new frames from the camera into a bounded queue; frames are grouped into chunks that a pool of
+writer threads compresses (zlib, after a byte shuffle that groups the bytes of each significance together) and that
+are appended to the file in order.
+
+File layout (little endian), readable with SpoolReader:
+    header: b"ANDORSPL", uint32 version, uint32 frame_size, 8-byte dtype string (e.g. b"<i4")
+    chunks: b"CHNK", uint64 first series index, uint32 n_frames, uint32 codec, uint64 stored bytes, payload
+    footer (written by close): uint64 offset per chunk, b"INDX", uint64 n_chunks, uint64 offset of the offsets
+A file without a footer (e.g. after a crash) is still readable: the chunks are found by walking the chunk headers.
+"""
+
+import os
+import time
+import struct
+import threading
+import queue
+import zlib
+import numpy as np
+import atmcd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+MAGIC = b"ANDORSPL"
+VERSION = 1
+HEADER = struct.Struct("<8sII8s")
+CHUNK = struct.Struct("<4sQIIQ")
+FOOTER = struct.Struct("<4sQQ")
+
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+CODEC_SHUFFLE = 2   # flag: bytes were shuffled before compression
+
+"""
+Compresses an (n_frames, frame_size) block.
+@return: Returns (codec, payload bytes)
+"""
+def compressFrames(frames, level=1, shuffle=True):
+    raw = np.ascontiguousarray(frames)
+    if level == 0:
+        return (CODEC_RAW, raw.tobytes())
+    codec = CODEC_ZLIB
+    if shuffle and raw.itemsize > 1:
+        raw = raw.view(np.uint8).reshape(-1, raw.itemsize).T
+        codec |= CODEC_SHUFFLE
+    return (codec, zlib.compress(np.ascontiguousarray(raw), level))
+
+def decompressFrames(codec, payload, n_frames, frame_size, dtype):
+    if codec == CODEC_RAW:
+        raw = np.frombuffer(payload, dtype=dtype)
+    else:
+        raw = np.frombuffer(zlib.decompress(payload), dtype=np.uint8)
+        if codec & CODEC_SHUFFLE:
+            raw = raw.reshape(dtype.itemsize, -1).T.copy()
+        raw = raw.view(dtype)
+    return raw.reshape(n_frames, frame_size)
+
+"""
+Append-only chunked frame file. With append=True an existing file is continued: its footer is dropped and rewritten
+by close(). keep cuts an appended file back to its first keep frames (rounded down to a chunk boundary); frames
+holds the number of frames kept.
+"""
+class SpoolWriter():
+    def __init__(self, path, frame_size, dtype=np.int32, append=False, keep=None):
+        self.dtype = np.dtype(dtype)
+        self.frame_size = frame_size
+        self.frames = 0
+        if append and os.path.exists(path):
+            reader = SpoolReader(path)
+            if (reader.frame_size, reader.dtype) != (frame_size, self.dtype):
+                raise ValueError("ERROR: %s holds %d-pixel %s frames" % (path, reader.frame_size, reader.dtype))
+            n_chunks = len(reader.offsets)
+            if keep is not None:
+                n_chunks = int(np.searchsorted(reader.starts, keep, side="right")) - 1
+            offsets = [int(offset) for offset in reader.offsets[:n_chunks]]
+            end = int(reader.offsets[n_chunks]) if n_chunks < len(reader.offsets) else reader.end
+            self.frames = int(reader.starts[n_chunks])
+            reader.close()
+            self.file = open(path, "r+b")
+            self.file.truncate(end)
+            self.file.seek(end)
+            self.offsets = offsets
+        else:
+            self.file = open(path, "wb")
+            self.file.write(HEADER.pack(MAGIC, VERSION, frame_size, self.dtype.str.encode().ljust(8)))
+            self.offsets = []
+
+    """
+    @return: Returns the number of bytes written
+    """
+    def writeChunk(self, first, n_frames, codec, payload):
+        self.offsets.append(self.file.tell())
+        self.file.write(CHUNK.pack(b"CHNK", first, n_frames, codec, len(payload)))
+        self.file.write(payload)
+        return CHUNK.size + len(payload)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        index_offset = self.file.tell()
+        self.file.write(np.asarray(self.offsets, dtype="<u8").tobytes())
+        self.file.write(FOOTER.pack(b"INDX", len(self.offsets), index_offset))
+        self.file.close()
+
+"""
+Random access to a spool file. Frames are numbered by position in the file (0 to len - 1); series_first gives the
+camera's series index of the first frame of each chunk. The file is memory-mapped: opening it reads only the index,
+and a read decompresses just the chunks it touches (uncompressed chunks are returned as views of the map).
+"""
+class SpoolReader():
+    def __init__(self, path):
+        self.map = np.memmap(path, dtype=np.uint8, mode="r")
+        (magic, version, self.frame_size, dtype) = HEADER.unpack(bytes(self.map[:HEADER.size]))
+        if magic != MAGIC:
+            raise ValueError("ERROR: %s is not a spool file" % path)
+        self.dtype = np.dtype(dtype.rstrip().decode())
+        offsets = self.readIndex()
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.series_first = np.zeros(len(offsets), dtype=np.int64)
+        self.counts = np.zeros(len(offsets), dtype=np.int64)
+        self.end = HEADER.size
+        for (i, offset) in enumerate(offsets):
+            (tag, self.series_first[i], self.counts[i], codec, stored) = self.chunkHeader(offset)
+            self.end = offset + CHUNK.size + stored
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)))
+        self.cache = (None, None)
+
+    def chunkHeader(self, offset):
+        return CHUNK.unpack(bytes(self.map[offset:offset + CHUNK.size]))
+
+    def readIndex(self):
+        end = len(self.map)
+        if end >= HEADER.size + FOOTER.size:
+            (tag, n_chunks, index_offset) = FOOTER.unpack(bytes(self.map[end - FOOTER.size:]))
+            if tag == b"INDX" and index_offset + 8*n_chunks + FOOTER.size == end:
+                return list(np.frombuffer(self.map[index_offset:index_offset + 8*n_chunks], dtype="<u8"))
+        # No footer: walk the chunk headers, stopping at a truncated chunk
+        offsets = []
+        offset = HEADER.size
+        while offset + CHUNK.size <= end:
+            (tag, first, n_frames, codec, stored) = self.chunkHeader(offset)
+            if tag != b"CHNK" or offset + CHUNK.size + stored > end:
+                break
+            offsets.append(offset)
+            offset += CHUNK.size + stored
+        return offsets
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def chunk(self, i):
+        if self.cache[0] != i:
+            offset = int(self.offsets[i])
+            (tag, first, n_frames, codec, stored) = self.chunkHeader(offset)
+            payload = self.map[offset + CHUNK.size:offset + CHUNK.size + stored]
+            self.cache = (i, decompressFrames(codec, payload, n_frames, self.frame_size, self.dtype))
+        return self.cache[1]
+
+    """
+    @return: Returns frames start to stop - 1 as an (n, frame_size) array
+    """
+    def read(self, start, stop):
+        start = max(start, 0)
+        stop = min(stop, len(self))
+        out = np.empty((max(stop - start, 0), self.frame_size), dtype=self.dtype)
+        i = np.searchsorted(self.starts, start, side="right") - 1
+        filled = 0
+        while start + filled < stop:
+            data = self.chunk(i)
+            lo = start + filled - self.starts[i]
+            n = min(stop - start - filled, len(data) - lo)
+            out[filled:filled + n] = data[lo:lo + n]
+            filled += n
+            i += 1
+        return out
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            (start, stop, step) = index.indices(len(self))
+            return self.read(start, stop)[::step]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("frame index out of range")
+        return self.read(index, index + 1)[0]
+
+    def close(self):
+        # The map is unmapped once the last view of it (e.g. an uncompressed frame) is released
+        self.cache = (None, None)
+        self.map = None
+
+"""
+Spooling pipeline: runs the acquisition set up on sdk (e.g. by AndorPrinceton.prepKineticAcq) and writes every frame
+to path.
+n_frames: frames to record (None: until the acquisition ends or stop()); frame_size: pixels per frame
+chunk_frames: frames per compressed chunk; writers: compression threads; level: zlib level (0 stores raw frames)
+queue_size: bound on the blocks of frames waiting for the writers; the camera's circular buffer absorbs the rest
+"""
+class Spooler():
+    def __init__(self, sdk, path, frame_size, n_frames=None, chunk_frames=64, writers=2, level=1, shuffle=True,
+                 queue_size=64, timeout_ms=1000):
+        self.sdk = sdk
+        self.path = path
+        self.frame_size = frame_size
+        self.n_frames = n_frames
+        self.chunk_frames = chunk_frames
+        self.writers = writers
+        self.level = level
+        self.shuffle = shuffle
+        self.timeout_ms = timeout_ms
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.error = None
+        self.threads = []
+        self.counters = {"frames_read": 0, "frames_lost": 0, "read_time": 0.0, "reader_stalls": 0, "max_queued": 0,
+                         "chunks": 0, "raw_bytes": 0, "compressed_bytes": 0, "compress_time": 0.0,
+                         "frames_written": 0, "bytes_written": 0, "write_time": 0.0}
+        self.start_time = None
+        self.end_time = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.threads = [threading.Thread(target=self.read, name="SpoolReader", daemon=True),
+                        threading.Thread(target=self.write, name="SpoolWriter", daemon=True)]
+        ret = self.sdk.StartAcquisition()
+        if ret != atmcd.atmcd.DRV_SUCCESS:
+            raise Exception("ERROR: StartAcquisition returned %d" % ret)
+        for thread in self.threads:
+            thread.start()
+
+    """
+    Stops reading (aborting the acquisition), writes the frames already read and closes the file.
+    """
+    def stop(self):
+        self.stopping.set()
+        self.wait()
+
+    """
+    Waits for the recording to finish.
+    @return: Returns True if finished, False on timeout
+    """
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for thread in self.threads:
+            thread.join(None if deadline is None else max(deadline - time.perf_counter(), 0))
+            if thread.is_alive():
+                return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+    def isRunning(self):
+        return any(thread.is_alive() for thread in self.threads)
+
+    def count(self, **increments):
+        with self.lock:
+            for (name, value) in increments.items():
+                self.counters[name] += value
+
+    def read(self):
+        expected = None
+        try:
+            while not self.stopping.is_set() and (self.n_frames is None or self.counters["frames_read"] < self.n_frames):
+                self.sdk.WaitForAcquisitionTimeOut(self.timeout_ms)
+                t0 = time.perf_counter()
+                (ret, status) = self.sdk.GetStatus()
+                (ret, first, last) = self.sdk.GetNumberNewImages()
+                if ret != atmcd.atmcd.DRV_SUCCESS:
+                    if status != atmcd.atmcd.DRV_ACQUIRING:
+                        break
+                    continue
+                if self.n_frames is not None:
+                    last = min(last, first + self.n_frames - self.counters["frames_read"] - 1)
+                data = np.empty((last - first + 1, self.frame_size), dtype=np.int32)
+                (ret, first, last) = self.sdk.GetImagesInto(first, last, data)
+                if ret != atmcd.atmcd.DRV_SUCCESS:
+                    continue
+                data = data[:last - first + 1]
+                lost = 0 if expected is None else first - expected
+                expected = last + 1
+                self.count(frames_read=len(data), frames_lost=lost, read_time=time.perf_counter() - t0)
+                self.put((first, data))
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.sdk.GetStatus()[1] == atmcd.atmcd.DRV_ACQUIRING:
+                self.sdk.AbortAcquisition()
+            self.frames.put(None)
+
+    """
+    Queues a block for the writer, waiting while the queue is full; gives up (dropping the block) if the writer failed.
+    """
+    def put(self, item):
+        try:
+            self.frames.put_nowait(item)
+        except queue.Full:
+            self.count(reader_stalls=1)
+            while self.error is None:
+                try:
+                    self.frames.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+        with self.lock:
+            self.counters["max_queued"] = max(self.counters["max_queued"], self.frames.qsize())
+
+    def compress(self, first, frames):
+        t0 = time.perf_counter()
+        (codec, payload) = compressFrames(frames, self.level, self.shuffle)
+        self.count(chunks=1, raw_bytes=frames.nbytes, compressed_bytes=len(payload),
+                   compress_time=time.perf_counter() - t0)
+        return (first, len(frames), codec, payload)
+
+    def write(self):
+        writer = None
+        pending = deque()
+        def append(future):
+            (first, n_frames, codec, payload) = future.result()
+            t0 = time.perf_counter()
+            written = writer.writeChunk(first, n_frames, codec, payload)
+            writer.flush()
+            self.count(frames_written=n_frames, bytes_written=written, write_time=time.perf_counter() - t0)
+        ended = False
+        try:
+            writer = SpoolWriter(self.path, self.frame_size)
+            with ThreadPoolExecutor(max_workers=self.writers) as pool:
+                blocks = []
+                (chunk_first, chunk_len) = (None, 0)
+                while True:
+                    item = self.frames.get()
+                    ended = item is None
+                    if item is not None:
+                        (first, data) = item
+                        if chunk_len and first != chunk_first + chunk_len:
+                            pending.append(pool.submit(self.compress, chunk_first, np.concatenate(blocks)))
+                            (blocks, chunk_len) = ([], 0)
+                        while len(data):
+                            if chunk_len == 0:
+                                chunk_first = first
+                            take = data[:self.chunk_frames - chunk_len]
+                            blocks.append(take)
+                            chunk_len += len(take)
+                            (first, data) = (first + len(take), data[len(take):])
+                            if chunk_len == self.chunk_frames:
+                                pending.append(pool.submit(self.compress, chunk_first, np.concatenate(blocks)))
+                                (blocks, chunk_len) = ([], 0)
+                    elif chunk_len:
+                        pending.append(pool.submit(self.compress, chunk_first, np.concatenate(blocks)))
+                    while pending and (item is None or pending[0].done() or len(pending) > 2*self.writers):
+                        append(pending.popleft())
+                    if item is None:
+                        break
+        except Exception as e:
+            # Stop the reader (which aborts the acquisition) and drain the queue until it has finished, unless its
+            # end marker was already taken (the error came from the final flush)
+            self.error = e
+            self.stopping.set()
+            reader = self.threads[0]
+            while not ended:
+                try:
+                    ended = self.frames.get(timeout=0.1) is None
+                except queue.Empty:
+                    ended = not reader.is_alive()
+        finally:
+            if writer is not None:
+                writer.close()
+            self.end_time = time.perf_counter()
+
+    """
+    @return: Returns a copy of the counters plus per-stage throughput: read, compress and write rates in MB/s of
+             stage busy time, overall frames/s, and the compression ratio
+    """
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        elapsed = ((self.end_time or time.perf_counter()) - self.start_time) if self.start_time is not None else 0.0
+        raw = stats["frames_read"]*self.frame_size*4
+        stats["elapsed"] = elapsed
+        stats["frames_per_s"] = stats["frames_written"]/elapsed if elapsed > 0 else 0.0
+        stats["read_MBps"] = raw/stats["read_time"]/1e6 if stats["read_time"] > 0 else 0.0
+        stats["compress_MBps"] = stats["raw_bytes"]/stats["compress_time"]/1e6 if stats["compress_time"] > 0 else 0.0
+        stats["write_MBps"] = stats["bytes_written"]/stats["write_time"]/1e6 if stats["write_time"] > 0 else 0.0
+        stats["ratio"] = stats["raw_bytes"]/stats["compressed_bytes"] if stats["compressed_bytes"] else 0.0
+        return stats
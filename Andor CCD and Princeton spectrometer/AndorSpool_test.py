@@ -0,0 +1,53 @@
+"""
+Tests for the AndorSpool recording pipeline, on the simulated SDK. Run with: python -m pytest AndorSpool_test.py
+"""
+
+import os
+import contextlib
+import io
+import pytest
+import AndorSpool
+from AndorPrinceton import AndorPrinceton
+from AndorSimulator import SimulatedSpectrometerPort
+from AndorSpool import SpoolReader
+
+def makeCamera(n_frames):
+    with contextlib.redirect_stdout(io.StringIO()):
+        ap = AndorPrinceton(SimulatedSpectrometerPort(), sdk_backend="simulated")
+    ap.setExposure(0.001)
+    ap.prepKineticAcq(n_frames)
+    return ap
+
+def testSpoolRoundTrip(tmp_path):
+    ap = makeCamera(10)
+    path = str(tmp_path/"run.spool")
+    spooler = ap.spool(path, chunk_frames=4)
+    assert spooler.wait(timeout=10)
+    reader = SpoolReader(path)
+    assert len(reader) == 10
+    reader.close()
+
+"""
+A write error on the final flush comes after the reader's end marker was taken from the queue; the writer must still
+close the file and report the error instead of waiting for another marker.
+"""
+def testWriteErrorOnLastChunk(tmp_path, monkeypatch):
+    writeChunk = AndorSpool.SpoolWriter.writeChunk
+    def failLastChunk(writer, first, n_frames, codec, payload):
+        if n_frames < 4:
+            raise OSError("disk full")
+        return writeChunk(writer, first, n_frames, codec, payload)
+    monkeypatch.setattr(AndorSpool.SpoolWriter, "writeChunk", failLastChunk)
+    ap = makeCamera(10)
+    spooler = ap.spool(str(tmp_path/"run.spool"), chunk_frames=4)
+    with pytest.raises(OSError, match="disk full"):
+        assert spooler.wait(timeout=10), "spooler hung after the write error"
+    assert not spooler.isRunning()
+    assert spooler.stats()["frames_written"] == 8
+
+def testWriterOpenError(tmp_path):
+    ap = makeCamera(None)
+    spooler = ap.spool(os.path.join(str(tmp_path), "missing", "run.spool"))
+    with pytest.raises(FileNotFoundError):
+        spooler.wait(timeout=10)
+    assert not spooler.isRunning()
@@ -0,0 +1,129 @@
+"""
+Buffered command/reply engine for the Princeton (Acton) spectrometer serial protocol.
+Replies are read into a byte buffer in whatever chunks the port delivers and split on the "ok\r\n" terminator, so
+several commands can be written back to back and their replies collected afterwards.
+"""
+
+import re
+import time
+import asyncio
+
+REPLY_END = b"ok\r\n"
+NUMBER = re.compile(rb"[-+]?(?:\d+\.?\d*|\.\d+)")
+
+class PrincetonProtocol():
+    """
+    port: an open serial.Serial (its timeout bounds each read, not a whole reply)
+    timeout: seconds to wait for an ordinary reply
+    move_timeout: seconds to wait for a grating move to finish
+    poll_initial, poll_max, poll_factor: MONO-?DONE polling starts poll_initial seconds apart and backs off by
+    poll_factor up to poll_max
+    """
+    def __init__(self, port, timeout=2.0, move_timeout=60.0, poll_initial=0.02, poll_max=0.5, poll_factor=2.0):
+        self.port = port
+        self.timeout = timeout
+        self.move_timeout = move_timeout
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.poll_factor = poll_factor
+        self.buffer = bytearray()
+
+    """
+    Writes one or more commands (bytes, without the trailing carriage return) in a single write.
+    """
+    def send(self, *commands):
+        self.port.write(b"".join(command + b"\r" for command in commands))
+
+    """
+    Returns the next complete reply (including its "ok\r\n" terminator) from the buffer, reading from the port as needed.
+    """
+    def readReply(self, timeout=None):
+        deadline = time.perf_counter() + (self.timeout if timeout is None else timeout)
+        while True:
+            end = self.buffer.find(REPLY_END)
+            if end >= 0:
+                end += len(REPLY_END)
+                reply = bytes(self.buffer[:end])
+                del self.buffer[:end]
+                return reply
+            if time.perf_counter() > deadline:
+                raise TimeoutError("ERROR: no reply from spectrometer (received %r)" % bytes(self.buffer))
+            self.buffer += self.port.read(max(1, self.port.in_waiting))
+
+    """
+    Pipelines commands: writes all of them, then collects one reply per command, in order.
+    """
+    def query(self, *commands, timeout=None):
+        self.send(*commands)
+        return [self.readReply(timeout) for command in commands]
+
+    """
+    Sends command and returns the first number in its reply (after any echo of the command).
+    """
+    def queryNumber(self, command, timeout=None):
+        return firstNumber(command, self.query(command, timeout=timeout)[0])
+
+    """
+    Returns True once the grating reports that the last move has finished.
+    """
+    def moveDone(self):
+        return self.queryNumber(b"MONO-?DONE") == 1
+
+    """
+    Polls MONO-?DONE with exponential backoff until the grating move finishes.
+    """
+    def waitDone(self, timeout=None):
+        deadline = time.perf_counter() + (self.move_timeout if timeout is None else timeout)
+        delay = self.poll_initial
+        while not self.moveDone():
+            if time.perf_counter() > deadline:
+                raise TimeoutError("ERROR: spectrometer move did not finish")
+            time.sleep(delay)
+            delay = min(delay*self.poll_factor, self.poll_max)
+
+"""
+asyncio front end for a PrincetonProtocol. Serial I/O runs in the default executor, one command exchange at a time,
+and move polling backs off with asyncio.sleep so the event loop is never blocked.
+"""
+class AsyncPrincetonProtocol():
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.lock = asyncio.Lock()
+
+    async def query(self, *commands, timeout=None):
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: self.protocol.query(*commands, timeout=timeout))
+
+    async def queryNumber(self, command, timeout=None):
+        return firstNumber(command, (await self.query(command, timeout=timeout))[0])
+
+    async def waitDone(self, timeout=None):
+        protocol = self.protocol
+        deadline = time.perf_counter() + (protocol.move_timeout if timeout is None else timeout)
+        delay = protocol.poll_initial
+        while await self.queryNumber(b"MONO-?DONE") != 1:
+            if time.perf_counter() > deadline:
+                raise TimeoutError("ERROR: spectrometer move did not finish")
+            await asyncio.sleep(delay)
+            delay = min(delay*protocol.poll_factor, protocol.poll_max)
+
+    async def setWavelength(self, wavelength):
+        await self.query(str(wavelength).encode("utf-8") + b" GOTO", timeout=self.protocol.move_timeout)
+        await self.waitDone()
+
+    async def getWavelength(self):
+        return await self.queryNumber(b"?NM")
+
+"""
+Returns the first number in reply after stripping an echo of command, as an int if it has no decimal point.
+"""
+def firstNumber(command, reply):
+    reply = reply.lstrip()
+    if reply.startswith(command):
+        reply = reply[len(command):]
+    match = NUMBER.search(reply)
+    if match is None:
+        raise ValueError("ERROR: no number in spectrometer reply %r" % reply)
+    text = match.group()
+    return float(text) if b"." in text else int(text)
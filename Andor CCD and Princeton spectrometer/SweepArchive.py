@@ -0,0 +1,207 @@
+"""
+Archive of sweep frames for long-term storage and analysis.
+An archive is a directory of three append-only files:
+    counts.spool, wavelengths.spool: chunked, compressed (n_frames, n_pixels) datasets in the AndorSpool format
+    meta.bin: one META_DTYPE record per frame (raw little-endian records, read back with np.memmap)
+Opening an archive reads only the chunk indexes: metadata columns are memory-mapped, and counts and wavelengths are
+decompressed chunk by chunk when accessed, so archives far larger than memory can be queried by frame number, time or
+wavelength range. Frames are buffered in memory until a chunk is full (or flush()); metadata is written right after
+the chunks holding its frames. Readers only see frames present in all three files, and reopening an archive for
+appending cuts the files back to the last chunk all three hold completely, so after a crash they still agree.
+"""
+
+import os
+import time
+import numpy as np
+from AndorSpool import SpoolWriter, SpoolReader, compressFrames
+from AndorPrinceton import SweepFrame
+
+META_DTYPE = np.dtype([("time", "<f8"), ("sweep", "<i4"), ("target", "<f8"), ("center", "<f8"), ("mp", "<i4"),
+                       ("exposure", "<f4"), ("temperature", "<f4"), ("wl_min", "<f8"), ("wl_max", "<f8")])
+
+class SweepArchive():
+    """
+    path: archive directory; mode: "r" to read, "a" to append (the archive is created if needed)
+    chunk_frames: frames per compressed chunk; level: zlib level (0 stores raw chunks)
+    """
+    def __init__(self, path, mode="r", chunk_frames=32, level=1):
+        if mode not in ("r", "a"):
+            raise ValueError("ERROR: mode must be 'r' or 'a'")
+        self.path = path
+        self.mode = mode
+        self.chunk_frames = chunk_frames
+        self.level = level
+        if mode == "a":
+            os.makedirs(path, exist_ok=True)
+        elif not os.path.isdir(path):
+            raise FileNotFoundError("ERROR: no archive at %s" % path)
+        self.counts_path = os.path.join(path, "counts.spool")
+        self.wavelengths_path = os.path.join(path, "wavelengths.spool")
+        self.meta_path = os.path.join(path, "meta.bin")
+        self.counts_writer = None
+        self.wavelengths_writer = None
+        self.meta_file = None
+        self.pending = []
+        self.refresh()
+        self.next_sweep = int(self.meta["sweep"].max()) + 1 if len(self) else 0
+
+    """
+    Re-opens the readers, making frames flushed since the archive was opened (by this or another process) visible.
+    """
+    def refresh(self):
+        self.counts_reader = SpoolReader(self.counts_path) if os.path.exists(self.counts_path) else None
+        self.wavelengths_reader = SpoolReader(self.wavelengths_path) if os.path.exists(self.wavelengths_path) else None
+        n_meta = os.path.getsize(self.meta_path)//META_DTYPE.itemsize if os.path.exists(self.meta_path) else 0
+        n = min(n_meta, len(self.counts_reader) if self.counts_reader else 0,
+                len(self.wavelengths_reader) if self.wavelengths_reader else 0)
+        if n > 0:
+            self.meta = np.memmap(self.meta_path, dtype=META_DTYPE, mode="r", shape=(n,))
+        else:
+            self.meta = np.zeros(0, dtype=META_DTYPE)
+
+    def __len__(self):
+        return len(self.meta)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Writing
+
+    def openWriters(self, n_pixels):
+        append = self.counts_reader is not None
+        # Cut all three files back to the last chunk boundary they all hold completely, dropping chunks written without
+        # their metadata (or metadata without its chunks) by an interrupted write
+        n = len(self)
+        for reader in (self.counts_reader, self.wavelengths_reader):
+            if reader is not None:
+                n = int(reader.starts[np.searchsorted(reader.starts, n, side="right") - 1])
+        self.releaseReaders()
+        self.counts_writer = SpoolWriter(self.counts_path, n_pixels, np.int32, append=append, keep=n)
+        self.wavelengths_writer = SpoolWriter(self.wavelengths_path, n_pixels, np.float64, append=append, keep=n)
+        self.meta_file = open(self.meta_path, "ab")
+        self.meta_file.truncate(n*META_DTYPE.itemsize)
+        self.next_frame = n
+        self.counts_writer.flush()
+        self.wavelengths_writer.flush()
+        self.refresh()
+
+    """
+    Starts a new sweep number for the frames appended after it.
+    @return: Returns the sweep number
+    """
+    def newSweep(self):
+        sweep = self.next_sweep
+        self.next_sweep += 1
+        return sweep
+
+    """
+    Appends one SweepFrame with its exposure time (s), detector temperature (C) and sweep number; timestamp defaults
+    to now (seconds since the epoch).
+    """
+    def append(self, frame, exposure=np.nan, temperature=np.nan, sweep=-1, timestamp=None):
+        if self.mode != "a":
+            raise IOError("ERROR: archive opened read-only")
+        data = np.asarray(frame.data, dtype=np.int32)
+        wl_arr = np.asarray(frame.wl_arr, dtype=np.float64)
+        if len(data) != len(wl_arr):
+            raise ValueError("ERROR: frame has %d counts but %d wavelengths" % (len(data), len(wl_arr)))
+        if self.counts_writer is None:
+            self.openWriters(len(data))
+        elif len(data) != self.counts_writer.frame_size:
+            raise ValueError("ERROR: archive holds %d-pixel frames, got %d" % (self.counts_writer.frame_size, len(data)))
+        record = (time.time() if timestamp is None else timestamp, sweep, frame.target, float(frame.spec_wl),
+                  frame.mp, exposure, temperature, wl_arr.min(), wl_arr.max())
+        self.pending.append((data, wl_arr, record))
+        if len(self.pending) >= self.chunk_frames:
+            self.writeChunk()
+
+    def writeChunk(self):
+        if not self.pending:
+            return
+        counts = np.array([item[0] for item in self.pending])
+        wavelengths = np.array([item[1] for item in self.pending])
+        records = np.array([item[2] for item in self.pending], dtype=META_DTYPE)
+        self.counts_writer.writeChunk(self.next_frame, len(counts), *compressFrames(counts, self.level))
+        self.wavelengths_writer.writeChunk(self.next_frame, len(counts), *compressFrames(wavelengths, self.level))
+        self.counts_writer.flush()
+        self.wavelengths_writer.flush()
+        self.meta_file.write(records.tobytes())
+        self.meta_file.flush()
+        self.next_frame += len(counts)
+        self.pending = []
+
+    """
+    Writes buffered frames (as a short chunk) and makes them visible to readers.
+    """
+    def flush(self):
+        if self.counts_writer is not None:
+            self.writeChunk()
+            self.refresh()
+
+    def close(self):
+        if self.counts_writer is not None:
+            self.writeChunk()
+            self.counts_writer.close()
+            self.wavelengths_writer.close()
+            self.meta_file.close()
+            self.counts_writer = None
+        self.releaseReaders()
+
+    def releaseReaders(self):
+        for reader in (self.counts_reader, self.wavelengths_reader):
+            if reader is not None:
+                reader.close()
+        self.counts_reader = None
+        self.wavelengths_reader = None
+        self.meta = np.zeros(0, dtype=META_DTYPE)
+
+    # Reading
+
+    """
+    @return: Returns the counts of frames start to stop - 1 as an (n, n_pixels) array
+    """
+    def counts(self, start=0, stop=None):
+        return self.counts_reader.read(start, len(self) if stop is None else min(stop, len(self)))
+
+    def wavelengths(self, start=0, stop=None):
+        return self.wavelengths_reader.read(start, len(self) if stop is None else min(stop, len(self)))
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("frame index out of range")
+        record = self.meta[index]
+        return SweepFrame(float(record["target"]), float(record["center"]), int(record["mp"]),
+                          self.counts_reader[index], self.wavelengths_reader[index])
+
+    """
+    @return: Returns the indices of frames that cover any part of wavelength_start..wavelength_end, optionally
+             restricted to sweep numbers and to timestamps in time_start..time_end
+    """
+    def select(self, wavelength_start=-np.inf, wavelength_end=np.inf, sweeps=None, time_start=-np.inf,
+               time_end=np.inf):
+        meta = self.meta
+        mask = (meta["wl_max"] >= wavelength_start) & (meta["wl_min"] <= wavelength_end)
+        mask &= (meta["time"] >= time_start) & (meta["time"] <= time_end)
+        if sweeps is not None:
+            mask &= np.isin(meta["sweep"], sweeps)
+        return np.nonzero(mask)[0]
+
+    """
+    Yields the SweepFrames at indices (in increasing order, so each chunk is decompressed once).
+    """
+    def frames(self, indices):
+        for index in np.sort(np.asarray(indices)):
+            yield self[int(index)]
+
+    """
+    @return: Returns (wavelengths, counts) of the pixels of frame index inside wavelength_start..wavelength_end
+    """
+    def cropFrame(self, index, wavelength_start, wavelength_end):
+        frame = self[index]
+        keep = (frame.wl_arr >= wavelength_start) & (frame.wl_arr <= wavelength_end)
+        return (frame.wl_arr[keep], frame.data[keep])
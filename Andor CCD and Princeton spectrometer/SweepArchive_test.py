@@ -0,0 +1,78 @@
+"""
+Tests for SweepArchive. Run with: python -m pytest SweepArchive_test.py
+"""
+
+import numpy as np
+from AndorPrinceton import SweepFrame
+from SweepArchive import SweepArchive
+
+N_PIXELS = 16
+
+def makeFrame(target):
+    return SweepFrame(target, target, 8, np.full(N_PIXELS, int(target), dtype=np.int32),
+                      target + np.arange(N_PIXELS, dtype=np.float64))
+
+def assertConsistent(archive):
+    for index in range(len(archive)):
+        frame = archive[index]
+        assert np.all(frame.data == int(frame.target))
+        assert frame.wl_arr[0] == frame.target
+
+def testRoundTrip(tmp_path):
+    with SweepArchive(str(tmp_path), mode="a", chunk_frames=4) as archive:
+        sweep = archive.newSweep()
+        for target in range(500, 510):
+            archive.append(makeFrame(target), 0.1, -60.0, sweep)
+    with SweepArchive(str(tmp_path)) as archive:
+        assert len(archive) == 10
+        assert list(archive.meta["target"]) == list(range(500, 510))
+        assert list(archive.select(490, 501.5)) == [0, 1]
+        assert len(archive.select(sweeps=[sweep + 1])) == 0
+        assertConsistent(archive)
+
+"""
+A crash between writing a chunk and its metadata leaves orphan chunks in the spool files; appending after reopening
+must not pair new metadata with them.
+"""
+def testCrashBetweenChunkAndMeta(tmp_path):
+    archive = SweepArchive(str(tmp_path), mode="a", chunk_frames=4)
+    for target in range(500, 508):
+        archive.append(makeFrame(target))
+    archive.flush()
+    # Interrupted chunk: frames reach both spool files but their metadata never does, and no footers are written
+    for target in range(600, 603):
+        archive.append(makeFrame(target))
+    archive.meta_file.write = lambda data: None
+    archive.writeChunk()
+    archive.counts_writer.file.close()
+    archive.wavelengths_writer.file.close()
+    archive.meta_file.close()
+
+    with SweepArchive(str(tmp_path), mode="a", chunk_frames=4) as archive:
+        assert len(archive) == 8
+        for target in range(700, 704):
+            archive.append(makeFrame(target))
+    with SweepArchive(str(tmp_path)) as archive:
+        assert list(archive.meta["target"]) == list(range(500, 508)) + list(range(700, 704))
+        assert len(archive.counts_reader) == len(archive.wavelengths_reader) == 12
+        assertConsistent(archive)
+
+"""
+A crash while writing metadata leaves a partial chunk's worth of records; the files are cut back to the last chunk
+boundary.
+"""
+def testCrashInsideMeta(tmp_path):
+    archive = SweepArchive(str(tmp_path), mode="a", chunk_frames=4)
+    for target in range(500, 508):
+        archive.append(makeFrame(target))
+    archive.flush()
+    archive.counts_writer.file.close()
+    archive.wavelengths_writer.file.close()
+    archive.meta_file.truncate(6*archive.meta.itemsize)
+    archive.meta_file.close()
+
+    with SweepArchive(str(tmp_path), mode="a", chunk_frames=4) as archive:
+        archive.append(makeFrame(700))
+    with SweepArchive(str(tmp_path)) as archive:
+        assert list(archive.meta["target"]) == [500, 501, 502, 503, 700]
+        assertConsistent(archive)
@@ -1,7 +1,8 @@
 from ctypes import *
 import time
-import platform
 import sys
+import os
+import threading
 
 MAX_PATH = 256
 
@@ -45,20 +46,540 @@ class SYSTEMTIME(Structure) :
         ("wSecond", c_short),
         ("wMilliseconds", c_short)]
 
-class atmcd:
+def _bufferPointer(arr, ctype):
+  # Validates a caller-supplied NumPy array for direct use as an SDK output buffer
+  if arr.dtype.kind not in "iu" or arr.dtype.itemsize != sizeof(ctype):
+    raise ValueError("buffer must be a %d-bit integer array, got %s" % (8*sizeof(ctype), arr.dtype))
+  if not (arr.flags.c_contiguous and arr.flags.writeable):
+    raise ValueError("buffer must be a writable, C-contiguous array")
+  # A ctypes array over arr's memory passes wherever a pointer is expected; unlike arr.ctypes.data_as (or cast), it
+  # does not create a reference cycle, so per-frame calls leave nothing behind for the garbage collector
+  return (ctype * arr.size).from_buffer(arr)
+
+class _CString(c_char_p):
+  # char * argument that also accepts str (encoded) in addition to bytes and string buffers
+  @classmethod
+  def from_param(cls, value):
+    if isinstance(value, str):
+      value = value.encode()
+    return c_char_p.from_param(value)
+
+# SDK function prototypes: name -> argtypes (every function returns an unsigned int status code)
+PROTOTYPES = {
+  "AbortAcquisition": (),
+  "CancelWait": (),
+  "CoolerOFF": (),
+  "CoolerON": (),
+  "DemosaicImage": (POINTER(c_ushort), POINTER(c_ushort), POINTER(c_ushort), POINTER(c_ushort), POINTER(ColorDemosaicInfo)),
+  "EnableKeepCleans": (c_int,),
+  "Filter_GetAveragingFactor": (POINTER(c_int),),
+  "Filter_GetAveragingFrameCount": (POINTER(c_int),),
+  "Filter_GetDataAveragingMode": (POINTER(c_int),),
+  "Filter_GetMode": (POINTER(c_uint),),
+  "Filter_GetThreshold": (POINTER(c_float),),
+  "Filter_SetAveragingFactor": (c_int,),
+  "Filter_SetAveragingFrameCount": (c_int,),
+  "Filter_SetDataAveragingMode": (c_int,),
+  "Filter_SetMode": (c_int,),
+  "Filter_SetThreshold": (c_float,),
+  "FreeInternalMemory": (),
+  "GetAcquiredData": (POINTER(c_int), c_ulong),
+  "GetAcquiredData16": (POINTER(c_ushort), c_ulong),
+  "GetAcquiredFloatData": (POINTER(c_float), c_ulong),
+  "GetAcquisitionProgress": (POINTER(c_long), POINTER(c_long)),
+  "GetAcquisitionTimings": (POINTER(c_float), POINTER(c_float), POINTER(c_float)),
+  "GetAdjustedRingExposureTimes": (c_int, POINTER(c_float)),
+  "GetAllDMAData": (POINTER(c_int), c_long),
+  "GetAmpDesc": (c_int, _CString, c_int),
+  "GetAmpMaxSpeed": (c_int, POINTER(c_float)),
+  "GetAvailableCameras": (POINTER(c_long),),
+  "GetBackground": (POINTER(c_int), c_long),
+  "GetBaselineClamp": (POINTER(c_int),),
+  "GetBitDepth": (c_int, POINTER(c_int)),
+  "GetCameraEventStatus": (POINTER(c_ulong),),
+  "GetCameraHandle": (c_long, POINTER(c_long)),
+  "GetCameraInformation": (c_int, POINTER(c_long)),
+  "GetCameraSerialNumber": (POINTER(c_int),),
+  "GetCapabilities": (POINTER(AndorCapabilities),),
+  "GetControllerCardModel": (_CString,),
+  "GetCountConvertWavelengthRange": (POINTER(c_float), POINTER(c_float)),
+  "GetCurrentCamera": (POINTER(c_long),),
+  "GetCYMGShift": (POINTER(c_int), POINTER(c_int)),
+  "GetDDGExternalOutputEnabled": (c_uint, POINTER(c_uint)),
+  "GetDDGExternalOutputPolarity": (c_uint, POINTER(c_uint)),
+  "GetDDGExternalOutputStepEnabled": (c_uint, POINTER(c_uint)),
+  "GetDDGExternalOutputTime": (c_uint, POINTER(c_ulonglong), POINTER(c_ulonglong)),
+  "GetDDGGateTime": (POINTER(c_ulonglong), POINTER(c_ulonglong)),
+  "GetDDGInsertionDelay": (POINTER(c_int),),
+  "GetDDGIntelligate": (POINTER(c_int),),
+  "GetDDGIOC": (POINTER(c_int),),
+  "GetDDGIOCFrequency": (POINTER(c_double),),
+  "GetDDGIOCNumber": (POINTER(c_ulong),),
+  "GetDDGIOCNumberRequested": (POINTER(c_uint),),
+  "GetDDGIOCPeriod": (POINTER(c_ulonglong),),
+  "GetDDGIOCPulses": (POINTER(c_int),),
+  "GetDDGIOCTrigger": (POINTER(c_uint),),
+  "GetDDGLiteControlByte": (c_int, POINTER(c_ubyte)),
+  "GetDDGLiteGlobalControlByte": (POINTER(c_ubyte),),
+  "GetDDGLiteInitialDelay": (c_int, POINTER(c_float)),
+  "GetDDGLiteInterPulseDelay": (c_int, POINTER(c_float)),
+  "GetDDGLitePulsesPerExposure": (c_int, POINTER(c_uint)),
+  "GetDDGLitePulseWidth": (c_int, POINTER(c_float)),
+  "GetDDGOpticalWidthEnabled": (POINTER(c_uint),),
+  "GetDDGPulse": (c_double, c_double, POINTER(c_double), POINTER(c_double)),
+  "GetDDGStepCoefficients": (c_uint, POINTER(c_double), POINTER(c_double)),
+  "GetDDGStepMode": (POINTER(c_uint),),
+  "GetDDGTTLGateWidth": (c_ulonglong, POINTER(c_ulonglong)),
+  "GetDDGWidthStepCoefficients": (c_uint, POINTER(c_double), POINTER(c_double)),
+  "GetDDGWidthStepMode": (POINTER(c_uint),),
+  "GetDetector": (POINTER(c_int), POINTER(c_int)),
+  "GetDICameraInfo": (c_void_p,),
+  "GetDualExposureTimes": (POINTER(c_float), POINTER(c_float)),
+  "GetEMAdvanced": (POINTER(c_int),),
+  "GetEMCCDGain": (POINTER(c_int),),
+  "GetEMGainRange": (POINTER(c_int), POINTER(c_int)),
+  "GetExternalTriggerTermination": (POINTER(c_uint),),
+  "GetFastestRecommendedVSSpeed": (POINTER(c_int), POINTER(c_float)),
+  "GetFIFOUsage": (POINTER(c_int),),
+  "GetFilterMode": (POINTER(c_int),),
+  "GetFKExposureTime": (POINTER(c_float),),
+  "GetFKVShiftSpeed": (c_int, POINTER(c_int)),
+  "GetFKVShiftSpeedF": (c_int, POINTER(c_float)),
+  "GetFrontEndStatus": (POINTER(c_int),),
+  "GetGateMode": (POINTER(c_int),),
+  "GetHardwareVersion": (POINTER(c_uint), POINTER(c_uint), POINTER(c_uint), POINTER(c_uint), POINTER(c_uint), POINTER(c_uint)),
+  "GetHeadModel": (_CString,),
+  "GetHorizontalSpeed": (c_int, POINTER(c_int)),
+  "GetHSSpeed": (c_int, c_int, c_int, POINTER(c_float)),
+  "GetHVflag": (POINTER(c_int),),
+  "GetID": (c_int, POINTER(c_int)),
+  "GetImageFlip": (POINTER(c_int), POINTER(c_int)),
+  "GetImageRotate": (POINTER(c_int),),
+  "GetImages": (c_long, c_long, POINTER(c_int), c_long, POINTER(c_long), POINTER(c_long)),
+  "GetImages16": (c_long, c_long, POINTER(c_ushort), c_long, POINTER(c_long), POINTER(c_long)),
+  "GetImagesPerDMA": (POINTER(c_ulong),),
+  "GetIODirection": (c_int, POINTER(c_int)),
+  "GetIOLevel": (c_int, POINTER(c_int)),
+  "GetIRQ": (POINTER(c_int),),
+  "GetKeepCleanTime": (POINTER(c_float),),
+  "GetMaximumBinning": (c_int, c_int, POINTER(c_int)),
+  "GetMaximumExposure": (POINTER(c_float),),
+  "GetMaximumNumberRingExposureTimes": (POINTER(c_int),),
+  "GetMCPGain": (POINTER(c_int),),
+  "GetMCPGainRange": (POINTER(c_int), POINTER(c_int)),
+  "GetMCPGainTable": (c_int, POINTER(c_int), POINTER(c_float)),
+  "GetMCPVoltage": (POINTER(c_int),),
+  "GetMetaDataInfo": (POINTER(SYSTEMTIME), POINTER(c_float), c_int),
+  "GetMinimumImageLength": (POINTER(c_int),),
+  "GetMinimumNumberInSeries": (POINTER(c_int),),
+  "GetMostRecentColorImage16": (c_ulong, c_int, POINTER(c_ushort), POINTER(c_ushort), POINTER(c_ushort)),
+  "GetMostRecentImage": (POINTER(c_int), c_ulong),
+  "GetMostRecentImage16": (POINTER(c_ushort), c_long),
+  "GetMSTimingsData": (POINTER(SYSTEMTIME), POINTER(c_float), c_int),
+  "GetMSTimingsEnabled": (),
+  "GetNewData": (POINTER(c_int), c_long),
+  "GetNewData16": (POINTER(c_ushort), c_long),
+  "GetNewData8": (POINTER(c_ubyte), c_long),
+  "GetNewFloatData": (POINTER(c_float), c_long),
+  "GetNumberADChannels": (POINTER(c_int),),
+  "GetNumberAmp": (POINTER(c_int),),
+  "GetNumberAvailableImages": (POINTER(c_int), POINTER(c_int)),
+  "GetNumberDDGExternalOutputs": (POINTER(c_uint),),
+  "GetNumberDevices": (POINTER(c_int),),
+  "GetNumberFKVShiftSpeeds": (POINTER(c_int),),
+  "GetNumberHorizontalSpeeds": (POINTER(c_int),),
+  "GetNumberHSSpeeds": (c_int, c_int, POINTER(c_int)),
+  "GetNumberIO": (POINTER(c_int),),
+  "GetNumberNewImages": (POINTER(c_long), POINTER(c_long)),
+  "GetNumberPhotonCountingDivisions": (POINTER(c_uint),),
+  "GetNumberPreAmpGains": (POINTER(c_int),),
+  "GetNumberRingExposureTimes": (POINTER(c_int),),
+  "GetNumberVerticalSpeeds": (POINTER(c_int),),
+  "GetNumberVSAmplitudes": (POINTER(c_int),),
+  "GetNumberVSSpeeds": (POINTER(c_int),),
+  "GetOldestImage": (POINTER(c_int), c_ulong),
+  "GetOldestImage16": (POINTER(c_ushort), c_ulong),
+  "GetPhosphorStatus": (POINTER(c_int),),
+  "GetPhysicalDMAAddress": (POINTER(c_ulong), POINTER(c_ulong)),
+  "GetPixelSize": (POINTER(c_float), POINTER(c_float)),
+  "GetPreAmpGain": (c_int, POINTER(c_float)),
+  "GetPreAmpGainText": (c_int, _CString, c_int),
+  "GetQE": (_CString, c_float, c_int, POINTER(c_float)),
+  "GetReadOutTime": (POINTER(c_float),),
+  "GetRegisterDump": (POINTER(c_int),),
+  "GetRelativeImageTimes": (c_int, c_int, POINTER(c_ulonglong), c_int),
+  "GetRingExposureRange": (POINTER(c_float), POINTER(c_float)),
+  "GetSDK3Handle": (POINTER(c_int),),
+  "GetSensitivity": (c_int, c_int, c_int, c_int, POINTER(c_float)),
+  "GetShutterMinTimes": (POINTER(c_int), POINTER(c_int)),
+  "GetSizeOfCircularBuffer": (POINTER(c_long),),
+  "GetSlotBusDeviceFunction": (POINTER(c_ulong), POINTER(c_ulong), POINTER(c_ulong), POINTER(c_ulong)),
+  "GetSoftwareVersion": (POINTER(c_uint), POINTER(c_uint), POINTER(c_uint), POINTER(c_uint), POINTER(c_uint), POINTER(c_uint)),
+  "GetSpoolProgress": (POINTER(c_long),),
+  "GetStartUpTime": (POINTER(c_float),),
+  "GetStatus": (POINTER(c_int),),
+  "GetTECStatus": (POINTER(c_int),),
+  "GetTemperature": (POINTER(c_int),),
+  "GetTemperatureF": (POINTER(c_float),),
+  "GetTemperatureRange": (POINTER(c_int), POINTER(c_int)),
+  "GetTemperatureStatus": (POINTER(c_float), POINTER(c_float), POINTER(c_float), POINTER(c_float)),
+  "GetTotalNumberImagesAcquired": (POINTER(c_long),),
+  "GetTriggerLevelRange": (POINTER(c_float), POINTER(c_float)),
+  "GetVersionInfo": (c_int, _CString, c_uint),
+  "GetVerticalSpeed": (c_int, POINTER(c_int)),
+  "GetVirtualDMAAddress": (c_void_p, c_void_p),
+  "GetVSAmplitudeFromString": (_CString, POINTER(c_int)),
+  "GetVSAmplitudeString": (c_int, _CString),
+  "GetVSAmplitudeValue": (c_int, POINTER(c_int)),
+  "GetVSSpeed": (c_int, POINTER(c_float)),
+  "GPIBReceive": (c_int, c_short, _CString, c_int),
+  "GPIBSend": (c_int, c_short, _CString),
+  "I2CBurstRead": (c_ubyte, c_long, POINTER(c_ubyte)),
+  "I2CBurstWrite": (c_ubyte, c_long, POINTER(c_ubyte)),
+  "I2CRead": (c_ubyte, c_ubyte, POINTER(c_ubyte)),
+  "I2CReset": (),
+  "I2CWrite": (c_ubyte, c_ubyte, c_ubyte),
+  "IdAndorDll": (),
+  "InAuxPort": (c_int, POINTER(c_int)),
+  "Initialize": (_CString,),
+  "InitializeDevice": (_CString,),
+  "IsAmplifierAvailable": (c_int,),
+  "IsCoolerOn": (POINTER(c_int),),
+  "IsCountConvertModeAvailable": (c_int,),
+  "IsInternalMechanicalShutter": (POINTER(c_int),),
+  "IsPreAmpGainAvailable": (c_int, c_int, c_int, c_int, POINTER(c_int)),
+  "IsTriggerModeAvailable": (c_int,),
+  "Merge": (POINTER(c_int), c_long, c_long, c_long, POINTER(c_float), c_long, c_long, POINTER(c_int), POINTER(c_float), POINTER(c_float)),
+  "OA_AddMode": (_CString, c_int, _CString, c_int),
+  "OA_DeleteMode": (_CString, c_int),
+  "OA_EnableMode": (_CString,),
+  "OA_GetFloat": (_CString, _CString, POINTER(c_float)),
+  "OA_GetInt": (_CString, _CString, POINTER(c_int)),
+  "OA_GetModeAcqParams": (_CString, _CString),
+  "OA_GetNumberOfAcqParams": (_CString, POINTER(c_uint)),
+  "OA_GetNumberOfPreSetModes": (POINTER(c_uint),),
+  "OA_GetNumberOfUserModes": (POINTER(c_uint),),
+  "OA_GetPreSetModeNames": (_CString,),
+  "OA_GetString": (_CString, _CString, _CString, c_int),
+  "OA_GetUserModeNames": (_CString,),
+  "OA_Initialize": (_CString, c_int),
+  "OA_SetFloat": (_CString, _CString, c_float),
+  "OA_SetInt": (_CString, _CString, c_int),
+  "OA_SetString": (_CString, _CString, _CString, c_int),
+  "OA_WriteToFile": (_CString, c_int),
+  "OutAuxPort": (c_int, c_int),
+  "PostProcessCountConvert": (POINTER(c_int), POINTER(c_int), c_int, c_int, c_int, c_int, c_int, c_float, c_float, c_int, c_int),
+  "PostProcessDataAveraging": (POINTER(c_int), POINTER(c_int), c_int, c_int, c_int, c_int, c_int, c_int, c_int),
+  "PostProcessNoiseFilter": (POINTER(c_int), POINTER(c_int), c_int, c_int, c_int, c_float, c_int, c_int),
+  "PostProcessPhotonCounting": (POINTER(c_int), POINTER(c_int), c_int, c_int, c_int, c_int, POINTER(c_float), c_int, c_int),
+  "PrepareAcquisition": (),
+  "SaveAsBmp": (_CString, _CString, c_long, c_long),
+  "SaveAsCommentedSif": (_CString, _CString),
+  "SaveAsEDF": (_CString, c_int),
+  "SaveAsFITS": (_CString, c_int),
+  "SaveAsRaw": (_CString, c_int),
+  "SaveAsSif": (_CString,),
+  "SaveAsSPC": (_CString,),
+  "SaveAsTiff": (_CString, _CString, c_int, c_int),
+  "SaveAsTiffEx": (_CString, _CString, c_int, c_int, c_int),
+  "SaveEEPROMToFile": (_CString,),
+  "SaveToClipBoard": (_CString,),
+  "SelectDevice": (c_int,),
+  "SendSoftwareTrigger": (),
+  "SetAccumulationCycleTime": (c_float,),
+  "SetAcqStatusEvent": (c_int,),
+  "SetAcquisitionMode": (c_int,),
+  "SetAcquisitionType": (c_int,),
+  "SetADChannel": (c_int,),
+  "SetAdvancedTriggerModeState": (c_int,),
+  "SetBackground": (POINTER(c_int), c_long),
+  "SetBaselineClamp": (c_int,),
+  "SetBaselineOffset": (c_int,),
+  "SetCameraLinkMode": (c_int,),
+  "SetCameraStatusEnable": (c_ulong,),
+  "SetChargeShifting": (c_uint, c_uint),
+  "SetComplexImage": (c_int, POINTER(c_int)),
+  "SetCoolerMode": (c_int,),
+  "SetCountConvertMode": (c_int,),
+  "SetCountConvertWavelength": (c_float,),
+  "SetCropMode": (c_int, c_int, c_int),
+  "SetCurrentCamera": (c_long,),
+  "SetCustomTrackHBin": (c_int,),
+  "SetDACOutput": (c_int, c_int, c_int),
+  "SetDACOutputScale": (c_int,),
+  "SetDataType": (c_int,),
+  "SetDDGAddress": (c_ubyte, c_ubyte, c_ubyte, c_ubyte, c_ubyte),
+  "SetDDGExternalOutputEnabled": (c_uint, c_uint),
+  "SetDDGExternalOutputPolarity": (c_uint, c_uint),
+  "SetDDGExternalOutputStepEnabled": (c_uint, c_uint),
+  "SetDDGExternalOutputTime": (c_uint, c_ulonglong, c_ulonglong),
+  "SetDDGGain": (c_int,),
+  "SetDDGGateStep": (c_double,),
+  "SetDDGGateTime": (c_ulonglong, c_ulonglong),
+  "SetDDGInsertionDelay": (c_int,),
+  "SetDDGIntelligate": (c_int,),
+  "SetDDGIOC": (c_int,),
+  "SetDDGIOCFrequency": (c_double,),
+  "SetDDGIOCNumber": (c_long,),
+  "SetDDGIOCPeriod": (c_ulonglong,),
+  "SetDDGIOCTrigger": (c_uint,),
+  "SetDDGLiteControlByte": (c_int, c_char),
+  "SetDDGLiteGlobalControlByte": (c_char,),
+  "SetDDGLiteInitialDelay": (c_int, c_float),
+  "SetDDGLiteInterPulseDelay": (c_int, c_float),
+  "SetDDGLitePulsesPerExposure": (c_int, c_uint),
+  "SetDDGLitePulseWidth": (c_int, c_float),
+  "SetDDGOpticalWidthEnabled": (c_uint,),
+  "SetDDGStepCoefficients": (c_uint, c_double, c_double),
+  "SetDDGStepMode": (c_uint,),
+  "SetDDGTimes": (c_double, c_double, c_double),
+  "SetDDGTriggerMode": (c_int,),
+  "SetDDGVariableGateStep": (c_int, c_double, c_double),
+  "SetDDGWidthStepCoefficients": (c_uint, c_double, c_double),
+  "SetDDGWidthStepMode": (c_uint,),
+  "SetDelayGenerator": (c_int, c_short, c_int),
+  "SetDMAParameters": (c_int, c_float),
+  "SetDriverEvent": (c_void_p,),
+  "SetDualExposureMode": (c_int,),
+  "SetDualExposureTimes": (c_float, c_float),
+  "SetEMAdvanced": (c_int,),
+  "SetEMCCDGain": (c_int,),
+  "SetEMClockCompensation": (c_int,),
+  "SetEMGainMode": (c_int,),
+  "SetExposureTime": (c_float,),
+  "SetExternalTriggerTermination": (c_uint,),
+  "SetFanMode": (c_int,),
+  "SetFastExtTrigger": (c_int,),
+  "SetFastKinetics": (c_int, c_int, c_float, c_int, c_int, c_int),
+  "SetFastKineticsEx": (c_int, c_int, c_float, c_int, c_int, c_int, c_int),
+  "SetFilterMode": (c_int,),
+  "SetFilterParameters": (c_int, c_float, c_int, c_float, c_int, c_int),
+  "SetFKVShiftSpeed": (c_int,),
+  "SetFPDP": (c_int,),
+  "SetFrameTransferMode": (c_int,),
+  "SetFrontEndEvent": (c_int,),
+  "SetFullImage": (c_int, c_int),
+  "SetFVBHBin": (c_int,),
+  "SetGain": (c_int,),
+  "SetGate": (c_float, c_float, c_float),
+  "SetGateMode": (c_int,),
+  "SetHighCapacity": (c_int,),
+  "SetHorizontalSpeed": (c_int,),
+  "SetHSSpeed": (c_int, c_int),
+  "SetImage": (c_int, c_int, c_int, c_int, c_int, c_int),
+  "SetImageFlip": (c_int, c_int),
+  "SetImageRotate": (c_int,),
+  "SetIODirection": (c_int, c_int),
+  "SetIOLevel": (c_int, c_int),
+  "SetIsolatedCropMode": (c_int, c_int, c_int, c_int, c_int),
+  "SetIsolatedCropModeEx": (c_int, c_int, c_int, c_int, c_int, c_int, c_int),
+  "SetKineticCycleTime": (c_float,),
+  "SetMCPGain": (c_int,),
+  "SetMCPGating": (c_int,),
+  "SetMessageWindow": (c_int,),
+  "SetMetaData": (c_int,),
+  "SetMultiTrack": (c_int, c_int, c_int, POINTER(c_int), POINTER(c_int)),
+  "SetMultiTrackHBin": (c_int,),
+  "SetMultiTrackHRange": (c_int, c_int),
+  "SetMultiTrackScan": (c_int, c_int, c_int, c_int, c_int, c_int, c_int, c_int, c_int, c_int),
+  "SetNextAddress": (POINTER(c_int), c_long, c_long, c_long, c_long),
+  "SetNextAddress16": (POINTER(c_int), c_long, c_long, c_long, c_long),
+  "SetNumberAccumulations": (c_int,),
+  "SetNumberKinetics": (c_int,),
+  "SetNumberPrescans": (c_int,),
+  "SetOutputAmplifier": (c_int,),
+  "SetOverlapMode": (c_int,),
+  "SetPCIMode": (c_int, c_int),
+  "SetPhosphorEvent": (c_int,),
+  "SetPhotonCounting": (c_int,),
+  "SetPhotonCountingDivisions": (c_uint, POINTER(c_int)),
+  "SetPhotonCountingThreshold": (c_long, c_long),
+  "SetPixelMode": (c_int, c_int),
+  "SetPreAmpGain": (c_int,),
+  "SetRandomTracks": (c_int, POINTER(c_int)),
+  "SetReadMode": (c_int,),
+  "SetReadoutRegisterPacking": (c_int,),
+  "SetRegisterDump": (c_int,),
+  "SetRingExposureTimes": (c_int, POINTER(c_float)),
+  "SetSaturationEvent": (c_void_p,),
+  "SetShutter": (c_int, c_int, c_int, c_int),
+  "SetShutterEx": (c_int, c_int, c_int, c_int, c_int),
+  "SetShutters": (c_int, c_int, c_int, c_int, c_int, c_int, c_int, c_int),
+  "SetSifComment": (_CString,),
+  "SetSingleTrack": (c_int, c_int),
+  "SetSingleTrackHBin": (c_int,),
+  "SetSpool": (c_int, c_int, _CString, c_int),
+  "SetSpoolThreadCount": (c_int,),
+  "SetStorageMode": (c_long,),
+  "SetTECEvent": (c_void_p,),
+  "SetTemperature": (c_int,),
+  "SetTemperatureEvent": (c_int,),
+  "SetTriggerInvert": (c_int,),
+  "SetTriggerLevel": (c_float,),
+  "SetTriggerMode": (c_int,),
+  "SetUserEvent": (c_int,),
+  "SetUSGenomics": (c_long, c_long),
+  "SetVerticalRowBuffer": (c_int,),
+  "SetVerticalSpeed": (c_int,),
+  "SetVirtualChip": (c_int,),
+  "SetVSAmplitude": (c_int,),
+  "SetVSSpeed": (c_int,),
+  "ShutDown": (),
+  "StartAcquisition": (),
+  "UnMapPhysicalAddress": (),
+  "WaitForAcquisition": (),
+  "WaitForAcquisitionByHandle": (c_long,),
+  "WaitForAcquisitionByHandleTimeOut": (c_long, c_int),
+  "WaitForAcquisitionTimeOut": (c_int,),
+  "WhiteBalance": (POINTER(c_ushort), POINTER(c_ushort), POINTER(c_ushort), POINTER(c_float), POINTER(c_float), POINTER(WhiteBalanceInfo)),
+}
+
+# Functions called once per frame or in polling loops, bound to instance attributes for the fastest call path: every
+# caller passes ready-made ctypes objects, so these skip the per-call argtypes conversion of the typed prototypes
+HOT_FUNCTIONS = ("GetStatus", "GetAcquisitionProgress", "GetMostRecentImage", "GetMostRecentImage16", "GetOldestImage",
+  "GetOldestImage16", "GetImages", "GetImages16", "GetNumberNewImages", "GetTemperatureF", "StartAcquisition",
+  "WaitForAcquisition", "WaitForAcquisitionTimeOut")
+
+# Library resolution: an explicit path or backend wins, then the environment, then the platform defaults
+SDK_PATH_ENV = "ANDOR_SDK_PATH"
+SDK_BACKEND_ENV = "ANDOR_SDK_BACKEND"
+LINUX_LIBRARY_PATHS = ("/usr/local/lib/libandor.so", "/usr/lib/libandor.so", "/opt/andor/lib/libandor.so")
+WINDOWS_LIBRARY_DIR = "C:\\Program Files\\Andor SDK"
+
+# In-process SDK implementations, by name: factory() returns an object exposing the SDK functions
+def _simulatedBackend():
+  from AndorSimulator import SimulatedSDK
+  return SimulatedSDK()
+
+BACKENDS = {"simulated": _simulatedBackend}
+
+def registerBackend(name, factory):
+  BACKENDS[name] = factory
+
+def libraryName():
+  if sys.platform.startswith("linux"):
+    return "libandor.so"
+  elif sys.platform == "win32":
+    import platform
+    return "atmcd64d.dll" if platform.architecture()[0] == "64bit" else "atmcd32d.dll"
+  raise OSError("Unsupported platform for the Andor SDK: " + sys.platform)
+
+def findLibrary(path=None):
+  # Returns the path of the SDK library; path (or $ANDOR_SDK_PATH) may name the library itself or its directory
+  if path is None:
+    path = os.environ.get(SDK_PATH_ENV)
+  if path is not None:
+    if os.path.isdir(path):
+      path = os.path.join(path, libraryName())
+    if not os.path.exists(path):
+      raise OSError("Andor SDK library not found: " + path)
+    return path
+  if sys.platform.startswith("linux"):
+    candidates = list(LINUX_LIBRARY_PATHS)
+  else:
+    candidates = [os.path.join(WINDOWS_LIBRARY_DIR, libraryName())]
+  for candidate in candidates:
+    if os.path.exists(candidate):
+      return candidate
+  import ctypes.util
+  found = ctypes.util.find_library("andor" if sys.platform.startswith("linux") else libraryName()[:-4])
+  if found is not None:
+    return found
+  raise OSError("Andor SDK library not found (tried %s); set %s" % (", ".join(candidates), SDK_PATH_ENV))
+
+def loadLibrary(path=None, backend=None):
+  # Returns the SDK: a registered in-process backend (by name or as an object) or the native library
+  if backend is None:
+    backend = os.environ.get(SDK_BACKEND_ENV) or None
+  if isinstance(backend, str):
+    if backend not in BACKENDS:
+      raise OSError("Unknown Andor SDK backend: %s (registered: %s)" % (backend, ", ".join(sorted(BACKENDS))))
+    return BACKENDS[backend]()
+  if backend is not None:
+    return backend
+  path = findLibrary(path)
+  if sys.platform == "win32":
+    return windll.LoadLibrary(path)
+  return cdll.LoadLibrary(path)
+
+def _hotFunction(lib, name):
+  # Returns a separate, untyped function pointer to name (restype only), leaving the library's typed attribute alone
+  if not isinstance(lib, CDLL):
+    return getattr(lib, name)
+  func = lib._FuncPtr((name, lib))
+  func.restype = c_uint
+  return func
+
+class _OutParameters(threading.local):
+  # Out-parameters of the polling calls with their references built once per thread, so concurrent callers (the
+  # temperature monitor, the acquisition waiter, the spooler and the main thread) never share one
   def __init__(self):
-    if sys.platform == "linux2":
-      dllname = "/usr/local/lib/libandor.so"
-      self.dll = cdll.LoadLibrary(dllname)
-    elif sys.platform == "win32":
-      if platform.architecture()[0] == "64bit" :
-        dllname = "C:\\Program Files\\Andor SDK\\atmcd64d.dll"
-      else:
-        dllname = "C:\\Program Files\\Andor SDK\\atmcd32d.dll"
-      self.dll = windll.LoadLibrary(dllname)
-    else:
-      print("Cannot detect operating system, will now stop")
-      raise
+    self.status = c_int()
+    self.status_ref = byref(self.status)
+    self.first = c_long()
+    self.first_ref = byref(self.first)
+    self.last = c_long()
+    self.last_ref = byref(self.last)
+    self.acc = c_long()
+    self.acc_ref = byref(self.acc)
+    self.series = c_long()
+    self.series_ref = byref(self.series)
+    self.temperature = c_float()
+    self.temperature_ref = byref(self.temperature)
+
+class _LazyLibrary:
+  # Stands in for the SDK library until the first call, then loads it and resolves each function on first use
+  def __init__(self, load, prototypes):
+    self._load = load
+    self._prototypes = prototypes
+    self._lib = None
+
+  def __getattr__(self, name):
+    if name.startswith("__"):
+      raise AttributeError(name)
+    if self._lib is None:
+      self._lib = self._load()
+    func = getattr(self._lib, name)
+    if self._prototypes and name in PROTOTYPES and isinstance(self._lib, CDLL):
+      func.argtypes = PROTOTYPES[name]
+      func.restype = c_uint
+    setattr(self, name, func)
+    return func
+
+  def hotFunction(self, name):
+    if self._lib is None:
+      self._lib = self._load()
+    return _hotFunction(self._lib, name)
+
+class atmcd:
+  def __init__(self, prototypes=True, lazy=False, library=None, backend=None):
+    self._out = _OutParameters()
+    if lazy:
+      self.dll = _LazyLibrary(lambda: loadLibrary(library, backend), prototypes)
+      return
+    self.dll = loadLibrary(library, backend)
+    if prototypes and isinstance(self.dll, CDLL):
+      self.bindPrototypes()
+    for name in HOT_FUNCTIONS:
+      setattr(self, "_" + name, _hotFunction(self.dll, name))
+
+  def __getattr__(self, name):
+    # In lazy mode the hot-function attributes are bound on first use
+    if name.startswith("_") and name[1:] in HOT_FUNCTIONS:
+      func = self.dll.hotFunction(name[1:])
+      setattr(self, name, func)
+      return func
+    raise AttributeError(name)
+
+  def bindPrototypes(self):
+    # Sets argtypes/restype once per SDK function so calls take ctypes' typed conversion path
+    for name, argtypes in PROTOTYPES.items():
+      try:
+        func = getattr(self.dll, name)
+      except AttributeError:
+        continue
+      func.argtypes = argtypes
+      func.restype = c_uint
 
   # Error Code Returns and Definitions
   DRV_ERROR_CODES = 20001
@@ -518,10 +1039,10 @@ class atmcd:
           GetMostRecentColorImage16 WhiteBalance 
 
     '''
-    cgrey = (c_short * info.iX * info.iY)(grey)
-    cred = (c_short * info.iX * info.iY)()
-    cgreen = (c_short * info.iX * info.iY)()
-    cblue = (c_short * info.iX * info.iY)()
+    cgrey = (c_ushort * info.iX * info.iY)(grey)
+    cred = (c_ushort * info.iX * info.iY)()
+    cgreen = (c_ushort * info.iX * info.iY)()
+    cblue = (c_ushort * info.iX * info.iY)()
     cinfo = ColorDemosaicInfo(info)
     ret = self.dll.DemosaicImage(cgrey, cred, cgreen, cblue, byref(cinfo))
     return (ret, cred, cgreen, cblue)
@@ -927,6 +1448,39 @@ class atmcd:
     ret = self.dll.GetAcquiredData(byref(carr), csize)
     return (ret, carr.value)
 
+  def GetAcquiredDataInto(self, arr):
+    ''' 
+        Description:
+          Variant of GetAcquiredData that copies the data straight into a caller-supplied NumPy array instead of allocating a new ctypes array on every call. The array can be reused between calls.
+
+        Synopsis:
+          ret = GetAcquiredDataInto(arr)
+
+        Inputs:
+          arr - preallocated, writable, C-contiguous NumPy array of 32-bit integers (arr.size is the total number of pixels).
+
+        Outputs:
+          ret - Function Return Code:
+            DRV_SUCCESS - Data copied.
+            DRV_NOT_INITIALIZED - System not initialized.
+            DRV_ACQUIRING - Acquisition in progress.
+            DRV_ERROR_ACK - Unable to communicate with card.
+            DRV_P1INVALID - Invalid pointer (i.e. NULL).
+            DRV_P2INVALID - Array size is incorrect.
+            DRV_NO_NEW_DATA - No acquisition has taken place
+
+        C++ Equiv:
+          unsigned int GetAcquiredData(at_32 * arr, unsigned long size);
+
+        See Also:
+          GetAcquiredData 
+
+    '''
+    carr = _bufferPointer(arr, c_int)
+    csize = c_ulong(arr.size)
+    ret = self.dll.GetAcquiredData(carr, csize)
+    return (ret)
+
   def GetAcquiredData16(self, size):
     ''' 
         Description:
@@ -956,11 +1510,44 @@ class atmcd:
           GetStatus StartAcquisition GetAcquiredData 
 
     '''
-    carr = c_short()
+    carr = c_ushort()
     csize = c_ulong(size)
     ret = self.dll.GetAcquiredData16(byref(carr), csize)
     return (ret, carr.value)
 
+  def GetAcquiredData16Into(self, arr):
+    ''' 
+        Description:
+          Variant of GetAcquiredData16 that copies the data straight into a caller-supplied NumPy array instead of allocating a new ctypes array on every call. The array can be reused between calls.
+
+        Synopsis:
+          ret = GetAcquiredData16Into(arr)
+
+        Inputs:
+          arr - preallocated, writable, C-contiguous NumPy array of 16-bit integers (arr.size is the total number of pixels).
+
+        Outputs:
+          ret - Function Return Code:
+            DRV_SUCCESS - Data copied.
+            DRV_NOT_INITIALIZED - System not initialized.
+            DRV_ACQUIRING - Acquisition in progress.
+            DRV_ERROR_ACK - Unable to communicate with card.
+            DRV_P1INVALID - Invalid pointer (i.e. NULL).
+            DRV_P2INVALID - Array size isincorrect.
+            DRV_NO_NEW_DATA - No acquisition has taken place
+
+        C++ Equiv:
+          unsigned int GetAcquiredData16(WORD * arr, unsigned long size);
+
+        See Also:
+          GetAcquiredData16 
+
+    '''
+    carr = _bufferPointer(arr, c_ushort)
+    csize = c_ulong(arr.size)
+    ret = self.dll.GetAcquiredData16(carr, csize)
+    return (ret)
+
   def GetAcquiredFloatData(self, size):
     ''' 
         Description:
@@ -1018,10 +1605,9 @@ class atmcd:
           SetAcquisitionMode SetNumberAccumulations SetNumberKinetics SetDriverEvent 
 
     '''
-    cacc = c_int()
-    cseries = c_int()
-    ret = self.dll.GetAcquisitionProgress(byref(cacc), byref(cseries))
-    return (ret, cacc.value, cseries.value)
+    out = self._out
+    ret = self._GetAcquisitionProgress(out.acc_ref, out.series_ref)
+    return (ret, out.acc.value, out.series.value)
 
   def GetAcquisitionTimings(self):
     ''' 
@@ -1108,7 +1694,7 @@ class atmcd:
 
     '''
     carr = c_int()
-    csize = c_int(size)
+    csize = c_long(size)
     ret = self.dll.GetAllDMAData(byref(carr), csize)
     return (ret, carr.value)
 
@@ -1200,7 +1786,7 @@ class atmcd:
           SetCurrentCamera GetCurrentCamera GetCameraHandle 
 
     '''
-    ctotalCameras = c_int()
+    ctotalCameras = c_long()
     ret = self.dll.GetAvailableCameras(byref(ctotalCameras))
     return (ret, ctotalCameras.value)
 
@@ -1224,7 +1810,7 @@ class atmcd:
 
     '''
     carr = c_int()
-    csize = c_int(size)
+    csize = c_long(size)
     ret = self.dll.GetBackground(byref(carr), csize)
     return (ret, carr.value)
 
@@ -1319,7 +1905,7 @@ class atmcd:
         Note: This is only supported by the CCI23 card.
 
     '''
-    ccamStatus = ()
+    ccamStatus = c_ulong()
     ret = self.dll.GetCameraEventStatus(byref(ccamStatus))
     return (ret, ccamStatus.value)
 
@@ -1348,8 +1934,8 @@ class atmcd:
           SetCurrentCamera GetAvailableCameras GetCurrentCamera 
 
     '''
-    ccameraIndex = c_int(cameraIndex)
-    ccameraHandle = c_int()
+    ccameraIndex = c_long(cameraIndex)
+    ccameraHandle = c_long()
     ret = self.dll.GetCameraHandle(ccameraIndex, byref(ccameraHandle))
     return (ret, ccameraHandle.value)
 
@@ -1384,7 +1970,7 @@ class atmcd:
 
     '''
     cindex = c_int(index)
-    cinformation = c_int()
+    cinformation = c_long()
     ret = self.dll.GetCameraInformation(cindex, byref(cinformation))
     return (ret, cinformation.value)
 
@@ -1530,7 +2116,7 @@ class atmcd:
           SetCurrentCamera GetAvailableCameras GetCameraHandle 
 
     '''
-    ccameraHandle = c_int()
+    ccameraHandle = c_long()
     ret = self.dll.GetCurrentCamera(byref(ccameraHandle))
     return (ret, ccameraHandle.value)
 
@@ -2467,7 +3053,7 @@ class atmcd:
           unsigned int GetDICameraInfo(void * info);
 
     '''
-    cinfo = c_void()
+    cinfo = c_void_p()
     ret = self.dll.GetDICameraInfo(byref(cinfo))
     return (ret, cinfo.value)
 
@@ -3163,15 +3749,56 @@ class atmcd:
           GetImages16 GetNumberNewImages 
 
     '''
-    cfirst = c_int(first)
-    clast = c_int(last)
+    cfirst = c_long(first)
+    clast = c_long(last)
     carr = (c_int * size)()
-    csize = c_int(size)
-    cvalidfirst = c_int()
-    cvalidlast = c_int()
-    ret = self.dll.GetImages(cfirst, clast, carr, csize, byref(cvalidfirst), byref(cvalidlast))
+    csize = c_long(size)
+    cvalidfirst = c_long()
+    cvalidlast = c_long()
+    ret = self._GetImages(cfirst, clast, carr, csize, byref(cvalidfirst), byref(cvalidlast))
     return (ret, carr, cvalidfirst.value, cvalidlast.value)
 
+  def GetImagesInto(self, first, last, arr):
+    ''' 
+        Description:
+          Variant of GetImages that copies the data straight into a caller-supplied NumPy array instead of allocating a new ctypes array on every call. The array can be reused between calls.
+
+        Synopsis:
+          (ret, validfirst, validlast) = GetImagesInto(first, last, arr)
+
+        Inputs:
+          first - index of first image in buffer to retrieve.
+          last - index of last image in buffer to retrieve.
+          arr - preallocated, writable, C-contiguous NumPy array of 32-bit integers (arr.size is the total number of pixels).
+
+        Outputs:
+          ret - Function Return Code:
+            DRV_SUCCESS - Images have been copied into array.
+            DRV_NOT_INITIALIZED - System not initialized.
+            DRV_ERROR_ACK - Unable to communicate with card.
+            DRV_GENERAL_ERRORS - The series is out of range.
+            DRV_P3INVALID - Invalid pointer (i.e. NULL).
+            DRV_P4INVALID - Array size is incorrect.
+            DRV_NO_NEW_DATA - There is no new data yet.
+          validfirst - index of the first valid image.
+          validlast - index of the last valid image.
+
+        C++ Equiv:
+          unsigned int GetImages(long first, long last, at_32 * arr, long size, long * validfirst, long * validlast);
+
+        See Also:
+          GetImages 
+
+    '''
+    cfirst = c_long(first)
+    clast = c_long(last)
+    carr = _bufferPointer(arr, c_int)
+    csize = c_long(arr.size)
+    cvalidfirst = c_long()
+    cvalidlast = c_long()
+    ret = self._GetImages(cfirst, clast, carr, csize, byref(cvalidfirst), byref(cvalidlast))
+    return (ret, cvalidfirst.value, cvalidlast.value)
+
   def GetImages16(self, first, last, size):
     ''' 
         Description:
@@ -3205,15 +3832,56 @@ class atmcd:
           GetImages GetNumberNewImages 
 
     '''
-    cfirst = c_int(first)
-    clast = c_int(last)
-    carr = (c_short * size)()
-    csize = c_int(size)
-    cvalidfirst = c_int()
-    cvalidlast = c_int()
-    ret = self.dll.GetImages16(cfirst, clast, carr, csize, byref(cvalidfirst), byref(cvalidlast))
+    cfirst = c_long(first)
+    clast = c_long(last)
+    carr = (c_ushort * size)()
+    csize = c_long(size)
+    cvalidfirst = c_long()
+    cvalidlast = c_long()
+    ret = self._GetImages16(cfirst, clast, carr, csize, byref(cvalidfirst), byref(cvalidlast))
     return (ret, carr, cvalidfirst.value, cvalidlast.value)
 
+  def GetImages16Into(self, first, last, arr):
+    ''' 
+        Description:
+          Variant of GetImages16 that copies the data straight into a caller-supplied NumPy array instead of allocating a new ctypes array on every call. The array can be reused between calls.
+
+        Synopsis:
+          (ret, validfirst, validlast) = GetImages16Into(first, last, arr)
+
+        Inputs:
+          first - index of first image in buffer to retrieve.
+          last - index of last image in buffer to retrieve.
+          arr - preallocated, writable, C-contiguous NumPy array of 16-bit integers (arr.size is the total number of pixels).
+
+        Outputs:
+          ret - Function Return Code:
+            DRV_SUCCESS - Images have been copied into array.
+            DRV_NOT_INITIALIZED - System not initialized.
+            DRV_ERROR_ACK - Unable to communicate with card.
+            DRV_GENERAL_ERRORS - The series is out of range.
+            DRV_P3INVALID - Invalid pointer (i.e. NULL).
+            DRV_P4INVALID - Array size is incorrect.
+            DRV_NO_NEW_DATA - There is no new data yet.
+          validfirst - index of the first valid image.
+          validlast - index of the last valid image.
+
+        C++ Equiv:
+          unsigned int GetImages16(long first, long last, WORD * arr, long size, long * validfirst, long * validlast);
+
+        See Also:
+          GetImages16 
+
+    '''
+    cfirst = c_long(first)
+    clast = c_long(last)
+    carr = _bufferPointer(arr, c_ushort)
+    csize = c_long(arr.size)
+    cvalidfirst = c_long()
+    cvalidlast = c_long()
+    ret = self._GetImages16(cfirst, clast, carr, csize, byref(cvalidfirst), byref(cvalidlast))
+    return (ret, cvalidfirst.value, cvalidlast.value)
+
   def GetImagesPerDMA(self):
     ''' 
         Description:
@@ -3703,9 +4371,9 @@ class atmcd:
     '''
     csize = c_ulong(size)
     calgorithm = c_int(algorithm)
-    cred = (c_short * size)()
-    cgreen = (c_short * size)()
-    cblue = (c_short * size)()
+    cred = (c_ushort * size)()
+    cgreen = (c_ushort * size)()
+    cblue = (c_ushort * size)()
     ret = self.dll.GetMostRecentColorImage16(csize, calgorithm, cred, cgreen, cblue)
     return (ret, cred, cgreen, cblue)
 
@@ -3739,9 +4407,41 @@ class atmcd:
     '''
     carr = (c_int * size)()
     csize = c_ulong(size)
-    ret = self.dll.GetMostRecentImage(carr, csize)
+    ret = self._GetMostRecentImage(carr, csize)
     return (ret, carr)
 
+  def GetMostRecentImageInto(self, arr):
+    ''' 
+        Description:
+          Variant of GetMostRecentImage that copies the data straight into a caller-supplied NumPy array instead of allocating a new ctypes array on every call. The array can be reused between calls.
+
+        Synopsis:
+          ret = GetMostRecentImageInto(arr)
+
+        Inputs:
+          arr - preallocated, writable, C-contiguous NumPy array of 32-bit integers (arr.size is the total number of pixels).
+
+        Outputs:
+          ret - Function Return Code:
+            DRV_SUCCESS - Image has been copied into array.
+            DRV_NOT_INITIALIZED - System not initialized.
+            DRV_ERROR_ACK - Unable to communicate with card.
+            DRV_P1INVALID - Invalid pointer (i.e. NULL).
+            DRV_P2INVALID - Array size is incorrect.
+            DRV_NO_NEW_DATA - There is no new data yet.
+
+        C++ Equiv:
+          unsigned int GetMostRecentImage(at_32 * arr, unsigned long size);
+
+        See Also:
+          GetMostRecentImage 
+
+    '''
+    carr = _bufferPointer(arr, c_int)
+    csize = c_ulong(arr.size)
+    ret = self._GetMostRecentImage(carr, csize)
+    return (ret)
+
   def GetMostRecentImage16(self, size):
     ''' 
         Description:
@@ -3770,11 +4470,43 @@ class atmcd:
           GetMostRecentImage GetOldestImage16 GetOldestImage GetImages 
 
     '''
-    carr = (c_short * size)()
-    csize = c_int(size)
-    ret = self.dll.GetMostRecentImage16(carr, csize)
+    carr = (c_ushort * size)()
+    csize = c_long(size)
+    ret = self._GetMostRecentImage16(carr, csize)
     return (ret, carr)
 
+  def GetMostRecentImage16Into(self, arr):
+    ''' 
+        Description:
+          Variant of GetMostRecentImage16 that copies the data straight into a caller-supplied NumPy array instead of allocating a new ctypes array on every call. The array can be reused between calls.
+
+        Synopsis:
+          ret = GetMostRecentImage16Into(arr)
+
+        Inputs:
+          arr - preallocated, writable, C-contiguous NumPy array of 16-bit integers (arr.size is the total number of pixels).
+
+        Outputs:
+          ret - Function Return Code:
+            DRV_SUCCESS - Image has been copied into array.
+            DRV_NOT_INITIALIZED - System not initialized.
+            DRV_ERROR_ACK - Unable to communicate with card.
+            DRV_P1INVALID - Invalid pointer (i.e. NULL).
+            DRV_P2INVALID - Array size is incorrect.
+            DRV_NO_NEW_DATA - There is no new data yet.
+
+        C++ Equiv:
+          unsigned int GetMostRecentImage16(WORD * arr, long size);
+
+        See Also:
+          GetMostRecentImage16 
+
+    '''
+    carr = _bufferPointer(arr, c_ushort)
+    csize = c_long(arr.size)
+    ret = self._GetMostRecentImage16(carr, csize)
+    return (ret)
+
   def GetMSTimingsData(self, inoOfImages):
     ''' 
         Description:
@@ -3857,7 +4589,7 @@ class atmcd:
 
     '''
     carr = c_int()
-    csize = c_int(size)
+    csize = c_long(size)
     ret = self.dll.GetNewData(byref(carr), csize)
     return (ret, carr.value)
 
@@ -3892,8 +4624,8 @@ class atmcd:
             * GetOldestImage
 
     '''
-    carr = c_short()
-    csize = c_int(size)
+    carr = c_ushort()
+    csize = c_long(size)
     ret = self.dll.GetNewData16(byref(carr), csize)
     return (ret, carr.value)
 
@@ -3929,7 +4661,7 @@ class atmcd:
 
     '''
     carr = (c_ubyte * size)()
-    csize = c_int(size)
+    csize = c_long(size)
     ret = self.dll.GetNewData8(carr, csize)
     return (ret, carr)
 
@@ -3953,7 +4685,7 @@ class atmcd:
 
     '''
     carr = c_float()
-    csize = c_int(size)
+    csize = c_long(size)
     ret = self.dll.GetNewFloatData(byref(carr), csize)
     return (ret, carr.value)
 
@@ -4258,10 +4990,9 @@ class atmcd:
             
 
     '''
-    cfirst = c_int()
-    clast = c_int()
-    ret = self.dll.GetNumberNewImages(byref(cfirst), byref(clast))
-    return (ret, cfirst.value, clast.value)
+    out = self._out
+    ret = self._GetNumberNewImages(out.first_ref, out.last_ref)
+    return (ret, out.first.value, out.last.value)
 
   def GetNumberPhotonCountingDivisions(self):
     ''' 
@@ -4471,9 +5202,41 @@ class atmcd:
     '''
     carr = (c_int * size)()
     csize = c_ulong(size)
-    ret = self.dll.GetOldestImage(carr, csize)
+    ret = self._GetOldestImage(carr, csize)
     return (ret, carr)
 
+  def GetOldestImageInto(self, arr):
+    ''' 
+        Description:
+          Variant of GetOldestImage that copies the data straight into a caller-supplied NumPy array instead of allocating a new ctypes array on every call. The array can be reused between calls.
+
+        Synopsis:
+          ret = GetOldestImageInto(arr)
+
+        Inputs:
+          arr - preallocated, writable, C-contiguous NumPy array of 32-bit integers (arr.size is the total number of pixels).
+
+        Outputs:
+          ret - Function Return Code:
+            DRV_SUCCESS - Image has been copied into array.
+            DRV_NOT_INITIALIZED - System not initialized.
+            DRV_ERROR_ACK - Unable to communicate with card.
+            DRV_P1INVALID - Invalid pointer (i.e. NULL).
+            DRV_P2INVALID - Array size is incorrect.
+            DRV_NO_NEW_DATA - There is no new data yet.
+
+        C++ Equiv:
+          unsigned int GetOldestImage(at_32 * arr, unsigned long size);
+
+        See Also:
+          GetOldestImage 
+
+    '''
+    carr = _bufferPointer(arr, c_int)
+    csize = c_ulong(arr.size)
+    ret = self._GetOldestImage(carr, csize)
+    return (ret)
+
   def GetOldestImage16(self, size):
     ''' 
         Description:
@@ -4502,11 +5265,43 @@ class atmcd:
           GetOldestImage GetMostRecentImage16 GetMostRecentImage 
 
     '''
-    carr = (c_short * size)()
+    carr = (c_ushort * size)()
     csize = c_ulong(size)
-    ret = self.dll.GetOldestImage16(carr, csize)
+    ret = self._GetOldestImage16(carr, csize)
     return (ret, carr)
 
+  def GetOldestImage16Into(self, arr):
+    ''' 
+        Description:
+          Variant of GetOldestImage16 that copies the data straight into a caller-supplied NumPy array instead of allocating a new ctypes array on every call. The array can be reused between calls.
+
+        Synopsis:
+          ret = GetOldestImage16Into(arr)
+
+        Inputs:
+          arr - preallocated, writable, C-contiguous NumPy array of 16-bit integers (arr.size is the total number of pixels).
+
+        Outputs:
+          ret - Function Return Code:
+            DRV_SUCCESS - Image has been copied into array.
+            DRV_NOT_INITIALIZED - System not initialized.
+            DRV_ERROR_ACK - Unable to communicate with card.
+            DRV_P1INVALID - Invalid pointer (i.e. NULL).
+            DRV_P2INVALID - Array size is incorrect.
+            DRV_NO_NEW_DATA - There is no new data yet.
+
+        C++ Equiv:
+          unsigned int GetOldestImage16(WORD * arr, unsigned long size);
+
+        See Also:
+          GetOldestImage16 
+
+    '''
+    carr = _bufferPointer(arr, c_ushort)
+    csize = c_ulong(arr.size)
+    ret = self._GetOldestImage16(carr, csize)
+    return (ret)
+
   def GetPhosphorStatus(self):
     ''' 
         Description:
@@ -4922,7 +5717,7 @@ class atmcd:
           unsigned int GetSizeOfCircularBuffer(long * index);
 
     '''
-    cindex = c_int()
+    cindex = c_long()
     ret = self.dll.GetSizeOfCircularBuffer(byref(cindex))
     return (ret, cindex.value)
 
@@ -4948,10 +5743,10 @@ class atmcd:
           unsigned int GetSlotBusDeviceFunction(DWORD * dwslot, DWORD * dwBus, DWORD * dwDevice, DWORD * dwFunction);
 
     '''
-    cdwslot = ()
-    cdwBus = ()
-    cdwDevice = ()
-    cdwFunction = ()
+    cdwslot = c_ulong()
+    cdwBus = c_ulong()
+    cdwDevice = c_ulong()
+    cdwFunction = c_ulong()
     ret = self.dll.GetSlotBusDeviceFunction(byref(cdwslot), byref(cdwBus), byref(cdwDevice), byref(cdwFunction))
     return (ret, cdwslot.value, cdwBus.value, cdwDevice.value, cdwFunction.value)
 
@@ -5019,7 +5814,7 @@ class atmcd:
         Note: Deprecated by GetTotalNumberImagesAcquiredGetNumberHSSpeeds
 
     '''
-    cindex = c_int()
+    cindex = c_long()
     ret = self.dll.GetSpoolProgress(byref(cindex))
     return (ret, cindex.value)
 
@@ -5080,9 +5875,9 @@ class atmcd:
         Note: If the status is one of the following:
 
     '''
-    cstatus = c_int()
-    ret = self.dll.GetStatus(byref(cstatus))
-    return (ret, cstatus.value)
+    out = self._out
+    ret = self._GetStatus(out.status_ref)
+    return (ret, out.status.value)
 
   def GetTECStatus(self):
     ''' 
@@ -5181,9 +5976,9 @@ class atmcd:
           GetTemperature SetTemperature CoolerON CoolerOFF GetTemperatureRange 
 
     '''
-    ctemperature = c_float()
-    ret = self.dll.GetTemperatureF(byref(ctemperature))
-    return (ret, ctemperature.value)
+    out = self._out
+    ret = self._GetTemperatureF(out.temperature_ref)
+    return (ret, out.temperature.value)
 
   def GetTemperatureRange(self):
     ''' 
@@ -5266,7 +6061,7 @@ class atmcd:
           unsigned int GetTotalNumberImagesAcquired(long * index);
 
     '''
-    cindex = c_int()
+    cindex = c_long()
     ret = self.dll.GetTotalNumberImagesAcquired(byref(cindex))
     return (ret, cindex.value)
 
@@ -5394,8 +6189,8 @@ class atmcd:
           unsigned int GetVirtualDMAAddress(void * Address1, void * Address2);
 
     '''
-    cAddress1 = c_void()
-    cAddress2 = c_void()
+    cAddress1 = c_void_p()
+    cAddress2 = c_void_p()
     ret = self.dll.GetVirtualDMAAddress(byref(cAddress1), byref(cAddress2))
     return (ret, cAddress1.value, cAddress2.value)
 
@@ -5625,7 +6420,7 @@ class atmcd:
 
     '''
     ci2cAddress = c_ubyte(i2cAddress)
-    cnBytes = c_int(nBytes)
+    cnBytes = c_long(nBytes)
     cdata = c_ubyte()
     ret = self.dll.I2CBurstRead(ci2cAddress, cnBytes, byref(cdata))
     return (ret, cdata.value)
@@ -5663,7 +6458,7 @@ class atmcd:
 
     '''
     ci2cAddress = c_ubyte(i2cAddress)
-    cnBytes = c_int(nBytes)
+    cnBytes = c_long(nBytes)
     cdata = c_ubyte()
     ret = self.dll.I2CBurstWrite(ci2cAddress, cnBytes, byref(cdata))
     return (ret, cdata.value)
@@ -6107,12 +6902,12 @@ class atmcd:
 
     '''
     carr = c_int()
-    cnOrder = c_int(nOrder)
-    cnPoint = c_int(nPoint)
-    cnPixel = c_int(nPixel)
+    cnOrder = c_long(nOrder)
+    cnPoint = c_long(nPoint)
+    cnPixel = c_long(nPixel)
     ccoeff = c_float()
-    cfit = c_int(fit)
-    chbin = c_int(hbin)
+    cfit = c_long(fit)
+    chbin = c_long(hbin)
     coutput = c_int()
     cstart = c_float()
     cstep_Renamed = c_float()
@@ -6990,8 +7785,8 @@ class atmcd:
     '''
     cpath = path
     cpalette = palette
-    cymin = c_int(ymin)
-    cymax = c_int(ymax)
+    cymin = c_long(ymin)
+    cymax = c_long(ymax)
     ret = self.dll.SaveAsBmp(cpath, cpalette, cymin, cymax)
     return (ret)
 
@@ -7586,7 +8381,7 @@ class atmcd:
 
     '''
     carr = c_int()
-    csize = c_int(size)
+    csize = c_long(size)
     ret = self.dll.SetBackground(byref(carr), csize)
     return (ret, carr.value)
 
@@ -7975,7 +8770,7 @@ class atmcd:
           GetCurrentCamera GetAvailableCameras GetCameraHandle 
 
     '''
-    ccameraHandle = c_int(cameraHandle)
+    ccameraHandle = c_long(cameraHandle)
     ret = self.dll.SetCurrentCamera(ccameraHandle)
     return (ret)
 
@@ -8523,7 +9318,7 @@ class atmcd:
           SetDDGIOCFrequency GetDDGIOCFrequency GetDDGIOCNumber GetDDGIOCPulses SetDDGIOC 
 
     '''
-    cnumberPulses = c_int(numberPulses)
+    cnumberPulses = c_long(numberPulses)
     ret = self.dll.SetDDGIOCNumber(cnumberPulses)
     return (ret)
 
@@ -10649,10 +11444,10 @@ class atmcd:
 
     '''
     cdata = c_int()
-    clowAdd = c_int(lowAdd)
-    chighAdd = c_int(highAdd)
-    clength = c_int(length)
-    cphysical = c_int(physical)
+    clowAdd = c_long(lowAdd)
+    chighAdd = c_long(highAdd)
+    clength = c_long(length)
+    cphysical = c_long(physical)
     ret = self.dll.SetNextAddress(byref(cdata), clowAdd, chighAdd, clength, cphysical)
     return (ret, cdata.value)
 
@@ -10679,10 +11474,10 @@ class atmcd:
 
     '''
     cdata = c_int()
-    clowAdd = c_int(lowAdd)
-    chighAdd = c_int(highAdd)
-    clength = c_int(length)
-    cphysical = c_int(physical)
+    clowAdd = c_long(lowAdd)
+    chighAdd = c_long(highAdd)
+    clength = c_long(length)
+    cphysical = c_long(physical)
     ret = self.dll.SetNextAddress16(byref(cdata), clowAdd, chighAdd, clength, cphysical)
     return (ret, cdata.value)
 
@@ -10992,8 +11787,8 @@ class atmcd:
           SetPhotonCounting 
 
     '''
-    cmin = c_int(min)
-    cmax = c_int(max)
+    cmin = c_long(min)
+    cmax = c_long(max)
     ret = self.dll.SetPhotonCountingThreshold(cmin, cmax)
     return (ret)
 
@@ -11054,7 +11849,7 @@ class atmcd:
     ret = self.dll.SetPreAmpGain(cindex)
     return (ret)
 
-  def SetRandomTracks(self, numTracks):
+  def SetRandomTracks(self, numTracks, areas):
     ''' 
         Description:
           This function will set the Random-Track parameters. The positions of the tracks are validated to ensure that the tracks are in increasing order and do not overlap. The horizontal binning is set via the SetCustomTrackHBin function. The vertical binning is set to the height of each track.
@@ -11063,11 +11858,13 @@ class atmcd:
           Tracks specified as 20 30 31 40 tells the SDK that the first track starts at row 20 in the CCD and finishes at row 30. The next track starts at row 31 (no gap between tracks) and ends at row 40.
 
         Synopsis:
-          (ret, areas) = SetRandomTracks(numTracks)
+          ret = SetRandomTracks(numTracks, areas)
 
         Inputs:
           numTracks - number tracks:
             1 - to number of vertical pixels/2
+          areas - track positions (a sequence of 2*numTracks ints). The array has the form:
+            bottom1 - bottom1 top1, bottom2, top2 ... bottomN, topN
 
         Outputs:
           ret - Function Return Code:
@@ -11077,8 +11874,6 @@ class atmcd:
             DRV_P1INVALID - Number of tracks invalid.
             DRV_P2INVALID - Track positions invalid.
             DRV_RANDOM_TRACK_ERROR - Invalid combination of tracks, out of memory or mode not available.
-          areas - pointer to an array of track positions. The array has the form:
-            bottom1 - bottom1 top1, bottom2, top2 ... bottomN, topN
 
         C++ Equiv:
           unsigned int SetRandomTracks(int numTracks, int * areas);
@@ -11088,9 +11883,9 @@ class atmcd:
 
     '''
     cnumTracks = c_int(numTracks)
-    careas = c_int()
-    ret = self.dll.SetRandomTracks(cnumTracks, byref(careas))
-    return (ret, careas.value)
+    careas = (c_int * (2*numTracks))(*areas)
+    ret = self.dll.SetRandomTracks(cnumTracks, careas)
+    return (ret)
 
   def SetReadMode(self, mode):
     ''' 
@@ -11591,7 +12386,7 @@ class atmcd:
           unsigned int SetStorageMode(long mode);
 
     '''
-    cmode = c_int(mode)
+    cmode = c_long(mode)
     ret = self.dll.SetStorageMode(cmode)
     return (ret)
 
@@ -11817,8 +12612,8 @@ class atmcd:
           unsigned int SetUSGenomics(long width, long height);
 
     '''
-    cwidth = c_int(width)
-    cheight = c_int(height)
+    cwidth = c_long(width)
+    cheight = c_long(height)
     ret = self.dll.SetUSGenomics(cwidth, cheight)
     return (ret)
 
@@ -12027,7 +12822,7 @@ class atmcd:
           GetStatus GetAcquisitionTimings SetAccumulationCycleTime SetAcquisitionMode SetExposureTime SetHSSpeed SetKineticCycleTime SetMultiTrack SetNumberAccumulations SetNumberKinetics SetReadMode SetSingleTrack SetTriggerMode SetVSSpeed 
 
     '''
-    ret = self.dll.StartAcquisition()
+    ret = self._StartAcquisition()
     return (ret)
 
   def UnMapPhysicalAddress(self):
@@ -12078,7 +12873,7 @@ class atmcd:
           StartAcquisition CancelWait 
 
     '''
-    ret = self.dll.WaitForAcquisition()
+    ret = self._WaitForAcquisition()
     return (ret)
 
   def WaitForAcquisitionByHandle(self, cameraHandle):
@@ -12105,7 +12900,7 @@ class atmcd:
           CancelWait GetCameraHandle StartAcquisition WaitForAcquisition WaitForAcquisitionTimeOut WaitForAcquisitionByHandleTimeOut 
 
     '''
-    ccameraHandle = c_int(cameraHandle)
+    ccameraHandle = c_long(cameraHandle)
     ret = self.dll.WaitForAcquisitionByHandle(ccameraHandle)
     return (ret)
 
@@ -12134,7 +12929,7 @@ class atmcd:
           CancelWait GetCameraHandle StartAcquisition WaitForAcquisition WaitForAcquisitionByHandle WaitForAcquisitionTimeOut 
 
     '''
-    ccameraHandle = c_int(cameraHandle)
+    ccameraHandle = c_long(cameraHandle)
     ciTimeOutMs = c_int(iTimeOutMs)
     ret = self.dll.WaitForAcquisitionByHandleTimeOut(ccameraHandle, ciTimeOutMs)
     return (ret)
@@ -12163,7 +12958,7 @@ class atmcd:
 
     '''
     ciTimeOutMs = c_int(iTimeOutMs)
-    ret = self.dll.WaitForAcquisitionTimeOut(ciTimeOutMs)
+    ret = self._WaitForAcquisitionTimeOut(ciTimeOutMs)
     return (ret)
 
   def WhiteBalance(self):
@@ -12219,9 +13014,9 @@ class atmcd:
           DemosaicImage GetMostRecentColorImage16 
 
     '''
-    cwRed = c_short()
-    cwGreen = c_short()
-    cwBlue = c_short()
+    cwRed = c_ushort()
+    cwGreen = c_ushort()
+    cwBlue = c_ushort()
     cfRelR = c_float()
     cfRelB = c_float()
     cinfo = WhiteBalanceInfo()